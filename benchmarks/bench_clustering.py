@@ -0,0 +1,158 @@
+"""
+Benchmarks for clustering generated workflows with the stages of cluster_sf: building the DAG, cluster_vertically and
+wpa_clustering, and cluster_sf itself on a SwarmPad.
+
+Follows the asv layout. benchmarks/run.py runs the same stages and compares them to a stored baseline.
+"""
+from benchmarks.utils import RoundTripCounter, get_swarmpad
+from swarmform.core.cluster import cluster_sf
+from swarmform.core.clustering_algo.strategies import cluster_dag, get_strategy_names
+from swarmform.core.clustering_algo.wpa_clustering import PACKING_MODES, cluster_vertically, wpa_clustering
+from swarmform.core.swarm_dag import DAG, PRIORITY_MODES
+from swarmform.util.makespan_simulator import MakespanSimulator
+from swarmform.util.synthetic_generator import SyntheticWorkflowGenerator
+
+SHAPES = ['layered', 'montage', 'epigenomics', 'random']
+
+
+def generate_swarmflow(shape, num_jobs, seed=0):
+    """
+    Returns:
+        SwarmFlow: generated workflow with sf_id 1
+    """
+    sf = SyntheticWorkflowGenerator(seed=seed).generate(shape, num_jobs).to_swarmflow()
+    sf.sf_id = 1
+    return sf
+
+
+def generate_mixed_swarmflow(shape, num_jobs, seed=0):
+    """
+    Returns:
+        SwarmFlow: generated workflow with lognormal execution times and jobs of 1, 2 or 4 cores, so that clusters leave
+            cores idle
+    """
+    generator = SyntheticWorkflowGenerator(exec_time=('lognormal', 3, 1), cores=('choice', [1, 2, 4]), seed=seed)
+    return generator.generate(shape, num_jobs).to_swarmflow()
+
+
+class TimeClustering:
+    params = [SHAPES, [1000, 10000]]
+    param_names = ['shape', 'num_jobs']
+    number = 1
+    timeout = 600
+
+    def setup(self, shape, num_jobs):
+        self.sf = generate_swarmflow(shape, num_jobs)
+        self.dag = DAG(self.sf)
+        self.vertically_clustered_dag = cluster_vertically(DAG(self.sf))
+
+    def time_dag_init(self, shape, num_jobs):
+        DAG(self.sf)
+
+    def time_cluster_vertically(self, shape, num_jobs):
+        cluster_vertically(self.dag)
+
+    def time_wpa_clustering(self, shape, num_jobs):
+        wpa_clustering(self.vertically_clustered_dag)
+
+    def peakmem_dag_init(self, shape, num_jobs):
+        DAG(self.sf)
+
+
+class TimeClusterSwarmFlow:
+    params = [SHAPES, [1000]]
+    param_names = ['shape', 'num_jobs']
+    number = 1
+    timeout = 600
+
+    def setup(self, shape, num_jobs):
+        self.counter = RoundTripCounter()
+        self.swarmpad = get_swarmpad(self.counter)
+        sf = generate_swarmflow(shape, num_jobs)
+        del sf.sf_id
+        self.swarmpad.add_sf(sf)
+        self.sf_id = sf.sf_id
+
+    def time_cluster_sf(self, shape, num_jobs):
+        cluster_sf(self.swarmpad, self.sf_id)
+
+    def track_round_trips_cluster_sf(self, shape, num_jobs):
+        self.counter.reset()
+        cluster_sf(self.swarmpad, self.sf_id)
+        return self.counter.round_trips
+
+
+class TrackPacking:
+    """
+    Quality of the clusters of each packing mode of wpa_clustering, simulated on 16 workers of 16 cores with 30 seconds
+    of overhead per job. The utilization counts the cores the fireworks use, the allocation also the cores they leave
+    idle inside their clusters
+    """
+    params = [SHAPES, list(PACKING_MODES)]
+    param_names = ['shape', 'packing']
+    timeout = 600
+
+    def setup(self, shape, packing):
+        sf = generate_mixed_swarmflow(shape, 10000)
+        dag = wpa_clustering(cluster_vertically(DAG(sf)), packing)
+        self.result = MakespanSimulator(16, 16, job_overhead=30).simulate(dag)
+
+    def track_num_jobs(self, shape, packing):
+        return self.result['num_jobs']
+
+    def track_utilization(self, shape, packing):
+        return self.result['utilization']
+
+    def track_allocation(self, shape, packing):
+        return self.result['allocation']
+
+    def track_makespan(self, shape, packing):
+        return self.result['makespan']
+
+
+class TrackStrategy:
+    """
+    Quality of the clusters of each clustering strategy, simulated as in TrackPacking
+    """
+    params = [SHAPES, get_strategy_names()]
+    param_names = ['shape', 'strategy']
+    timeout = 600
+
+    def setup(self, shape, strategy):
+        sf = generate_mixed_swarmflow(shape, 10000)
+        dag = cluster_dag(DAG(sf), strategy)
+        self.result = MakespanSimulator(16, 16, job_overhead=30).simulate(dag)
+
+    def track_num_jobs(self, shape, strategy):
+        return self.result['num_jobs']
+
+    def track_utilization(self, shape, strategy):
+        return self.result['utilization']
+
+    def track_allocation(self, shape, strategy):
+        return self.result['allocation']
+
+    def track_makespan(self, shape, strategy):
+        return self.result['makespan']
+
+
+class TrackPriority:
+    """
+    Makespan of the clustered workflows when the LaunchPad runs the ready jobs in the order they become ready, and by
+    the priorities cluster_sf gives them, simulated as in TrackPacking
+    """
+    params = [SHAPES, ['none'] + list(PRIORITY_MODES)]
+    param_names = ['shape', 'priority']
+    timeout = 600
+
+    def setup(self, shape, priority):
+        sf = generate_swarmflow(shape, 10000)
+        dag = cluster_dag(DAG(sf))
+        priorities = dag.get_priorities(priority) if priority != 'none' else None
+        self.result = MakespanSimulator(16, 16, job_overhead=30).simulate(dag, priorities)
+
+    def track_makespan(self, shape, priority):
+        return self.result['makespan']
+
+    def track_mean_queue_wait(self, shape, priority):
+        return self.result['mean_queue_wait']
@@ -0,0 +1,119 @@
+"""
+Benchmarks for building the swarm_dag.DAG of a SwarmFlow.
+
+Follows the asv layout (time_* methods, params); it can also be run directly to print the scaling table:
+
+    python -m benchmarks.bench_dag
+"""
+import time
+import tracemalloc
+
+from fireworks import Firework, ScriptTask
+
+from swarmform.core.compact_dag import CompactDAG
+from swarmform.core.swarm_dag import DAG
+from swarmform.core.swarmwork import SwarmFlow
+
+
+def layered_swarmflow(num_nodes, width=100):
+    """
+    Generate a layered SwarmFlow where each node links to two nodes of the next layer, forming diamonds
+
+    Args:
+        num_nodes (int): total number of fireworks
+        width (int): number of fireworks in a layer
+
+    Returns:
+        SwarmFlow
+    """
+    fws = [Firework(ScriptTask.from_str('echo {}'.format(fw_id)), fw_id=fw_id) for fw_id in range(1, num_nodes + 1)]
+    links = {}
+    costs = {}
+    for fw_id in range(1, num_nodes + 1):
+        position = (fw_id - 1) % width
+        next_layer = fw_id - position + width
+        children = {next_layer + position, next_layer + (position + 1) % width}
+        links[fw_id] = sorted(child for child in children if child <= num_nodes)
+        costs[str(fw_id)] = {'exec_time': 1 + fw_id % 10, 'cores': 1}
+    sf = SwarmFlow(fws, links_dict=links, name='layered-{}'.format(num_nodes), metadata={'costs': costs})
+    sf.sf_id = 1
+    return sf
+
+
+class TimeDAGConstruction:
+    params = [1000, 10000, 100000]
+    param_names = ['num_nodes']
+    timeout = 600
+
+    def setup(self, num_nodes):
+        self.sf = layered_swarmflow(num_nodes)
+
+    def time_dag_init(self, num_nodes):
+        DAG(self.sf)
+
+    def time_update_height(self, num_nodes):
+        DAG(self.sf).update_height()
+
+    def time_compact_dag_init(self, num_nodes):
+        CompactDAG(self.sf)
+
+
+class TimeSchedule:
+    params = [1000, 10000, 100000]
+    param_names = ['num_nodes']
+    timeout = 600
+
+    def setup(self, num_nodes):
+        self.dag = DAG(layered_swarmflow(num_nodes))
+
+    def time_compute_schedule(self, num_nodes):
+        self.dag.compute_schedule()
+
+    def time_critical_path(self, num_nodes):
+        self.dag.invalidate_schedule()
+        self.dag.get_critical_path()
+
+
+class MemDAGConstruction:
+    params = [1000, 10000, 100000]
+    param_names = ['num_nodes']
+    timeout = 600
+
+    def setup(self, num_nodes):
+        self.sf = layered_swarmflow(num_nodes)
+
+    def peakmem_dag_init(self, num_nodes):
+        DAG(self.sf)
+
+    def peakmem_compact_dag_init(self, num_nodes):
+        CompactDAG(self.sf)
+
+
+def measure(dag_class, sf):
+    """
+    Returns:
+        (DAG/CompactDAG, float, int): the DAG, build time in seconds and memory retained by the DAG in bytes
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    dag = dag_class(sf)
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return dag, elapsed, size
+
+
+def main():
+    print('{:>10} {:>10} {:>12} {:>12} {:>14} {:>14}'.format(
+        'nodes', 'height', 'DAG() [s]', 'DAG [MB]', 'Compact() [s]', 'Compact [MB]'))
+    for num_nodes in TimeDAGConstruction.params:
+        sf = layered_swarmflow(num_nodes)
+        dag, dag_time, dag_size = measure(DAG, sf)
+        del dag
+        compact, compact_time, compact_size = measure(CompactDAG, sf)
+        print('{:>10} {:>10} {:>12.4f} {:>12.1f} {:>14.4f} {:>14.1f}'.format(
+            num_nodes, compact.get_height(), dag_time, dag_size / 2 ** 20, compact_time, compact_size / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
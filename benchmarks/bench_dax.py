@@ -0,0 +1,120 @@
+"""
+Benchmarks for parsing Pegasus DAX files with WorkflowGenerator.
+
+Compares the tree parser (read_input_dax + parse_dax) with the streaming parser (parse_dax_file) on synthetic DAX files
+of increasing size. It can be run directly to print the wall time and the peak memory:
+
+    python -m benchmarks.bench_dax
+"""
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from swarmform.util.workflow_generator import WorkflowGenerator
+
+DAX_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n' \
+             '<adag xmlns="http://pegasus.isi.edu/schema/DAX" version="2.1" name="synthetic" jobCount="{}" ' \
+             'childCount="{}">\n'
+
+
+def write_synthetic_dax(path, num_jobs, width=100, max_parents=4, seed=0):
+    """
+    Write a layered DAX file where every job after the first layer has up to max_parents parents in the previous
+    layer. Jobs carry <uses> elements like the Pegasus generated workflows.
+
+    Args:
+        path (str): path of the DAX file
+        num_jobs (int): number of jobs
+        width (int): number of jobs in a layer
+        max_parents (int): maximum number of parents of a job
+        seed (int): seed of the random parents
+    """
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        f.write(DAX_HEADER.format(num_jobs, max(0, num_jobs - width)))
+        for job in range(num_jobs):
+            f.write('  <job id="ID{0:07d}" namespace="Synthetic" name="task" version="1.0" runtime="{1:.2f}">\n'
+                    '    <uses file="in_{0}.dat" link="input" size="1024"/>\n'
+                    '    <uses file="out_{0}.dat" link="output" size="1024"/>\n'
+                    '  </job>\n'.format(job, rng.uniform(1, 100)))
+        for job in range(width, num_jobs):
+            layer_start = job - job % width - width
+            parents = rng.sample(range(layer_start, layer_start + width), rng.randint(1, max_parents))
+            f.write('  <child ref="ID{:07d}">\n'.format(job))
+            for parent in parents:
+                f.write('    <parent ref="ID{:07d}"/>\n'.format(parent))
+            f.write('  </child>\n')
+        f.write('</adag>\n')
+
+
+def parse_tree(path):
+    return WorkflowGenerator.parse_dax(WorkflowGenerator.read_input_dax(path))
+
+
+def parse_streaming(path):
+    return WorkflowGenerator.parse_dax_file(path)
+
+
+class TimeParseDax:
+    params = [1000, 10000, 100000]
+    param_names = ['num_jobs']
+    timeout = 600
+
+    def setup(self, num_jobs):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'synthetic.xml')
+        write_synthetic_dax(self.path, num_jobs)
+
+    def teardown(self, num_jobs):
+        shutil.rmtree(self.directory)
+
+    def time_parse_tree(self, num_jobs):
+        parse_tree(self.path)
+
+    def time_parse_streaming(self, num_jobs):
+        parse_streaming(self.path)
+
+    def peakmem_parse_tree(self, num_jobs):
+        parse_tree(self.path)
+
+    def peakmem_parse_streaming(self, num_jobs):
+        parse_streaming(self.path)
+
+
+def measure(parse, path):
+    """
+    Returns:
+        (float, float): wall time in seconds and peak traced memory in MiB, measured in separate runs as tracing
+            slows down the parsers
+    """
+    start = time.perf_counter()
+    parse(path)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    parse(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 2 ** 20
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        print('{:>8} {:>10} {:>10} {:>12} {:>14} {:>16}'.format(
+            'jobs', 'file [MiB]', 'tree [s]', 'tree [MiB]', 'streaming [s]', 'streaming [MiB]'))
+        for num_jobs in TimeParseDax.params:
+            path = os.path.join(directory, 'synthetic-{}.xml'.format(num_jobs))
+            write_synthetic_dax(path, num_jobs)
+            tree_time, tree_peak = measure(parse_tree, path)
+            streaming_time, streaming_peak = measure(parse_streaming, path)
+            print('{:>8} {:>10.1f} {:>10.3f} {:>12.1f} {:>14.3f} {:>16.1f}'.format(
+                num_jobs, os.path.getsize(path) / 2 ** 20, tree_time, tree_peak, streaming_time, streaming_peak))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmarks for loading SwarmFlows from the SwarmPad.
+
+Compares the batched loader (SwarmPad.get_fws_by_ids, used by get_sf_by_id) with one query per Firework, and the bulk
+ingestion (SwarmPad.add_sfs) with one add_sf per SwarmFlow. It can be run directly to print the database round trips
+and the wall time with a simulated latency per round trip:
+
+    python -m benchmarks.bench_swarmpad [latency in ms]
+"""
+import sys
+import time
+
+from benchmarks.bench_dag import layered_swarmflow
+from benchmarks.utils import RoundTripCounter, get_swarmpad
+from swarmform.core.cluster import cluster_sf
+
+
+class TimeLoadSwarmFlow:
+    params = [1000, 5000]
+    param_names = ['num_nodes']
+    timeout = 600
+
+    def setup(self, num_nodes):
+        self.counter = RoundTripCounter()
+        self.swarmpad = get_swarmpad(self.counter)
+        self.sf = layered_swarmflow(num_nodes)
+        self.swarmpad.add_sf(self.sf)
+
+    def time_get_sf_by_id(self, num_nodes):
+        self.swarmpad.get_sf_by_id(self.sf.sf_id)
+
+    def time_get_fw_by_id_per_node(self, num_nodes):
+        for fw_id in self.sf.id_fw:
+            self.swarmpad.get_fw_by_id(fw_id)
+
+    def track_round_trips_get_sf_by_id(self, num_nodes):
+        self.counter.reset()
+        self.swarmpad.get_sf_by_id(self.sf.sf_id)
+        return self.counter.round_trips
+
+    def track_round_trips_cluster_sf(self, num_nodes):
+        self.counter.reset()
+        cluster_sf(self.swarmpad, self.sf.sf_id)
+        return self.counter.round_trips
+
+
+def layered_swarmflows(num_sfs, num_nodes):
+    sfs = []
+    for _ in range(num_sfs):
+        sf = layered_swarmflow(num_nodes)
+        # let the SwarmPad assign the SwarmFlow ids
+        del sf.sf_id
+        sfs.append(sf)
+    return sfs
+
+
+class TimeAddSwarmFlows:
+    params = [[10, 50], [100, 200]]
+    param_names = ['num_sfs', 'num_nodes']
+    number = 1
+    timeout = 600
+
+    def setup(self, num_sfs, num_nodes):
+        self.counter = RoundTripCounter()
+        self.swarmpad = get_swarmpad(self.counter)
+        self.sfs = layered_swarmflows(num_sfs, num_nodes)
+
+    def time_add_sf_per_flow(self, num_sfs, num_nodes):
+        for sf in self.sfs:
+            self.swarmpad.add_sf(sf)
+
+    def time_add_sfs(self, num_sfs, num_nodes):
+        self.swarmpad.add_sfs(self.sfs)
+
+    def track_round_trips_add_sf_per_flow(self, num_sfs, num_nodes):
+        self.counter.reset()
+        self.time_add_sf_per_flow(num_sfs, num_nodes)
+        return self.counter.round_trips
+
+    def track_round_trips_add_sfs(self, num_sfs, num_nodes):
+        self.counter.reset()
+        self.time_add_sfs(num_sfs, num_nodes)
+        return self.counter.round_trips
+
+
+def main(latency_ms=1.0):
+    print('simulated latency per round trip: {} ms'.format(latency_ms))
+    print('{:>8} {:>22} {:>14} {:>22} {:>14}'.format(
+        'nodes', 'per-FW round trips', 'per-FW [s]', 'batched round trips', 'batched [s]'))
+    for num_nodes in (500, 1000):
+        counter = RoundTripCounter()
+        swarmpad = get_swarmpad(counter)
+        sf = layered_swarmflow(num_nodes)
+        swarmpad.add_sf(sf)
+        fw_ids = list(sf.id_fw)
+        counter.latency = latency_ms / 1000.0
+
+        counter.reset()
+        start = time.perf_counter()
+        for fw_id in fw_ids:
+            swarmpad.get_fw_by_id(fw_id)
+        single_time = time.perf_counter() - start
+        single_round_trips = counter.round_trips
+
+        counter.reset()
+        start = time.perf_counter()
+        swarmpad.get_sf_by_id(sf.sf_id)
+        batched_time = time.perf_counter() - start
+        batched_round_trips = counter.round_trips
+
+        print('{:>8} {:>22} {:>14.3f} {:>22} {:>14.3f}'.format(
+            num_nodes, single_round_trips, single_time, batched_round_trips, batched_time))
+
+    print()
+    print('{:>8} {:>8} {:>22} {:>14} {:>22} {:>14}'.format(
+        'flows', 'nodes', 'add_sf round trips', 'add_sf [s]', 'add_sfs round trips', 'add_sfs [s]'))
+    for num_sfs, num_nodes in ((50, 20), (2, 500)):
+        results = []
+        for bulk in (False, True):
+            counter = RoundTripCounter()
+            swarmpad = get_swarmpad(counter)
+            sfs = layered_swarmflows(num_sfs, num_nodes)
+            counter.latency = latency_ms / 1000.0
+            counter.reset()
+            start = time.perf_counter()
+            if bulk:
+                swarmpad.add_sfs(sfs)
+            else:
+                for sf in sfs:
+                    swarmpad.add_sf(sf)
+            results.extend([counter.round_trips, time.perf_counter() - start])
+
+        print('{:>8} {:>8} {:>22} {:>14.3f} {:>22} {:>14.3f}'.format(num_sfs, num_nodes, *results))
+
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 1.0)
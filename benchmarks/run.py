@@ -0,0 +1,195 @@
+"""
+Benchmark harness for the stages of clustering generated workflows: building the DAG, cluster_vertically,
+wpa_clustering, and SwarmPad.add_sf, SwarmPad.get_sf_by_id and cluster_sf on a mongomock SwarmPad (or a local mongod,
+see benchmarks/utils.py). Reports the wall time, the peak memory and the database round trips of each stage.
+
+Results can be saved as a baseline, and later runs compared to it. The comparison exits with status 1 if a stage got
+slower or bigger than the threshold allows, or needs more round trips:
+
+    python -m benchmarks.run --save baseline.json
+    python -m benchmarks.run --compare baseline.json
+"""
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from benchmarks.bench_clustering import SHAPES, generate_swarmflow
+from benchmarks.utils import RoundTripCounter, get_swarmpad
+from swarmform.core.cluster import cluster_sf
+from swarmform.core.clustering_algo.wpa_clustering import cluster_vertically, wpa_clustering
+from swarmform.core.swarm_dag import DAG
+
+BASELINE_VERSION = 1
+# changes of less than this many seconds or MiB are not reported as regressions, whatever the ratio
+MIN_TIME_DIFFERENCE = 0.005
+MIN_PEAK_DIFFERENCE = 0.5
+
+
+def get_stages(shape, num_jobs, swarmpad, seed):
+    """
+    Args:
+        shape (str): shape of the generated workflow
+        num_jobs (int): number of jobs of the generated workflow
+        swarmpad (SwarmPad): SwarmPad of the database stages
+        seed (int): seed of the generated workflow
+
+    Returns:
+        list: (name, setup, run) of each stage. setup returns fresh arguments of run, so that every run of a stage
+            starts from the same state
+    """
+
+    def new_sf():
+        sf = generate_swarmflow(shape, num_jobs, seed)
+        del sf.sf_id
+        return sf
+
+    stored_sf = new_sf()
+    swarmpad.add_sf(stored_sf)
+
+    return [
+        ('dag_init', lambda: (generate_swarmflow(shape, num_jobs, seed),), DAG),
+        ('cluster_vertically', lambda: (DAG(generate_swarmflow(shape, num_jobs, seed)),), cluster_vertically),
+        ('wpa_clustering', lambda: (cluster_vertically(DAG(generate_swarmflow(shape, num_jobs, seed))),),
+         wpa_clustering),
+        ('get_sf_by_id', lambda: (stored_sf.sf_id,), swarmpad.get_sf_by_id),
+        ('cluster_sf', lambda: (swarmpad, stored_sf.sf_id), cluster_sf),
+        # last, so that the fireworks it adds do not slow down the queries of the other stages
+        ('add_sf', lambda: (new_sf(),), swarmpad.add_sf),
+    ]
+
+
+def measure_stage(setup, run, counter, repeat):
+    """
+    Returns:
+        dict: best wall time in seconds over repeat runs, database round trips of a run and peak memory in MiB,
+            traced in a separate run as tracing slows down the stage
+    """
+    times = []
+    for _ in range(repeat):
+        args = setup()
+        counter.reset()
+        start = time.perf_counter()
+        run(*args)
+        times.append(time.perf_counter() - start)
+    round_trips = counter.round_trips
+
+    args = setup()
+    tracemalloc.start()
+    run(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'time': min(times), 'peak_mib': peak / 2 ** 20, 'round_trips': round_trips}
+
+
+def run_benchmarks(shapes, sizes, stages=None, repeat=3, seed=0):
+    """
+    Returns:
+        list: result of each stage of each workflow, as dicts with shape, num_jobs, stage, time, peak_mib and
+            round_trips
+    """
+    counter = RoundTripCounter()
+    results = []
+    for shape in shapes:
+        for num_jobs in sizes:
+            # a fresh SwarmPad for each workflow, as the queries of mongomock slow down with the size of the database
+            swarmpad = get_swarmpad(counter)
+            for name, setup, run in get_stages(shape, num_jobs, swarmpad, seed):
+                if stages and name not in stages:
+                    continue
+                result = {'shape': shape, 'num_jobs': num_jobs, 'stage': name}
+                result.update(measure_stage(setup, run, counter, repeat))
+                results.append(result)
+                print_result(result)
+    return results
+
+
+def print_result(result, baseline=None, regressions=()):
+    line = '{:<12} {:>8} {:<20} {:>10.4f} {:>10.1f} {:>12}'.format(
+        result['shape'], result['num_jobs'], result['stage'], result['time'], result['peak_mib'],
+        result['round_trips'])
+    if baseline is not None:
+        line += ' {:>8.2f} {:>8.2f} {:>8}'.format(
+            result['time'] / baseline['time'] if baseline['time'] else float('inf'),
+            result['peak_mib'] / baseline['peak_mib'] if baseline['peak_mib'] else float('inf'),
+            '{:+d}'.format(result['round_trips'] - baseline['round_trips']))
+        if regressions:
+            line += '  REGRESSION: ' + ', '.join(regressions)
+    print(line)
+
+
+def save_baseline(filename, results):
+    baseline = {'version': BASELINE_VERSION, 'created_on': datetime.datetime.utcnow().isoformat(),
+                'python': platform.python_version(), 'machine': platform.machine(), 'results': results}
+    with open(filename, 'w') as f:
+        json.dump(baseline, f, indent=1)
+
+
+def compare(results, filename, threshold):
+    """
+    Print the results next to the baseline stored in filename
+
+    Args:
+        results (list): results of run_benchmarks
+        filename (str): path of the baseline
+        threshold (float): maximum ratio of the time and the peak memory to the baseline
+
+    Returns:
+        int: number of regressions
+    """
+    with open(filename, 'r') as f:
+        baseline = json.load(f)
+    if baseline.get('version') != BASELINE_VERSION:
+        raise ValueError('Unsupported baseline version {}'.format(baseline.get('version')))
+    baseline_results = {(r['shape'], r['num_jobs'], r['stage']): r for r in baseline['results']}
+
+    print()
+    print('compared to {} ({})'.format(filename, baseline['created_on']))
+    print('{:<12} {:>8} {:<20} {:>10} {:>10} {:>12} {:>8} {:>8} {:>8}'.format(
+        'shape', 'jobs', 'stage', 'time [s]', 'peak [MiB]', 'round trips', 'time x', 'peak x', 'trips'))
+    num_regressions = 0
+    for result in results:
+        base = baseline_results.get((result['shape'], result['num_jobs'], result['stage']))
+        if base is None:
+            print_result(result)
+            continue
+        regressions = []
+        if result['time'] > base['time'] * threshold and result['time'] - base['time'] > MIN_TIME_DIFFERENCE:
+            regressions.append('time')
+        if result['peak_mib'] > base['peak_mib'] * threshold and \
+                result['peak_mib'] - base['peak_mib'] > MIN_PEAK_DIFFERENCE:
+            regressions.append('memory')
+        if result['round_trips'] > base['round_trips']:
+            regressions.append('round trips')
+        num_regressions += bool(regressions)
+        print_result(result, base, regressions)
+    return num_regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the clustering stages on generated workflows')
+    parser.add_argument('--shapes', nargs='+', default=SHAPES, help='Shapes of the generated workflows')
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 5000], help='Numbers of jobs')
+    parser.add_argument('--stages', nargs='+', help='Stages to run. Default runs all the stages')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of timed runs of each stage')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the generated workflows')
+    parser.add_argument('--save', help='Save the results as a baseline to this file')
+    parser.add_argument('--compare', help='Compare the results to the baseline in this file')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='Maximum ratio of the time and the peak memory to the baseline')
+    args = parser.parse_args()
+
+    print('{:<12} {:>8} {:<20} {:>10} {:>10} {:>12}'.format(
+        'shape', 'jobs', 'stage', 'time [s]', 'peak [MiB]', 'round trips'))
+    results = run_benchmarks(args.shapes, args.sizes, args.stages, args.repeat, args.seed)
+    if args.save:
+        save_baseline(args.save, results)
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
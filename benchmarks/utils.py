@@ -0,0 +1,96 @@
+"""
+Helpers shared by the benchmarks: a SwarmPad connected to a local mongod or to a mongomock stand-in, and a
+collection proxy which counts database round trips and optionally adds a simulated network latency to each of them.
+
+Set SWARMFORM_BENCH_MONGO=1 to run against a mongod on localhost:27017 instead of mongomock.
+"""
+import datetime
+import inspect
+import os
+import time
+
+from swarmform import SwarmPad
+
+BENCH_DB_NAME = 'swarmform_benchmarks'
+COUNTED_COLLECTIONS = ('fireworks', 'launches', 'workflows', 'fw_id_assigner')
+
+
+class RoundTripCounter:
+
+    def __init__(self, latency=0.0):
+        """
+        Args:
+            latency (float): simulated latency in seconds added to each round trip
+        """
+        self.latency = latency
+        self.round_trips = 0
+
+    def reset(self):
+        self.round_trips = 0
+
+    def record(self):
+        self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class CountingCollection:
+    """
+    Proxy of a MongoDB collection which records a round trip for every method call
+    """
+
+    def __init__(self, collection, counter):
+        self._collection = collection
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+
+        def counted(*args, **kwargs):
+            self._counter.record()
+            return attr(*args, **kwargs)
+
+        return counted
+
+
+def use_mongomock():
+    """
+    Make the SwarmPad connect to an in-memory mongomock server instead of a mongod
+    """
+    import gridfs
+    import mongomock
+    from fireworks.core import launchpad
+    launchpad.MongoClient = mongomock.MongoClient
+    # mongomock databases are not accepted by GridFS, which is only used as a fallback for large launches
+    gridfs.GridFS = lambda *args, **kwargs: None
+    # recent pymongo versions pass the sort of UpdateOne to the bulk builder, which mongomock does not accept
+    add_update = mongomock.collection.BulkOperationBuilder.add_update
+    if 'sort' not in inspect.signature(add_update).parameters:
+        mongomock.collection.BulkOperationBuilder.add_update = \
+            lambda self, *args, sort=None, **kwargs: add_update(self, *args, **kwargs)
+
+
+def get_swarmpad(counter=None):
+    """
+    Args:
+        counter (RoundTripCounter): if given, the round trips of the SwarmPad collections are recorded in it
+
+    Returns:
+        SwarmPad: a reset SwarmPad
+    """
+    if not os.environ.get('SWARMFORM_BENCH_MONGO'):
+        use_mongomock()
+
+    swarmpad = SwarmPad(name=BENCH_DB_NAME, strm_lvl='ERROR')
+    swarmpad.reset(datetime.datetime.now().strftime('%Y-%m-%d'))
+    if not os.environ.get('SWARMFORM_BENCH_MONGO'):
+        # mongomock checks a unique index by scanning the collection on every insert, which makes adding a workflow
+        # quadratic in the number of fireworks. The fw_ids are unique by construction, the index is kept non unique
+        swarmpad.fireworks.drop_index('fw_id_1')
+        swarmpad.fireworks.create_index('fw_id')
+    if counter is not None:
+        for name in COUNTED_COLLECTIONS:
+            setattr(swarmpad, name, CountingCollection(getattr(swarmpad, name), counter))
+    return swarmpad
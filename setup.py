@@ -14,8 +14,11 @@ if __name__ == "__main__":
         url='https://github.com/SwarmForm/SwarmForm',
         author='Kalana Wijethunga, Randika Jayasekara, Ayesh Weerasinghe',
         author_email='kalana.16@cse.mrt.ac.lk, rpjayaseka.16@cse.mrt.ac.lk, ayeshweerasinghe.16@cse.mrt.ac.lk',
-        packages=find_packages(),
+        packages=find_packages(exclude=['benchmarks', 'benchmarks.*', 'tests', 'tests.*']),
         install_requires=['FireWorks >= 1.9.5', 'PyYAML >= 5.3.1'],
+        extras_require={
+            'compact': ['numpy'],
+        },
         classifiers=[
             "Programming Language :: Python :: 3",
             "License :: OSI Approved :: MIT License",
@@ -1,3 +1,5 @@
 from swarmform.core.swarmpad import SwarmPad
 from swarmform.user_objects.firetasks.parallel_tasks import ParallelTask
 from swarmform.util.workflow_generator import WorkflowGenerator
+from swarmform.util.synthetic_generator import SyntheticWorkflowGenerator
+from swarmform.util.makespan_simulator import MakespanSimulator
@@ -1,11 +1,31 @@
+from itertools import count
+
 from fireworks import Firework, ScriptTask
 from swarmform import ParallelTask
-from swarmform.core.swarm_dag import DAG
-from swarmform.core.clustering_algo.wpa_clustering import wpa_clustering, cluster_vertically
+from swarmform.core.profiling import get_profile
+from swarmform.core.swarm_dag import DAG, PRIORITY_MODES, fingerprint_plan, get_cluster_steps, get_plan_costs
+from swarmform.core.clustering_algo.strategies import DEFAULT_STRATEGY, cluster_dag, get_strategy
+from swarmform.core.clustering_algo.wpa_clustering import wpa_clustering, cluster_vertically, check_packing
 from swarmform.core.swarmwork import SwarmFlow
 
 
-def combine_fws_sequentially(swarmpad, fw_ids, parallely_clustered_fws, parallely_clustered_fw_ids):
+def get_fw(swarmpad, fw_id, id_fw=None):
+    """
+    Args:
+        swarmpad (SwarmPad)
+        fw_id (int): id of the firework
+        id_fw (dict): already loaded fireworks in the format of {fw_id: Firework}
+
+    Returns:
+        Firework: from id_fw if available, otherwise from the swarmpad
+    """
+    if id_fw is not None and fw_id in id_fw:
+        return id_fw[fw_id]
+    return swarmpad.get_fw_by_id(fw_id)
+
+
+def combine_fws_sequentially(swarmpad, fw_ids, parallely_clustered_fws, parallely_clustered_fw_ids, fw_id=None,
+                             created_on=None, id_fw=None):
     """
     Combine a set of fireworks into a single firework
 
@@ -14,6 +34,10 @@ def combine_fws_sequentially(swarmpad, fw_ids, parallely_clustered_fws, parallel
         fw_ids (list): id of the fireworks to be combined sequentially
         parallely_clustered_fws(list): list of fireworks which are clustered parallely,but not added to the SwarmPad
         parallely_clustered_fw_ids(dict): dictionary of {cluster id: firework id } of parallely clustered fireworks
+        fw_id (int): id of the combined firework. A new negative id is used if not given
+        created_on (datetime): creation time of the combined firework. Current time is used if not given
+        id_fw (dict): already loaded fireworks in the format of {fw_id: Firework}. Fireworks which are not in it are
+            pulled from the swarmpad
 
     Returns:
         combinedFW (Firework)
@@ -30,10 +54,10 @@ def combine_fws_sequentially(swarmpad, fw_ids, parallely_clustered_fws, parallel
         for task in parallel_fw.tasks:
             firetask.append(task)
 
-    # Get firework from swarmpad if it is not available in parallely_clustered_fws list
-    for fw_id in fw_ids:
-        if fw_id not in parallel_fw_ids:
-            firetask_list = swarmpad.get_fw_by_id(fw_id).spec['_tasks']
+    # Get firework from id_fw or the swarmpad if it is not available in parallely_clustered_fws list
+    for sequential_fw_id in fw_ids:
+        if sequential_fw_id not in parallel_fw_ids:
+            firetask_list = get_fw(swarmpad, sequential_fw_id, id_fw).spec['_tasks']
             num_firetasks = len(firetask_list)
             # Check whether a firework has no firetasks
             if num_firetasks == 0:
@@ -48,7 +72,7 @@ def combine_fws_sequentially(swarmpad, fw_ids, parallely_clustered_fws, parallel
                 firetask.append(firetask_list[0])
 
     # Create a firework from the combined firetasks
-    combined_fw = Firework(firetask)
+    combined_fw = Firework(firetask, fw_id=fw_id, created_on=created_on, updated_on=created_on)
     swarmpad.m_logger.info('Sequentially clustered {} Fireworks to firework_id {}'.format(fw_ids, combined_fw.fw_id))
     return combined_fw
 
@@ -61,13 +85,17 @@ def combine_fws_sequentially(swarmpad, fw_ids, parallely_clustered_fws, parallel
 '''
 
 
-def combine_fws_parallely(swarmpad, fw_ids):
+def combine_fws_parallely(swarmpad, fw_ids, fw_id=None, created_on=None, id_fw=None):
     """
     Combine a set of firetasks into a single firetask which runs all the given tasks parallely
 
     Args:
         swarmpad (SwarmPad)
         fw_ids (list): id of the fireworks to be combined
+        fw_id (int): id of the combined firework. A new negative id is used if not given
+        created_on (datetime): creation time of the combined firework. Current time is used if not given
+        id_fw (dict): already loaded fireworks in the format of {fw_id: Firework}. Fireworks which are not in it are
+            pulled from the swarmpad
 
     Returns:
         combined_firework (FireWork): Parallely combined FireWork object
@@ -75,15 +103,16 @@ def combine_fws_parallely(swarmpad, fw_ids):
 
     # Get each task in each firework and append to firetask list in the order of traversal
     firetasks_to_combine = []
-    for fw_id in fw_ids:
-        firetask_in_fw = swarmpad.get_fw_by_id(fw_id).spec['_tasks'][0]
+    for parallel_fw_id in fw_ids:
+        firetask_in_fw = get_fw(swarmpad, parallel_fw_id, id_fw).spec['_tasks'][0]
         if isinstance(firetask_in_fw, ScriptTask):
             firetasks_to_combine.append(firetask_in_fw)
         else:
-            raise ValueError('Spec of Firework with id {} does not contain an object of type ScriptTask '.format(fw_id))
+            raise ValueError(
+                'Spec of Firework with id {} does not contain an object of type ScriptTask '.format(parallel_fw_id))
 
     combined_firetask = ParallelTask.from_firetasks(firetasks_to_combine)
-    combined_firework = Firework(combined_firetask)
+    combined_firework = Firework(combined_firetask, fw_id=fw_id, created_on=created_on, updated_on=created_on)
     swarmpad.m_logger.info('Parallely Clustered {} to firework_id {}'.format(fw_ids, combined_firework.fw_id))
 
     return combined_firework
@@ -116,36 +145,179 @@ def update_parent_child_relationships(links_dict, old_id, new_id):
     return links_dict
 
 
-def cluster_sf(swarmpad, sf_id):
+def cluster_sf(swarmpad, sf_id, cluster_key_seed=0, plan_cache=None, profile=None, packing='pairs',
+               max_cluster_size=None, strategy=DEFAULT_STRATEGY, priority=None):
 
     """
-    Pull the swarmflow from given sf_id and create a clustered swarmflow
+    Pull the swarmflow from given sf_id and create a clustered swarmflow.
+    The swarmflow and its fireworks are loaded with a constant number of queries and the clustered fireworks are built
+    from the loaded fireworks, so clustering does not query the swarmpad per firework.
+    Clustering is deterministic: the clustered fireworks get negative ids in the order they are created and inherit
+    the creation time of the swarmflow, so clustering the same swarmflow twice gives identical swarmflows.
+    The fingerprint of the clustering plan is saved in metadata['plan_fingerprint'].
 
     Args:
         swarmpad (SwarmPad)
         sf_id (int): id of the swarmflow to pull
+        cluster_key_seed (int): offset of the keys given to the parallel clusters
+        plan_cache (PlanCache): cache of clustering plans. If the plan of a swarmflow with the same structure and
+            costs is cached, the clustering algorithms are skipped
+        profile (ClusterProfile): records the time of the stages, the size of the swarmflow and the clustering, and
+            the database calls. It is published when clustering finishes
+        packing (str): how wpa_clustering clusters the parents of a task, one of PACKING_MODES. Only used by the wpa
+            strategy
+        max_cluster_size (int): maximum number of fireworks in a cluster. The wpa strategy uses it with first_fit or
+            best_fit packing
+        strategy (str): name of the registered clustering strategy, see swarmform.core.clustering_algo.strategies
+        priority (str): one of PRIORITY_MODES to rank the clustered fireworks by their place on the critical path of
+            the clustered swarmflow and save the rank to spec['_priority'], so that the LaunchPad runs the most
+            critical ready fireworks first. Priorities are not set if not given
+
+    Returns:
+        Clustered_swarmflow (SwarmFlow)
+    """
+    strategy_options = get_strategy_options(strategy, packing, max_cluster_size)
+    if priority is not None and priority not in PRIORITY_MODES:
+        raise ValueError('Unknown priority {}, use one of {}'.format(priority, ', '.join(PRIORITY_MODES)))
+    profile = get_profile(profile)
+    profile.info['sf_id'] = sf_id
+    profile.info['strategy'] = strategy
+    with profile.watch(swarmpad):
+        # Retrieve the relevant swarmflow from the swarmpad
+        with profile.stage('fetch'):
+            sf = swarmpad.get_sf_by_id(sf_id)
+        profile.count('nodes', len(sf.fws))
+        profile.count('edges', sum(len(children) for children in sf.links.values()))
+        plan = None
+        if plan_cache is not None:
+            plan_options = {'cluster_key_seed': cluster_key_seed}
+            # plans of the original pairs packing keep the keys they were cached with
+            if strategy != DEFAULT_STRATEGY or packing != 'pairs':
+                plan_options.update(strategy_options)
+            with profile.stage('plan_cache_lookup'):
+                plan = plan_cache.lookup(sf.links, sf.fw_costs, algorithm=strategy, options=plan_options,
+                                         fw_ids=[fw.fw_id for fw in sf.fws])
+            profile.count('plan_cache_hits' if plan is not None else 'plan_cache_misses')
+        if plan is None:
+            with profile.stage('dag_init'):
+                sf_dag = DAG(sf, cluster_key_seed=cluster_key_seed)
+            if strategy == DEFAULT_STRATEGY:
+                with profile.stage('cluster_vertically'):
+                    vertically_clustered_dag = cluster_vertically(sf_dag)
+                # Cluster the swarmflow DAG
+                with profile.stage('wpa_clustering'):
+                    clustered_sf_dag = wpa_clustering(vertically_clustered_dag, **strategy_options)
+            else:
+                with profile.stage('{}_clustering'.format(strategy)):
+                    clustered_sf_dag = cluster_dag(sf_dag, strategy, **strategy_options)
+            with profile.stage('clustering_plan'):
+                plan = clustered_sf_dag.get_clustering_plan()
+            if plan_cache is not None:
+                with profile.stage('plan_cache_save'):
+                    plan_cache.save(sf.links, sf.fw_costs, plan, algorithm=strategy, options=plan_options,
+                                    fw_ids=[fw.fw_id for fw in sf.fws])
+        else:
+            swarmpad.m_logger.info('Using the cached clustering plan of SwarmFlow {}'.format(sf_id))
+        with profile.stage('create_clustered_sf'):
+            clustered_sf = create_clustered_sf(swarmpad, sf, plan, priority)
+    count_clusters(profile, plan)
+    profile.publish()
+    return clustered_sf
+
+
+def get_strategy_options(strategy, packing='pairs', max_cluster_size=None):
+    """
+    Check the clustering options and return them as the keyword options of the strategy
+
+    Args:
+        strategy (str): name of the registered clustering strategy
+        packing (str): packing mode of the wpa strategy
+        max_cluster_size (int): maximum number of fireworks in a cluster
+
+    Returns:
+        options (dict)
+    """
+    get_strategy(strategy)
+    if strategy == DEFAULT_STRATEGY:
+        check_packing(packing, max_cluster_size)
+        return {'packing': packing, 'max_cluster_size': max_cluster_size}
+    if packing != 'pairs':
+        raise ValueError('Packing modes are only supported by the {} strategy'.format(DEFAULT_STRATEGY))
+    return {'max_cluster_size': max_cluster_size}
+
+
+def count_clusters(profile, plan):
+    """
+    Count the clusters of a clustering plan in the profile: the fireworks of the clustered swarmflow, the clusters of
+    more than one firework, and the sequential and parallel clusters among them
+    """
+    profile.count('clustered_fws', len(plan['clusters']))
+    for cluster in plan['clusters']:
+        if len(cluster['sequential_ids']) > 1:
+            profile.count('clusters_formed')
+            profile.count('sequential_clusters')
+        profile.count('parallel_clusters', len(cluster['parallel_ids']))
+        profile.count('clusters_formed', len(cluster['parallel_ids']))
+
+
+def get_unclustered_query(name_pattern=None, sf_id_range=None):
+    """
+    MongoDB query selecting the swarmflows which are not yet clustered: swarmflows which are not archived and are not
+    the result of clustering (which have a plan fingerprint in their metadata)
+
+    Args:
+        name_pattern (str): regular expression the name of the swarmflows must match
+        sf_id_range (tuple): first and last (inclusive) sf_id of the swarmflows
+
+    Returns:
+        query (dict)
+    """
+    query = {'state': {'$ne': 'ARCHIVED'}, 'metadata.plan_fingerprint': {'$exists': False}}
+    if name_pattern is not None:
+        query['name'] = {'$regex': name_pattern}
+    if sf_id_range is not None:
+        query['sf_id'] = {'$gte': sf_id_range[0], '$lte': sf_id_range[1]}
+    return query
+
+
+def create_clustered_sf(swarmpad, sf, plan, priority=None):
+
+    """
+    Create the clustered swarmflow of a swarmflow from its clustering plan. The fireworks are taken from sf.id_fw,
+    so no further queries are made to the swarmpad.
+    The metadata of the clustered swarmflow keeps the aggregated costs of the clustered fireworks in 'costs' (see
+    get_plan_costs), so that it can be clustered again, and maps the ids of the original fireworks to the ids of the
+    clustered fireworks running them in 'provenance', in the format of {'fw_id': clustered fw_id}. The provenance of a
+    swarmflow which is itself clustered is extended, so the map always starts from the first swarmflow.
+
+    Args:
+        swarmpad (SwarmPad)
+        sf (SwarmFlow): swarmflow which is clustered
+        plan (dict): clustering plan in the format returned by DAG.get_clustering_plan
+        priority (str): one of PRIORITY_MODES to set spec['_priority'] of the clustered fireworks from the costs of
+            the swarmflow, None to leave it unset
 
     Returns:
         Clustered_swarmflow (SwarmFlow)
     """
-    # Retrieve the relevant swarmflow from the swarmpad
-    sf = swarmpad.get_sf_by_id(sf_id)
-    sf_dag = DAG(sf)
-    vertically_clustered_dag = cluster_vertically(sf_dag)
-    # Cluster the swarmflow DAG
-    clustered_sf_dag = wpa_clustering(vertically_clustered_dag)
     # Get parent-child relationships of the clustered dag {cluster_id : [fw_ids] }
     # eg: links {17: [18, 19, 21, 20], 18: [23], 19: [23], 21: [23], 20: [23]}
-    links_dict = clustered_sf_dag.get_parent_child_relationships()
-    # Get nodes of the clustered dag { cluster_id: Node }
-    nodes = clustered_sf_dag.get_nodes()
+    links_dict = {parent_id: list(child_ids) for parent_id, child_ids in plan['links']}
     clustered_fws = []
-
-    for key in nodes:
+    # Ids of the new fireworks, negative to avoid collisions with the ids of the existing fireworks
+    new_fw_ids = count(-1, -1)
+    # Priorities of the clusters in the format of {cluster fw_id: priority}
+    priorities = DAG.from_plan(plan, sf.fw_costs).get_priorities(priority) if priority is not None else None
+    plan_costs = get_plan_costs(plan, sf.fw_costs)
+    # Costs and fireworks of the clustered fireworks in the format of {'clustered fw_id': ...}
+    costs = {}
+    provenance = {}
+
+    for cluster in plan['clusters']:
         # Dictionary of parallel clusters
-        fw_ids_to_cluster_parallely = nodes[key].get_fw_ids_to_cluster_parallely()
+        fw_ids_to_cluster_parallely = dict((key, fw_ids) for key, fw_ids in cluster['parallel_ids'])
         # List of sequential fireworks
-        fw_ids_to_cluster_sequentially = nodes[key].get_fw_ids_to_cluster_sequentially()
+        fw_ids_to_cluster_sequentially = cluster['sequential_ids']
 
         # List for storing parallely clustered fireworks
         parallely_clustered_fws = []
@@ -154,7 +326,9 @@ def cluster_sf(swarmpad, sf_id):
 
         if len(fw_ids_to_cluster_parallely) != 0:
             for cluster_id in fw_ids_to_cluster_parallely:
-                parallely_clustered_fw = combine_fws_parallely(swarmpad, fw_ids_to_cluster_parallely[cluster_id])
+                parallely_clustered_fw = combine_fws_parallely(swarmpad, fw_ids_to_cluster_parallely[cluster_id],
+                                                               fw_id=next(new_fw_ids), created_on=sf.created_on,
+                                                               id_fw=sf.id_fw)
                 parallely_clustered_fws.append(parallely_clustered_fw)
                 parallely_clustered_fw_ids.update({cluster_id: parallely_clustered_fw.fw_id})
 
@@ -165,17 +339,34 @@ def cluster_sf(swarmpad, sf_id):
         # If multiple fireworks are available, cluster them and to clustered_fws
         if len(fw_ids_to_cluster_sequentially) > 1:
             combined_fw = combine_fws_sequentially(swarmpad, fw_ids_to_cluster_sequentially, parallely_clustered_fws,
-                                                   parallely_clustered_fw_ids)
+                                                   parallely_clustered_fw_ids, fw_id=next(new_fw_ids),
+                                                   created_on=sf.created_on, id_fw=sf.id_fw)
             for fw_id in fw_ids_to_cluster_sequentially:
                 links_dict = update_parent_child_relationships(links_dict, fw_id, combined_fw.fw_id)
 
+        # If the cluster is a single parallel step, the parallely clustered firework is the clustered firework
+        elif len(fw_ids_to_cluster_sequentially) == 1 and parallely_clustered_fws:
+            combined_fw = parallely_clustered_fws[0]
+
         # If only a single firework is available, add it directly to clustered_fws
         elif len(fw_ids_to_cluster_sequentially) == 0 or len(fw_ids_to_cluster_sequentially) == 1:
-            combined_fw = swarmpad.get_fw_by_id(nodes[key].get_fw_id())
+            combined_fw = get_fw(swarmpad, cluster['fw_id'], sf.id_fw)
         else:
             raise ValueError(
                 "Issue with the firework ids to cluster: {}".format(fw_ids_to_cluster_sequentially))
+        if priorities is not None:
+            combined_fw.spec['_priority'] = priorities[cluster['fw_id']]
+        if str(cluster['fw_id']) in plan_costs:
+            costs[str(combined_fw.fw_id)] = plan_costs[str(cluster['fw_id'])]
+        for step in get_cluster_steps(cluster):
+            for fw_id in step:
+                provenance[str(fw_id)] = combined_fw.fw_id
         clustered_fws.append(combined_fw)
 
-    clustered_swarmflow = SwarmFlow(fireworks=clustered_fws, links_dict=links_dict)
+    if 'provenance' in sf.metadata:
+        provenance = {original_id: provenance[str(fw_id)] for original_id, fw_id in sf.metadata['provenance'].items()
+                      if str(fw_id) in provenance}
+    metadata = {'plan_fingerprint': fingerprint_plan(plan), 'costs': costs, 'provenance': provenance}
+    clustered_swarmflow = SwarmFlow(fireworks=clustered_fws, links_dict=links_dict, metadata=metadata,
+                                    created_on=sf.created_on, updated_on=sf.updated_on)
     return clustered_swarmflow
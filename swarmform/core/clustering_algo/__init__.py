@@ -0,0 +1 @@
+from swarmform.core.clustering_algo.strategies import cluster_dag, get_strategy, get_strategy_names, register_strategy
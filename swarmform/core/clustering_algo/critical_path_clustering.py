@@ -0,0 +1,75 @@
+from swarmform.core.clustering_algo.horizontal_clustering import check_cluster_size, merge_clusters
+from swarmform.core.clustering_algo.wpa_clustering import cluster_vertically
+from swarmform.core.swarm_dag import CRITICAL_SLACK_TOLERANCE
+
+
+def get_earliest_start(task, earliest_start):
+
+    """
+    Args:
+        task (Node)
+        earliest_start (dict): earliest start times of the parents of the task in the format of {fw_id: time}
+
+    Returns:
+        earliest start time of the task, when all its parents have finished
+    """
+    return max([earliest_start[parent.get_fw_id()] + parent.get_exec_time() for parent in task.get_parents() or []],
+               default=0)
+
+
+def critical_path_clustering(workflow, max_cluster_size=None):
+
+    """
+    Critical path aware clustering: chains of tasks are clustered vertically, and the tasks of each level which are
+    not on the critical path are clustered sequentially within their slack. A cluster starts when the last of its
+    tasks can start, and must finish before the earliest latest finish time of its tasks, so the clusters do not
+    delay the critical path. Tasks on the critical path are not clustered horizontally. The earliest start times are
+    updated with the clusters of the previous levels, so that the slack of a path is only used once.
+
+    Args:
+        workflow (DAG)
+        max_cluster_size (int): maximum number of tasks in a cluster, DEFAULT_CLUSTER_SIZE if not given
+
+    Returns:
+        Clustered workflow DAG (DAG)
+    """
+    max_cluster_size = check_cluster_size(max_cluster_size)
+    workflow = cluster_vertically(workflow)
+    schedule = workflow.get_schedule()
+    # the earliest start times are updated with the clusters, the cached schedule of the DAG is left untouched
+    earliest_start = dict(schedule['earliest_start'])
+    latest_start = schedule['latest_start']
+    tolerance = CRITICAL_SLACK_TOLERANCE * schedule['makespan']
+    for level in range(1, workflow.get_height() + 1):
+        tasks = []
+        for task in workflow.iter_level(level):
+            earliest_start[task.get_fw_id()] = get_earliest_start(task, earliest_start)
+            if latest_start[task.get_fw_id()] - earliest_start[task.get_fw_id()] > tolerance:
+                tasks.append(task)
+        tasks.sort(key=lambda task: task.get_exec_time(), reverse=True)
+        # clusters of the level in the format of {'start': x, 'exec_time': y, 'finish_by': z, 'tasks': [Node]}
+        open_clusters = []
+        clusters = []
+        for task in tasks:
+            fw_id = task.get_fw_id()
+            finish_by = latest_start[fw_id] + task.get_exec_time()
+            for cluster in open_clusters:
+                start = max(cluster['start'], earliest_start[fw_id])
+                if start + cluster['exec_time'] + task.get_exec_time() <= min(cluster['finish_by'], finish_by):
+                    cluster['start'] = start
+                    cluster['exec_time'] += task.get_exec_time()
+                    cluster['finish_by'] = min(cluster['finish_by'], finish_by)
+                    cluster['tasks'].append(task)
+                    if len(cluster['tasks']) == max_cluster_size:
+                        open_clusters.remove(cluster)
+                    break
+            else:
+                cluster = {'start': earliest_start[fw_id], 'exec_time': task.get_exec_time(), 'finish_by': finish_by,
+                           'tasks': [task]}
+                clusters.append(cluster)
+                open_clusters.append(cluster)
+        for cluster in clusters:
+            for clustered_task in merge_clusters(workflow, [cluster['tasks']], level):
+                # the children of the cluster start when all of its tasks have finished
+                earliest_start[clustered_task.get_fw_id()] = cluster['start']
+    return workflow
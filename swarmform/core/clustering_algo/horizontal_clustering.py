@@ -0,0 +1,145 @@
+import heapq
+import math
+
+from swarmform.core.swarm_dag import Node
+
+# Number of tasks in a cluster of the horizontal and level clustering if no maximum cluster size is given
+DEFAULT_CLUSTER_SIZE = 8
+
+
+def check_cluster_size(max_cluster_size):
+
+    """
+    Args:
+        max_cluster_size (int): maximum number of tasks in a cluster, None for the default
+
+    Returns:
+        int: the maximum cluster size, DEFAULT_CLUSTER_SIZE if none is given
+    """
+    if max_cluster_size is None:
+        return DEFAULT_CLUSTER_SIZE
+    if max_cluster_size < 2:
+        raise ValueError('The maximum cluster size must be at least 2')
+    return max_cluster_size
+
+
+def create_sequential_cluster(tasks, c_level):
+
+    """
+    Create a DAG Node object which runs the given tasks one after the other.
+    The fw_id of the task with the most cores is the fw_id of the clustered node, which requires the most cores of its
+    tasks and runs for the sum of their execution times. Tasks which are themselves clusters keep their sequential and
+    parallel fireworks.
+
+    Args:
+        tasks (list(Node)): tasks to be clustered, in the order they run
+        c_level (int): level of the clustered node
+
+    Returns:
+        Node
+    """
+    widest_task = max(tasks, key=lambda task: task.get_num_cores())
+    cluster = Node(fw_id=widest_task.get_fw_id(), level=c_level,
+                   fw_info={'exec_time': sum(task.get_exec_time() for task in tasks),
+                            'cores': widest_task.get_num_cores()},
+                   parents=[], children=[], assigned=True)
+    cls_info = {}
+    sequential_ids = []
+    for task in tasks:
+        cls_info.update(task.get_cluster_info())
+        sequential_ids.extend(task.get_fw_ids_to_cluster_sequentially() or [task.get_fw_id()])
+        for key, fw_ids in task.get_fw_ids_to_cluster_parallely().items():
+            cluster.set_parallel_ids(fw_ids, key)
+    cluster.set_cluster_info(cls_info)
+    cluster.set_sequential_ids(sequential_ids)
+    return cluster
+
+
+def merge_clusters(workflow, clusters, c_level):
+
+    """
+    Replace each group of tasks of more than one task with a sequential cluster in the workflow.
+    The tasks of a group must be at the same level, so that none of them depends on another.
+
+    Args:
+        workflow (DAG)
+        clusters (list(list(Node))): groups of tasks to cluster
+        c_level (int): level of the tasks
+
+    Returns:
+        list of clustered Nodes
+    """
+    cls = []
+    for tasks in clusters:
+        if len(tasks) < 2:
+            continue
+        cluster = create_sequential_cluster(tasks, c_level)
+        workflow.merge_nodes([task.get_fw_id() for task in tasks], cluster)
+        cls.append(cluster)
+    return cls
+
+
+def balance_runtime(tasks, num_clusters):
+
+    """
+    Distribute the tasks to num_clusters clusters with balanced runtimes, by assigning the longest remaining task to
+    the cluster with the shortest runtime
+
+    Args:
+        tasks (list(Node))
+        num_clusters (int)
+
+    Returns:
+        list(list(Node)): tasks of each cluster
+    """
+    clusters = [[] for _ in range(num_clusters)]
+    # heap of (runtime, index) of the clusters
+    runtimes = [(0, index) for index in range(num_clusters)]
+    for task in sorted(tasks, key=lambda task: task.get_exec_time(), reverse=True):
+        runtime, index = heapq.heappop(runtimes)
+        clusters[index].append(task)
+        heapq.heappush(runtimes, (runtime + task.get_exec_time(), index))
+    return clusters
+
+
+def horizontal_clustering(workflow, max_cluster_size=None):
+
+    """
+    Horizontal runtime balancing: the tasks of each level are clustered into as few clusters of at most
+    max_cluster_size tasks as possible, and the tasks are distributed so that the clusters run for about as long
+
+    Args:
+        workflow (DAG)
+        max_cluster_size (int): maximum number of tasks in a cluster, DEFAULT_CLUSTER_SIZE if not given
+
+    Returns:
+        Clustered workflow DAG (DAG)
+    """
+    max_cluster_size = check_cluster_size(max_cluster_size)
+    for level in range(1, workflow.get_height() + 1):
+        tasks = list(workflow.iter_level(level))
+        num_clusters = int(math.ceil(len(tasks) / float(max_cluster_size)))
+        if num_clusters < len(tasks):
+            merge_clusters(workflow, balance_runtime(tasks, num_clusters), level)
+    return workflow
+
+
+def level_clustering(workflow, max_cluster_size=None):
+
+    """
+    Level based clustering: the tasks of each level are clustered in their order into clusters of max_cluster_size
+    tasks
+
+    Args:
+        workflow (DAG)
+        max_cluster_size (int): number of tasks in a cluster, DEFAULT_CLUSTER_SIZE if not given
+
+    Returns:
+        Clustered workflow DAG (DAG)
+    """
+    max_cluster_size = check_cluster_size(max_cluster_size)
+    for level in range(1, workflow.get_height() + 1):
+        tasks = list(workflow.iter_level(level))
+        merge_clusters(workflow, [tasks[start:start + max_cluster_size]
+                                  for start in range(0, len(tasks), max_cluster_size)], level)
+    return workflow
@@ -0,0 +1,71 @@
+"""
+Registry of the clustering strategies. A strategy is a function which takes a DAG and keyword options and returns the
+clustered DAG. Every strategy accepts the max_cluster_size option, the wpa strategy also accepts packing.
+"""
+from swarmform.core.clustering_algo.critical_path_clustering import critical_path_clustering
+from swarmform.core.clustering_algo.horizontal_clustering import horizontal_clustering, level_clustering
+from swarmform.core.clustering_algo.wpa_clustering import cluster_vertically, wpa_clustering
+
+DEFAULT_STRATEGY = 'wpa'
+
+_strategies = {}
+
+
+def register_strategy(name, strategy):
+    """
+    Args:
+        name (str): name of the strategy
+        strategy (callable): function which takes a DAG and keyword options and returns the clustered DAG
+    """
+    if name in _strategies:
+        raise ValueError('Clustering strategy {} is already registered'.format(name))
+    _strategies[name] = strategy
+
+
+def get_strategy(name):
+    """
+    Args:
+        name (str): name of a registered strategy
+
+    Returns:
+        callable: the clustering strategy
+    """
+    if name not in _strategies:
+        raise ValueError('Unknown clustering strategy {}, use one of {}'.format(name, ', '.join(get_strategy_names())))
+    return _strategies[name]
+
+
+def get_strategy_names():
+    """
+    Returns:
+        list: names of the registered strategies, in the order they were registered
+    """
+    return list(_strategies)
+
+
+def cluster_dag(workflow, strategy=DEFAULT_STRATEGY, **options):
+    """
+    Cluster a DAG with a registered strategy
+
+    Args:
+        workflow (DAG)
+        strategy (str): name of the strategy
+        options: options of the strategy
+
+    Returns:
+        Clustered workflow DAG (DAG)
+    """
+    return get_strategy(strategy)(workflow, **options)
+
+
+def wpa_strategy(workflow, packing='pairs', max_cluster_size=None):
+    """
+    Vertical clustering of chains followed by WPA clustering, as done by cluster_sf by default
+    """
+    return wpa_clustering(cluster_vertically(workflow), packing, max_cluster_size)
+
+
+register_strategy('wpa', wpa_strategy)
+register_strategy('horizontal', horizontal_clustering)
+register_strategy('level', level_clustering)
+register_strategy('critical_path', critical_path_clustering)
@@ -1,5 +1,9 @@
-from swarmform.core.swarm_dag import Node, DAG
-from random import randrange
+from swarmform.core.swarm_dag import Node
+
+# Modes of packing the parents of a task into clusters. 'pairs' clusters at most two parents and fills the free cores
+# of the clusters with resource_balance, 'first_fit' and 'best_fit' pack any number of parents with pack_tasks
+PACKING_MODES = ('pairs', 'first_fit', 'best_fit')
+
 
 def get_tasks_at_level(workflow, level):
 
@@ -13,17 +17,14 @@ def get_tasks_at_level(workflow, level):
     Returns:
         list(Node)
     """
-    tasks = []
-    for task in workflow.get_nodes():
-        if workflow.get_nodes()[task].get_level() == level:
-            tasks.append(workflow.get_nodes()[task])
-    return tasks
+    return list(workflow.iter_level(level))
 
 
 def get_longest_parent(task):
 
     """
-    Returns the parent of the given task which has the longest execution time
+    Returns the parent of the given task which has the longest execution time.
+    The longest parent is computed once and cached on the task.
 
     Args:
         task (Node)
@@ -31,17 +32,14 @@ def get_longest_parent(task):
     Returns:
         Node
     """
-    longest_parent = task.get_parents()[0]
-    for parent in task.get_parents():
-        if longest_parent.get_exec_time() < parent.get_exec_time():
-            longest_parent = parent
-    return longest_parent
+    return task.get_longest_parent()
 
 
 def sort_tasks_by_longest_parent(tasks):
 
     """
-    Sort the list of tasks considering the longest parents of the tasks
+    Sort the list of tasks in ascending order by the execution time of the longest parents of the tasks.
+    The sort is stable, tasks with equally long parents keep their order.
 
     Args:
         tasks (list(Node))
@@ -49,20 +47,17 @@ def sort_tasks_by_longest_parent(tasks):
     Returns:
         list(Node)
     """
-    n = len(tasks)
     if len(tasks) == 1:
         return tasks
-    for i in range(n):
-        for j in range(0, n - i - 1):
-            if get_longest_parent(tasks[j]).get_exec_time() > get_longest_parent(tasks[j + 1]).get_exec_time():
-                tasks[j], tasks[j + 1] = tasks[j + 1], tasks[j]
+    tasks.sort(key=lambda task: get_longest_parent(task).get_exec_time())
     return tasks
 
 
 def sort_tasks_by_exec_time(tasks):
 
     """
-    Sort tasks in descending order by the execution time
+    Sort tasks in descending order by the execution time.
+    The sort is stable, tasks with equal execution times keep their order.
 
     Args:
         tasks (list(Node)
@@ -70,11 +65,7 @@ def sort_tasks_by_exec_time(tasks):
     Returns:
         list(Node)
     """
-    n = len(tasks)
-    for i in range(n):
-        for j in range(0, n - i - 1):
-            if tasks[j].get_exec_time() < tasks[j+1].get_exec_time():
-                tasks[j], tasks[j + 1] = tasks[j + 1], tasks[j]
+    tasks.sort(key=lambda task: task.get_exec_time(), reverse=True)
     return tasks
 
 
@@ -123,13 +114,9 @@ def is_parent_already_assigned(task, parent_id):
         parent_id (fw_id)
 
     Returns:
-        int
+        bool
     """
-    parents = task.get_parents()
-    for parent in parents:
-        if parent.get_fw_id() == parent_id:
-            return True
-    return False
+    return task.has_parent(parent_id)
 
 
 def is_child_already_assigned(task, child_id):
@@ -142,22 +129,83 @@ def is_child_already_assigned(task, child_id):
         child_id (fw_id)
 
     Returns:
-        int
+        bool
+    """
+    return task.has_child(child_id)
+
+
+def create_cluster(cluster_c, cls_info, c_level):
+
+    """
+    Create a DAG Node object embedding the given pair of clustered nodes.
+    Set the fw_id of the node with the most cores as the fw_id of the clustered node and
+    set the sum of execution times of all the nodes as cluster execution time and
+    maximum number of cores as the cluster required cores.
+    Nodes which are themselves clusters of a chain keep their sequence and the information of all their fireworks.
+
+    Args:
+        cluster_c (list(Node)): nodes to be clustered
+        cls_info (dict): cluster information in format of {fw_id: fw_info}
+        c_level (int): level of the clustered node
+
+    Returns:
+        Node
+    """
+    first_cluster_node = cluster_c[0]
+    second_cluster_node = cluster_c[1]
+    # Set the task which has maximum number of nodes to the begging of the sequential list
+    if first_cluster_node.get_num_cores() < second_cluster_node.get_num_cores():
+        first_cluster_node, second_cluster_node = second_cluster_node, first_cluster_node
+    core_space = first_cluster_node.get_num_cores() - second_cluster_node.get_num_cores()
+    sequential_ids = []
+    for node in (first_cluster_node, second_cluster_node):
+        cls_info.update(node.get_cluster_info())
+        sequential_ids.extend(node.get_fw_ids_to_cluster_sequentially() or [node.get_fw_id()])
+
+    cluster = Node(fw_id=first_cluster_node.get_fw_id(), level=c_level,
+                   fw_info={'exec_time': get_sum_0f_exec_time(cluster_c),
+                            'cores': first_cluster_node.get_num_cores()},
+                   parents=[], children=[], assigned=True)
+    cluster.set_cluster_info(cls_info)
+    cluster.set_sequential_ids(sequential_ids)
+    # Set the information about the cluster space available in the cluster to fit other nodes
+    # to reduce the resource utilization. The space is next to the last task, if it is a single firework
+    if len(second_cluster_node.get_cluster_info()) == 1:
+        cluster.set_cluster_space([second_cluster_node.get_exec_time(), core_space])
+    return cluster
+
+
+def merge_cluster(cluster_c, cls_info, c_level, workflow):
+
+    """
+    Replace the given pair of nodes with their clustered node in the workflow, unless one of them depends on the other
+
+    Args:
+        cluster_c (list(Node)): nodes to be clustered
+        cls_info (dict): cluster information in format of {fw_id: fw_info}
+        c_level (int): level of the clustered node
+        workflow (DAG)
+
+    Returns:
+        list with the clustered Node, empty if the nodes are not clustered
     """
-    children = task.get_children()
-    for child in children:
-        if child.get_fw_id() == child_id:
-            return True
-    return False
+    fw_ids = [node.get_fw_id() for node in cluster_c]
+    if not workflow.can_merge_nodes(fw_ids):
+        return []
+    cluster = create_cluster(cluster_c, cls_info, c_level)
+    workflow.merge_nodes(fw_ids, cluster)
+    return [cluster]
 
 
-def assign_parent_to_clusters(task):
+def assign_parent_to_clusters(task, workflow):
 
     """
-    Assign parent tasks of a given node to clusters
+    Assign parent tasks of a given node to clusters and replace the clustered parents in the workflow.
+    Parents at different levels may depend on each other, such pairs are not clustered.
 
     Args:
         task (Node)
+        workflow (DAG)
 
     Returns:
         list of clustered Nodes
@@ -176,7 +224,7 @@ def assign_parent_to_clusters(task):
         c += 1
         cluster_c.append(longest_parent)
         max_run_time = longest_parent.get_exec_time()
-        longest_parent._is_assigned = True
+        longest_parent.set_is_assigned(True)
     # Get the unassigned parents of node
     par_list = get_unassigned_parents(task)
     if len(par_list) > 0:
@@ -194,140 +242,217 @@ def assign_parent_to_clusters(task):
             if (get_sum_0f_exec_time(cluster_c) + task.get_exec_time() <= max_run_time) and len(cluster_c) < 2:
                 cluster_c.append(task)
                 cls_info[task.get_fw_id()] = {'exec_time': task.get_exec_time(), 'cores': task.get_num_cores()}
-                # Mark the task as assigned
-                task.isAssigned = True
             else:
                 # If the sum of execution time current cluster and current node is larger than the maximum run time.
                 # Stop adding node to the current cluster.
                 if (len(cls_info)) > 1:  # check the current cluster has more than one node
-                    # Create a DAG Node object embedding the current clustered nodes.
-                    # Set the fw_id of the first node as the fw_id of the clustered node and
-                    # set the sum of execution times of all the nodes as cluster execution time and
-                    # maximum number of cores as the cluster required cores.
-                    core_space = 0
-                    sequential_ids = []
-                    first_cluster_node = cluster_c[0]
-                    second_cluster_node = cluster_c[1]
-                    # Set the task which has maximum number of nodes to the begging of the sequential list
-                    if first_cluster_node.get_num_cores() >= second_cluster_node.get_num_cores():
-                        core_space = first_cluster_node.get_num_cores()-second_cluster_node.get_num_cores()
-                        sequential_ids = [first_cluster_node.get_fw_id(), second_cluster_node.get_fw_id()]
-                    elif first_cluster_node.get_num_cores() < second_cluster_node.get_num_cores():
-                        core_space = second_cluster_node.get_num_cores() - first_cluster_node.get_num_cores()
-                        sequential_ids = [second_cluster_node.get_fw_id(), first_cluster_node.get_fw_id()]
-
-                    cluster = Node(fw_id=sequential_ids[0], level=c_level,
-                                   fw_info={'exec_time': get_sum_0f_exec_time(cluster_c),
-                                            'cores': cls_info[sequential_ids[0]]['cores']},
-                                   parents=[], children=[], assigned=True)
-                    cluster.set_cluster_info(cls_info)
-                    cluster.set_sequential_ids(sequential_ids)
-                    # Set the information about the cluster space available in the cluster to fit other nodes
-                    # to reduce the resource utilization.
-                    cluster.set_cluster_space([cls_info[cluster.get_fw_ids_to_cluster_sequentially()[1]]['exec_time'], core_space])
-                    # Add the children to new clustered node
-                    for tsk in cluster_c:
-                        children = tsk.get_children()
-                        if children is None:
-                            continue
-                        for child in children:
-                            if not is_child_already_assigned(cluster, child.get_fw_id()):
-                                cluster.add_child(child)
-                    # Add the parents to the new clustered node
-                    for tsk in cluster_c:
-                        parents = tsk.get_parents()
-                        if parents is None:
-                            continue
-                        for parent in parents:
-                            if not is_parent_already_assigned(cluster, parent.get_fw_id()):
-                                cluster.add_parent(parent)
-                    # Add clustered node as the parent of the children of the clustered tasks
-                    for tsk in cluster_c:
-                        children = tsk.get_children()
-                        if children is None:
-                            continue
-                        for child in children:
-                            child.remove_parent(tsk.get_fw_id())
-                            if not is_parent_already_assigned(child, cluster.get_fw_id()):
-                                child.add_parent(cluster)
-                    # Add clustered node as the children of the parents of the clustered tasks
-                    for tsk in cluster_c:
-                        parents = tsk.get_parents()
-                        if parents is None:
-                            continue
-                        for parent in parents:
-                            parent.remove_child(tsk.get_fw_id())
-                            if not is_child_already_assigned(parent, cluster.get_fw_id()):
-                                parent.add_child(cluster)
-                    cls.append(cluster)
+                    # Replace the clustered tasks with the clustered node in the workflow
+                    cls.extend(merge_cluster(cluster_c, cls_info, c_level, workflow))
                     # Sets a new cluster
                     cluster_c = []
                     cls_info = {}
                     c += 1
                     cluster_c.append(task)
                     cls_info[task.get_fw_id()] = {'exec_time': task.get_exec_time(), 'cores': task.get_num_cores()}
-                    task.isAssigned = True
             # Handle the last task of the list
             if len(par_list) == 0:
                 if (len(cls_info)) > 1:
-                    core_space = 0
-                    sequential_ids = []
-                    first_cluster_node = cluster_c[0]
-                    second_cluster_node = cluster_c[1]
-                    # Set the task which has maximum number of nodes to the begging of the sequential list
-                    if first_cluster_node.get_num_cores() >= second_cluster_node.get_num_cores():
-                        core_space = first_cluster_node.get_num_cores() - second_cluster_node.get_num_cores()
-                        sequential_ids = [first_cluster_node.get_fw_id(), second_cluster_node.get_fw_id()]
-                    elif first_cluster_node.get_num_cores() < second_cluster_node.get_num_cores():
-                        core_space = second_cluster_node.get_num_cores() - first_cluster_node.get_num_cores()
-                        sequential_ids = [second_cluster_node.get_fw_id(), first_cluster_node.get_fw_id()]
-
-                    cluster = Node(fw_id=sequential_ids[0], level=c_level,
-                                   fw_info={'exec_time': get_sum_0f_exec_time(cluster_c),
-                                            'cores': cls_info[sequential_ids[0]]['cores']},
-                                   parents=[], children=[], assigned=True)
-                    cluster.set_cluster_info(cls_info)
-                    cluster.set_sequential_ids(sequential_ids)
-                    # Set the information about the cluster space available in the cluster to fit other nodes to
-                    # reduce the resource utilization.
-                    cluster.set_cluster_space(
-                        [cls_info[cluster.get_fw_ids_to_cluster_sequentially()[1]]['exec_time'], core_space])
-                    # Add the children to new clustered node
-                    for tsk in cluster_c:
-                        children = tsk.get_children()
-                        if children is None:
-                            continue
-                        for child in children:
-                            if not is_child_already_assigned(cluster, child.get_fw_id()):
-                                cluster.add_child(child)
-                    for tsk in cluster_c:
-                        parents = tsk.get_parents()
-                        if parents is None:
-                            continue
-                        for parent in parents:
-                            if not is_parent_already_assigned(cluster, parent.get_fw_id()):
-                                cluster.add_parent(parent)
-                    for tsk in cluster_c:
-                        children = tsk.get_children()
-                        if children is None:
-                            continue
-                        for child in children:
-                            child.remove_parent(tsk.get_fw_id())
-                            if not is_parent_already_assigned(child, cluster.get_fw_id()):
-                                child.add_parent(cluster)
-                    for tsk in cluster_c:
-                        parents = tsk.get_parents()
-                        if parents is None:
-                            continue
-                        for parent in parents:
-                            parent.remove_child(tsk.get_fw_id())
-                            if not is_child_already_assigned(parent, cluster.get_fw_id()):
-                                parent.add_child(cluster)
-                    cls.append(cluster)
+                    cls.extend(merge_cluster(cluster_c, cls_info, c_level, workflow))
                 break
     return cls
 
 
+def check_packing(packing, max_cluster_size=None):
+
+    """
+    Check the packing mode and the maximum cluster size given to the clustering algorithms
+
+    Args:
+        packing (str): one of PACKING_MODES
+        max_cluster_size (int): maximum number of tasks packed into a cluster, None for no limit
+    """
+    if packing not in PACKING_MODES:
+        raise ValueError('Unknown packing mode {}, use one of {}'.format(packing, ', '.join(PACKING_MODES)))
+    if max_cluster_size is not None and max_cluster_size < 2:
+        raise ValueError('The maximum cluster size must be at least 2')
+
+
+def can_run_parallely(task):
+
+    """
+    Checks whether the task is a single firework, which can share a parallel step of a cluster with other tasks
+
+    Args:
+        task (Node)
+
+    Returns:
+        bool
+    """
+    return len(task.get_cluster_info()) == 1
+
+
+def find_step(cluster, task, max_run_time):
+
+    """
+    Find the step of a packed cluster to run the task in, which increases the execution time of the cluster the least.
+    The task either runs in parallel with the tasks of an existing step on the free cores of the cluster, or in a new
+    step after the existing ones.
+
+    Args:
+        cluster (dict): packed cluster in the format of {'cores': x, 'exec_time': y, 'steps': [step]} where a step is
+            {'exec_time': x, 'cores': y, 'tasks': [Node]}
+        task (Node)
+        max_run_time (int): maximum execution time of the cluster
+
+    Returns:
+        (dict, int): the step, None for a new step, and the increase of the execution time of the cluster,
+            or (None, None) if the task does not fit
+    """
+    exec_time = task.get_exec_time()
+    best_step, best_increase = None, None
+    if cluster['exec_time'] + exec_time <= max_run_time:
+        best_increase = exec_time
+    if can_run_parallely(task):
+        for step in cluster['steps']:
+            if step['cores'] + task.get_num_cores() > cluster['cores'] or not can_run_parallely(step['tasks'][0]):
+                continue
+            increase = max(0, exec_time - step['exec_time'])
+            if cluster['exec_time'] + increase <= max_run_time and (best_increase is None or increase < best_increase):
+                best_step, best_increase = step, increase
+    if best_increase is None:
+        return None, None
+    return best_step, best_increase
+
+
+def pack_tasks(tasks, max_run_time, packing='best_fit', max_cluster_size=None):
+
+    """
+    Pack tasks into clusters which run on the cores of their widest task for at most max_run_time.
+    A cluster runs its steps one after the other, and the tasks of a step in parallel on the free cores of the cluster.
+    Tasks are placed widest and longest first. first_fit places a task in the first cluster it fits in, best_fit in the
+    cluster where it leaves the fewest idle core seconds. A task which fits in no cluster opens a new one.
+
+    Args:
+        tasks (list(Node)): tasks to pack
+        max_run_time (int): maximum execution time of a cluster
+        packing (str): 'first_fit' or 'best_fit'
+        max_cluster_size (int): maximum number of tasks in a cluster, None for no limit
+
+    Returns:
+        list of packed clusters in the format used by find_step, in the order they were opened
+    """
+    clusters = []
+    tasks = sorted(tasks, key=lambda task: (task.get_num_cores(), task.get_exec_time()), reverse=True)
+    for task in tasks:
+        if task.get_exec_time() > max_run_time:
+            continue
+        best = None
+        for cluster in clusters:
+            if max_cluster_size is not None and cluster['size'] >= max_cluster_size:
+                continue
+            if task.get_num_cores() > cluster['cores']:
+                continue
+            step, increase = find_step(cluster, task, max_run_time)
+            if increase is None:
+                continue
+            # idle core seconds added to the cluster by placing the task in it
+            idle = increase * cluster['cores'] - task.get_exec_time() * task.get_num_cores()
+            if best is None or idle < best[0] or (idle == best[0] and cluster['exec_time'] > best[1]['exec_time']):
+                best = (idle, cluster, step, increase)
+            if packing == 'first_fit':
+                break
+        if best is None:
+            clusters.append({'cores': task.get_num_cores(), 'exec_time': task.get_exec_time(), 'size': 1,
+                             'steps': [{'exec_time': task.get_exec_time(), 'cores': task.get_num_cores(),
+                                        'tasks': [task]}]})
+            continue
+        _, cluster, step, increase = best
+        if step is None:
+            cluster['steps'].append({'exec_time': task.get_exec_time(), 'cores': task.get_num_cores(),
+                                     'tasks': [task]})
+        else:
+            step['exec_time'] = max(step['exec_time'], task.get_exec_time())
+            step['cores'] += task.get_num_cores()
+            step['tasks'].append(task)
+        cluster['exec_time'] += increase
+        cluster['size'] += 1
+    return clusters
+
+
+def create_packed_cluster(packed_cluster, c_level, workflow):
+
+    """
+    Create a DAG Node object embedding the tasks of a packed cluster. The fw_id of the widest task is the fw_id of the
+    clustered node, steps of several tasks run parallely under a new cluster key and the steps run sequentially.
+    Tasks which are themselves sequential clusters keep their sequence.
+
+    Args:
+        packed_cluster (dict): packed cluster in the format returned by pack_tasks
+        c_level (int): level of the clustered node
+        workflow (DAG): DAG which gives the cluster keys of the parallel steps
+
+    Returns:
+        Node
+    """
+    first_task = packed_cluster['steps'][0]['tasks'][0]
+    cluster = Node(fw_id=first_task.get_fw_id(), level=c_level,
+                   fw_info={'exec_time': packed_cluster['exec_time'], 'cores': packed_cluster['cores']},
+                   parents=[], children=[], assigned=True)
+    cls_info = {}
+    sequential_ids = []
+    for step in packed_cluster['steps']:
+        for task in step['tasks']:
+            cls_info.update(task.get_cluster_info())
+        if len(step['tasks']) > 1:
+            key = workflow.get_new_cluster_key()
+            cluster.set_parallel_ids([task.get_fw_id() for task in step['tasks']], key)
+            sequential_ids.append(key)
+        else:
+            sequential_ids.extend(step['tasks'][0].get_fw_ids_to_cluster_sequentially() or
+                                  [step['tasks'][0].get_fw_id()])
+    cluster.set_cluster_info(cls_info)
+    cluster.set_sequential_ids(sequential_ids)
+    return cluster
+
+
+def pack_parents_to_clusters(task, workflow, packing='best_fit', max_cluster_size=None):
+
+    """
+    Pack the unassigned parents of a given node into clusters which run no longer than its longest parent, and replace
+    the clustered parents in the workflow. Only the parents at the level of the longest parent are packed, as parents
+    at different levels may depend on each other.
+
+    Args:
+        task (Node)
+        workflow (DAG)
+        packing (str): 'first_fit' or 'best_fit'
+        max_cluster_size (int): maximum number of tasks in a cluster, None for no limit
+
+    Returns:
+        list of clustered Nodes
+    """
+    cls = []
+    longest_parent = get_longest_parent(task)
+    c_level = longest_parent.get_level()
+    # As in assign_parent_to_clusters, the longest parent bounds the runtime of the clusters if it is not clustered yet
+    if longest_parent.get_is_assigned():
+        return cls
+    longest_parent.set_is_assigned(True)
+    max_run_time = longest_parent.get_exec_time()
+    par_list = [parent for parent in get_unassigned_parents(task) if parent.get_level() == c_level]
+    for packed_cluster in pack_tasks(par_list, max_run_time, packing, max_cluster_size):
+        if packed_cluster['size'] < 2:
+            continue
+        cluster = create_packed_cluster(packed_cluster, c_level, workflow)
+        for step in packed_cluster['steps']:
+            for parent in step['tasks']:
+                parent.set_is_assigned(True)
+        workflow.merge_nodes([parent.get_fw_id() for step in packed_cluster['steps'] for parent in step['tasks']],
+                             cluster)
+        cls.append(cluster)
+    return cls
+
+
 def resource_balance(clusters_at_level, tasks, wf):
 
     """
@@ -351,54 +476,40 @@ def resource_balance(clusters_at_level, tasks, wf):
             for cluster in clusters_at_level:
                 if bool(cluster.get_fw_ids_to_cluster_parallely()):
                     continue
+                # If the last task of the cluster is a chain of tasks. Skip
+                if not cluster.get_cluster_space():
+                    continue
                 # Check the clustered node has space to fit a unclustered task.
                 # Task should have less or equal number of core requirement and execution time.
-                if cluster.get_cluster_space()[0] >= parent.get_exec_time() and cluster.get_cluster_space()[1] >= parent.get_num_cores():
-                    p_parents = parent.get_parents()
-                    p_children = parent.get_children()
-                    for p_parent in p_parents:
-                        # remove the node as child from node's parent node
-                        p_parent.remove_child(parent.get_fw_id())
-                        # remove the parents from node
-                        parent.remove_parent(p_parent.get_fw_id())
-                        # Assign the parents of the nodes to the new clustered nodes
-                        if not is_parent_already_assigned(cluster, p_parent.get_fw_id()):
-                            cluster.add_parent(p_parent)
-                        # Assign new cluster as the child of parent nodes of the task
-                        if not is_child_already_assigned(p_parent, cluster.get_fw_id()):
-                            p_parent.add_child(cluster)
-                    for p_child in p_children:
-                        # remove the node as parent from node's child node
-                        p_child.remove_parent(parent.get_fw_id())
-                        # remove the children from node
-                        parent.remove_child(p_child.get_fw_id())
-                        # Assign the children of the nodes to the new clustered nodes
-                        if not is_child_already_assigned(cluster, p_child.get_fw_id()):
-                            cluster.add_child(p_child)
-                        # Assign new cluster as the parent of child nodes of the task
-                        if not is_parent_already_assigned(p_child, cluster.get_fw_id()):
-                            p_child.add_parent(cluster)
-                    # Delete the node from the WK
-                    wf.delete_node(parent.get_fw_id())
+                if cluster.get_cluster_space()[0] >= parent.get_exec_time() and cluster.get_cluster_space()[1] >= parent.get_num_cores() \
+                        and wf.can_merge_nodes([cluster.get_fw_id(), parent.get_fw_id()]):
+                    # Move the parents and children of the node to the clustered node and delete the node from the WF
+                    wf.merge_nodes([cluster.get_fw_id(), parent.get_fw_id()], cluster)
+                    cluster.get_cluster_info().update(parent.get_cluster_info())
                     # Assign a minus key to the refer the parallel running jobs
-                    key = -1*randrange(1, 100)
+                    key = wf.get_new_cluster_key()
                     # Set parallel nodes to the cluster
-                    cluster.set_parallel_ids([cluster.get_fw_ids_to_cluster_sequentially()[1],parent.get_fw_id()], key)
+                    cluster.set_parallel_ids([cluster.get_fw_ids_to_cluster_sequentially()[-1], parent.get_fw_id()], key)
                     # Set sequentially running nodes to the cluster
-                    cluster.set_sequential_ids([cluster.get_fw_ids_to_cluster_sequentially()[0], key])
+                    cluster.set_sequential_ids(cluster.get_fw_ids_to_cluster_sequentially()[:-1] + [key])
+                    # The node is clustered. Do not try to fit it in another cluster
+                    break
 
 
-def wpa_clustering(workflow):
+def wpa_clustering(workflow, packing='pairs', max_cluster_size=None):
 
     """
     WPA clustering alogirthm
 
     Args:
         workflow (DAG)
+        packing (str): how the parents of a task are clustered, one of PACKING_MODES. 'pairs' is the original WPA
+        max_cluster_size (int): with first_fit or best_fit, maximum number of tasks in a cluster, None for no limit
 
     Returns:
         Clustered workflow DAG (DAG)
     """
+    check_packing(packing, max_cluster_size)
     # Iterate the WF level by level
     for level in range(workflow.get_height(), 1, -1):
         cls_at_level = []
@@ -409,20 +520,15 @@ def wpa_clustering(workflow):
         # Iterate the tasks of the level
         for task in tasks_at_level_sorted:
             # Assign parents of the task to the clusters
-            cls = assign_parent_to_clusters(task)
-            for cluster in cls:
-                cls_info = cluster.get_cluster_info()
-                temp_wfid = cluster.get_fw_id()
-                for wfid in cls_info:
-                    # Delete the tasks which are clustered from the WF
-                    workflow.delete_node(wfid)
-                # Add new clustered node to the WF
-                workflow.add_node(temp_wfid, cluster)
+            if packing == 'pairs':
+                cls = assign_parent_to_clusters(task, workflow)
+            else:
+                cls = pack_parents_to_clusters(task, workflow, packing, max_cluster_size)
             for cl in cls:
                 cls_at_level.append(cl)
-        # Resource balance
-        resource_balance(cls_at_level, tasks_at_level_sorted, workflow)
-    workflow.update_links()
+        # Resource balance. Packed clusters already run tasks on their free cores
+        if packing == 'pairs':
+            resource_balance(cls_at_level, tasks_at_level_sorted, workflow)
     return workflow
 
 
@@ -459,17 +565,7 @@ def cluster_vertically(workflow):
                 for cls in cluster_c:
                     sequential_id.append(cls.get_fw_id())
                 cluster.set_sequential_ids(sequential_id)
-                if not m_task.get_parents() is None:
-                    for parent in m_task.get_parents():
-                        cluster.add_parent(parent)
-                if not cluster_c[-1].get_children() is None:
-                    for child in cluster_c[-1].get_children():
-                        child.remove_parent(cluster_c[-1].get_fw_id())
-                        child.add_parent(cluster)
-                        cluster.add_child(child)
-                for tsk in cluster_c:
-                    workflow.delete_node(tsk.get_fw_id())
-                workflow.add_node(m_task.get_fw_id(), cluster)
-                workflow.update_links()
+                # Replace the chain of tasks with the clustered node in the workflow
+                workflow.merge_nodes(sequential_id, cluster)
     return workflow
 
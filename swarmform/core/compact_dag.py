@@ -0,0 +1,305 @@
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError('CompactDAG requires NumPy, install it with: pip install swarmform[compact]')
+
+from swarmform.core.swarm_dag import DAG
+
+
+class NodeView:
+    """
+    Read-only, Node-compatible view of a node stored in a CompactDAG.
+    Views are created on demand and only keep a reference to the DAG and the index of the node.
+    """
+
+    __slots__ = ('_dag', '_index')
+
+    def __init__(self, dag, index):
+        """
+        Args:
+            dag (CompactDAG): DAG which stores the node
+            index (int): position of the node in the arrays of the DAG
+        """
+        self._dag = dag
+        self._index = index
+
+    def __eq__(self, other):
+        return isinstance(other, NodeView) and self._dag is other._dag and self._index == other._index
+
+    def __hash__(self):
+        return hash((id(self._dag), self._index))
+
+    def __repr__(self):
+        return 'NodeView(fw_id={})'.format(self.get_fw_id())
+
+    def get_index(self):
+        return self._index
+
+    def get_fw_id(self):
+        return int(self._dag.fw_ids[self._index])
+
+    def get_level(self):
+        return int(self._dag.levels[self._index])
+
+    def get_exec_time(self):
+        if self._dag.has_costs[self._index]:
+            return self._dag.exec_time[self._index].item()
+        else:
+            return None
+
+    def get_num_cores(self):
+        if self._dag.has_costs[self._index]:
+            return int(self._dag.cores[self._index])
+        else:
+            return None
+
+    def get_is_assigned(self):
+        return False
+
+    def get_parents(self):
+        return [NodeView(self._dag, index) for index in self._dag.parent_indices(self._index)]
+
+    def get_children(self):
+        return [NodeView(self._dag, index) for index in self._dag.child_indices(self._index)]
+
+    def get_longest_parent(self):
+        parents = self.get_parents()
+        longest_parent = parents[0]
+        for parent in parents:
+            if longest_parent.get_exec_time() < parent.get_exec_time():
+                longest_parent = parent
+        return longest_parent
+
+    def has_parent(self, parent_id):
+        return self._dag.get_index(parent_id) in self._dag.parent_indices(self._index)
+
+    def has_child(self, child_id):
+        return self._dag.get_index(child_id) in self._dag.child_indices(self._index)
+
+    def get_cluster_info(self):
+        if self._dag.has_costs[self._index]:
+            fw_info = {'exec_time': self.get_exec_time(), 'cores': self.get_num_cores()}
+        else:
+            fw_info = {}
+        return {self.get_fw_id(): fw_info}
+
+    def get_fw_ids_to_cluster(self):
+        return [self.get_fw_id()]
+
+    def get_fw_ids_to_cluster_sequentially(self):
+        return []
+
+    def get_fw_ids_to_cluster_parallely(self):
+        return {}
+
+    def get_cluster_space(self):
+        return []
+
+
+class CompactDAG:
+    """
+    Array backed, read-only representation of a SwarmFlow DAG for very large workflows.
+
+    fw ids, levels, execution times and cores are kept in NumPy arrays indexed by the position of the node and the
+    parent-child relationships are kept in CSR form: the children of the node at position i are
+    child_idx[child_ptr[i]:child_ptr[i + 1]] and its parents are parent_idx[parent_ptr[i]:parent_ptr[i + 1]].
+    Nodes are exposed through NodeView objects, which implement the read API of swarm_dag.Node. Use to_dag() to get
+    a mutable DAG for the clustering algorithms.
+    Execution times are kept as integers if all of them are integers, as Node keeps them. If some of them are floats,
+    all of them are kept as floats and an integer execution time is returned as a float by NodeView.get_exec_time.
+    """
+
+    def __init__(self, sf):
+
+        """
+        Args:
+            sf(SwarmFlow): SwarmFlow object
+        """
+
+        metadata = sf.metadata
+        costs = metadata['costs'] if 'costs' in metadata else {}
+        self._build(getattr(sf, 'sf_id', None), sf.name, [fw.fw_id for fw in sf.fws], sf.links, costs)
+
+    @classmethod
+    def from_links(cls, links, costs=None, dag_id=None, dag_name=None, fw_ids=None):
+        """
+        Create a CompactDAG without a SwarmFlow object
+
+        Args:
+            links (dict): parent-child relationships in the format of {parent_id:[child_ids]}
+            costs (dict): costs of the fireworks in the format of {'fw_id': {'exec_time': x, 'cores': y}}
+            dag_id (int): id of the DAG
+            dag_name (str): name of the DAG
+            fw_ids (list): ids of all the nodes. Defaults to the ids found in the links
+
+        Returns:
+            CompactDAG
+        """
+        if fw_ids is None:
+            fw_ids = dict.fromkeys(links)
+            for children in links.values():
+                fw_ids.update(dict.fromkeys(children))
+            fw_ids = list(fw_ids)
+        dag = cls.__new__(cls)
+        dag._build(dag_id, dag_name, fw_ids, links, costs or {})
+        return dag
+
+    def _build(self, dag_id, dag_name, fw_ids, links, costs):
+
+        self._dag_id = dag_id
+        self._dag_name = dag_name or "Unnamed-SF"
+        self._costs = costs
+
+        num_nodes = len(fw_ids)
+        self.fw_ids = np.asarray(fw_ids, dtype=np.int64)
+        self._index = {fw_id: index for index, fw_id in enumerate(fw_ids)}
+        if len(self._index) != num_nodes:
+            raise ValueError('FW ids must be unique!')
+
+        exec_times = [fw_info['exec_time'] for fw_info in costs.values() if fw_info]
+        integral = all(isinstance(exec_time, int) for exec_time in exec_times)
+        self.exec_time = np.zeros(num_nodes, dtype=np.int64 if integral else np.float64)
+        self.cores = np.zeros(num_nodes, dtype=np.int64)
+        self.has_costs = np.zeros(num_nodes, dtype=bool)
+        for fw_id, fw_info in costs.items():
+            index = self._index.get(int(fw_id))
+            if index is not None and fw_info:
+                self.exec_time[index] = fw_info['exec_time']
+                self.cores[index] = fw_info['cores']
+                self.has_costs[index] = True
+
+        sources = []
+        targets = []
+        for parent_id, children in links.items():
+            parent_index = self._index[parent_id]
+            for child_id in children:
+                sources.append(parent_index)
+                targets.append(self._index[child_id])
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+
+        self.child_ptr, self.child_idx = self._to_csr(sources, targets, num_nodes)
+        self.parent_ptr, self.parent_idx = self._to_csr(targets, sources, num_nodes)
+        self.levels = self.compute_levels()
+        self._height = int(self.levels.max()) if num_nodes else 0
+        # nodes grouped by level: the nodes at level l are level_order[level_ptr[l]:level_ptr[l + 1]]
+        self.level_ptr, self.level_order = self._to_csr(self.levels.astype(np.int64), np.arange(num_nodes),
+                                                        self._height + 1)
+
+    @staticmethod
+    def _to_csr(sources, targets, num_nodes):
+        """
+        Args:
+            sources (np.ndarray): source index of every edge
+            targets (np.ndarray): target index of every edge
+            num_nodes (int): number of nodes
+
+        Returns:
+            (np.ndarray, np.ndarray): index pointer and the targets of the edges ordered by source
+        """
+        order = np.argsort(sources, kind='stable')
+        ptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=num_nodes), out=ptr[1:])
+        return ptr, targets[order]
+
+    @staticmethod
+    def _gather(ptr, idx, indices):
+        """
+        Concatenate the CSR rows of the given nodes
+
+        Args:
+            ptr (np.ndarray): CSR index pointer
+            idx (np.ndarray): CSR targets
+            indices (np.ndarray): positions of the nodes
+
+        Returns:
+            np.ndarray
+        """
+        starts = ptr[indices]
+        lengths = ptr[indices + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        return idx[offsets]
+
+    def compute_levels(self):
+        """
+        Compute the level of every node with a vectorized longest-path pass in topological order (Kahn's algorithm),
+        processing one frontier of ready nodes at a time. Root nodes are at level 1.
+
+        Returns:
+            levels (np.ndarray): level of every node, indexed by the position of the node
+        """
+        num_nodes = len(self.fw_ids)
+        levels = np.zeros(num_nodes, dtype=np.int32)
+        in_degree = np.diff(self.parent_ptr)
+        frontier = np.flatnonzero(in_degree == 0)
+        level = 1
+        visited = 0
+        while len(frontier):
+            levels[frontier] = level
+            visited += len(frontier)
+            children = self._gather(self.child_ptr, self.child_idx, frontier)
+            np.subtract.at(in_degree, children, 1)
+            frontier = np.unique(children[in_degree[children] == 0])
+            level += 1
+
+        if visited != num_nodes:
+            raise ValueError('SwarmFlow links contain a cycle!')
+
+        return levels
+
+    def get_dag_id(self):
+        return self._dag_id
+
+    def get_dag_name(self):
+        return self._dag_name
+
+    def get_height(self):
+        return self._height
+
+    def get_costs(self):
+        return self._costs
+
+    def iter_level(self, level):
+        """
+        Args:
+            level (int): level of the nodes
+
+        Returns:
+            iterator(NodeView): nodes at the level, in the order they were added to the DAG
+        """
+        if level < 0 or level > self._height:
+            return iter(())
+        indices = self.level_order[self.level_ptr[level]:self.level_ptr[level + 1]]
+        return (NodeView(self, int(index)) for index in indices)
+
+    def get_index(self, fw_id):
+        return self._index[fw_id]
+
+    def get_node(self, fw_id):
+        return NodeView(self, self._index[fw_id])
+
+    def get_nodes(self):
+        return {int(fw_id): NodeView(self, index) for index, fw_id in enumerate(self.fw_ids)}
+
+    def child_indices(self, index):
+        return self.child_idx[self.child_ptr[index]:self.child_ptr[index + 1]]
+
+    def parent_indices(self, index):
+        return self.parent_idx[self.parent_ptr[index]:self.parent_ptr[index + 1]]
+
+    def get_parent_child_relationships(self):
+        fw_ids = self.fw_ids.tolist()
+        child_idx = self.child_idx.tolist()
+        child_ptr = self.child_ptr.tolist()
+        return {fw_ids[index]: [fw_ids[child] for child in child_idx[child_ptr[index]:child_ptr[index + 1]]]
+                for index in range(len(fw_ids))}
+
+    def to_dag(self):
+        """
+        Expand the CompactDAG to a mutable DAG of Node objects, e.g. to run the clustering algorithms
+
+        Returns:
+            DAG
+        """
+        return DAG.from_links(self.get_parent_child_relationships(), self._costs, self._dag_id, self._dag_name,
+                              self.fw_ids.tolist())
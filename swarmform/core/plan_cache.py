@@ -0,0 +1,208 @@
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+
+from swarmform.core.swarm_dag import get_cluster_key_base
+
+PLAN_CACHE_VERSION = 2
+
+
+class PlanCache:
+    """
+    Content addressed cache of clustering plans with LRU eviction.
+
+    Plans are keyed by a canonical hash of the links and the costs of the swarmflow, the clustering algorithm and its
+    options. The order of the fireworks and of the children of each firework is part of the key, as the clustering
+    algorithms break ties in that order. Fireworks are identified by the rank of their fw_id, so a swarmflow inserted again from the same template
+    (which gets new, but equally ordered, fw_ids) hits the plan cached for the previous insertion. Plans are stored
+    with ranks and translated back to the fw_ids of the swarmflow on lookup. The keys of the parallel clusters are
+    stored relative to the key base of the swarmflow (see get_cluster_key_base), so that they stay below its fw_ids.
+
+    Subclasses implement the storage with _load, _store and _evict.
+    """
+
+    def __init__(self, max_entries=1000):
+        """
+        Args:
+            max_entries (int): maximum number of plans to keep. Least recently used plans are evicted first
+        """
+        self.max_entries = max_entries
+
+    @staticmethod
+    def get_key(links, costs, algorithm='wpa', options=None, fw_ids=None):
+        """
+        Args:
+            links (dict): parent-child relationships in the format of {parent_id:[child_ids]}
+            costs (dict): costs of the fireworks in the format of {'fw_id': {'exec_time': x, 'cores': y}}
+            algorithm (str): name of the clustering algorithm
+            options (dict): options of the clustering algorithm which change the plan
+            fw_ids (list): ids of the fireworks in the order of the swarmflow. Defaults to the order of the links,
+                as in DAG.from_links
+
+        Returns:
+            key (str): SHA-256 hex digest
+        """
+        rank = PlanCache._get_ranks(links)
+        if fw_ids is None:
+            fw_ids = dict.fromkeys(links)
+            for children in links.values():
+                fw_ids.update(dict.fromkeys(children))
+        # the links and the children are kept in their order
+        canonical_links = [[rank[parent_id], [rank[child_id] for child_id in children]]
+                           for parent_id, children in links.items()]
+        canonical_costs = sorted([rank[int(fw_id)], fw_info.get('exec_time'), fw_info.get('cores')]
+                                 for fw_id, fw_info in costs.items() if int(fw_id) in rank)
+        content = json.dumps({'version': PLAN_CACHE_VERSION, 'algorithm': algorithm, 'options': options or {},
+                              'fw_ids': [rank[fw_id] for fw_id in fw_ids], 'links': canonical_links,
+                              'costs': canonical_costs},
+                             sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _get_ranks(links):
+        fw_ids = set(links)
+        for children in links.values():
+            fw_ids.update(children)
+        return {fw_id: index for index, fw_id in enumerate(sorted(fw_ids))}
+
+    @staticmethod
+    def _translate(plan, mapping, key_offset):
+        """
+        Replace the fw ids of a plan using the given mapping. Ids which are not in the mapping (parallel cluster keys)
+        are moved by key_offset.
+        """
+        clusters = []
+        for cluster in plan['clusters']:
+            clusters.append({'fw_id': mapping[cluster['fw_id']],
+                             'sequential_ids': [mapping[fw_id] if fw_id in mapping else fw_id + key_offset
+                                                for fw_id in cluster['sequential_ids']],
+                             'parallel_ids': [[key + key_offset, [mapping[fw_id] for fw_id in fw_ids]]
+                                              for key, fw_ids in cluster['parallel_ids']]})
+        links = [[mapping[parent_id], [mapping[child_id] for child_id in children]]
+                 for parent_id, children in plan['links']]
+        return {'clusters': clusters, 'links': links}
+
+    def lookup(self, links, costs, algorithm='wpa', options=None, fw_ids=None):
+        """
+        Args:
+            links (dict): parent-child relationships of the swarmflow in the format of {parent_id:[child_ids]}
+            costs (dict): costs of the fireworks in the format of {'fw_id': {'exec_time': x, 'cores': y}}
+            algorithm (str): name of the clustering algorithm
+            options (dict): options of the clustering algorithm which change the plan
+            fw_ids (list): ids of the fireworks in the order of the swarmflow, see get_key
+
+        Returns:
+            plan (dict): cached plan in the format returned by DAG.get_clustering_plan, or None if not cached
+        """
+        canonical_plan = self._load(self.get_key(links, costs, algorithm, options, fw_ids))
+        if canonical_plan is None:
+            return None
+        fw_ids = sorted(self._get_ranks(links))
+        return self._translate(canonical_plan, dict(enumerate(fw_ids)), get_cluster_key_base(fw_ids))
+
+    def save(self, links, costs, plan, algorithm='wpa', options=None, fw_ids=None):
+        """
+        Args:
+            links (dict): parent-child relationships of the swarmflow in the format of {parent_id:[child_ids]}
+            costs (dict): costs of the fireworks in the format of {'fw_id': {'exec_time': x, 'cores': y}}
+            plan (dict): plan in the format returned by DAG.get_clustering_plan
+            algorithm (str): name of the clustering algorithm
+            options (dict): options of the clustering algorithm which change the plan
+            fw_ids (list): ids of the fireworks in the order of the swarmflow, see get_key
+        """
+        rank = self._get_ranks(links)
+        canonical_plan = self._translate(plan, rank, -get_cluster_key_base(rank))
+        self._store(self.get_key(links, costs, algorithm, options, fw_ids), canonical_plan)
+        self._evict()
+
+    def _load(self, key):
+        raise NotImplementedError
+
+    def _store(self, key, plan):
+        raise NotImplementedError
+
+    def _evict(self):
+        raise NotImplementedError
+
+
+class DiskPlanCache(PlanCache):
+    """
+    Plan cache storing one JSON file per plan in a local directory. The modification time of a file is its last use.
+    """
+
+    def __init__(self, directory, max_entries=1000):
+        """
+        Args:
+            directory (str): directory to store the plans. Created if it does not exist
+            max_entries (int): maximum number of plans to keep
+        """
+        super().__init__(max_entries)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def _load(self, key):
+        path = self._get_path(key)
+        try:
+            with open(path, 'r') as f:
+                plan = json.load(f)
+        except (IOError, ValueError):
+            return None
+        os.utime(path)
+        return plan
+
+    def _store(self, key, plan):
+        # write to a temporary file first so that concurrent readers never see a partial plan
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(plan, f, separators=(',', ':'))
+        os.replace(tmp_path, self._get_path(key))
+
+    def _evict(self):
+        paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.json')]
+        if len(paths) <= self.max_entries:
+            return
+        paths.sort(key=os.path.getmtime)
+        for path in paths[:len(paths) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class SwarmPadPlanCache(PlanCache):
+    """
+    Plan cache storing the plans in a collection of the SwarmPad database
+    """
+
+    def __init__(self, swarmpad, collection='cluster_plans', max_entries=1000):
+        """
+        Args:
+            swarmpad (SwarmPad)
+            collection (str): name of the collection to store the plans
+            max_entries (int): maximum number of plans to keep
+        """
+        super().__init__(max_entries)
+        self.plans = swarmpad.db[collection]
+        self.plans.create_index('last_used')
+
+    def _load(self, key):
+        document = self.plans.find_one_and_update({'_id': key},
+                                                  {'$set': {'last_used': datetime.datetime.utcnow()}})
+        return document['plan'] if document else None
+
+    def _store(self, key, plan):
+        self.plans.replace_one({'_id': key}, {'_id': key, 'plan': plan, 'last_used': datetime.datetime.utcnow()},
+                               upsert=True)
+
+    def _evict(self):
+        excess = self.plans.count_documents({}) - self.max_entries
+        if excess <= 0:
+            return
+        old_keys = [document['_id'] for document in
+                    self.plans.find({}, {'_id': 1}).sort('last_used', 1).limit(excess)]
+        self.plans.delete_many({'_id': {'$in': old_keys}})
@@ -0,0 +1,198 @@
+"""
+Instrumentation of cluster_sf: the wall time of each stage of clustering a swarmflow, and counters of the swarmflow,
+the clustering and the database traffic.
+
+Pass a ClusterProfile to cluster_sf and read it with to_dict or to_json after clustering. Hooks receive the dict of
+the profile when clustering finishes, so that it can be shipped to a metrics pipeline. Hooks added with
+add_profile_hook receive the profiles of every call to cluster_sf, including the calls which are not given a profile.
+"""
+import datetime
+import json
+import time
+from contextlib import contextmanager
+
+import bson
+
+PROFILE_VERSION = 1
+# SwarmPad collections which are watched by ClusterProfile.watch
+PROFILED_COLLECTIONS = ('fireworks', 'launches', 'workflows')
+
+_profile_hooks = []
+
+
+def add_profile_hook(hook):
+    """
+    Args:
+        hook (callable): function called with the dict of the profile of every clustered swarmflow
+    """
+    _profile_hooks.append(hook)
+
+
+def remove_profile_hook(hook):
+    _profile_hooks.remove(hook)
+
+
+def get_profile(profile=None):
+    """
+    Returns:
+        the given profile, a new ClusterProfile if there are profile hooks, otherwise a NullProfile
+    """
+    if profile is not None:
+        return profile
+    return ClusterProfile() if _profile_hooks else NullProfile()
+
+
+class ClusterProfile:
+    """
+    Wall time of the stages and counters of clustering a swarmflow.
+
+    Stages are timed with perf_counter, a stage which runs more than once accumulates its time. The database counters
+    count the calls to the watched collections, the documents they return and the BSON size of the documents.
+    A cursor is a single call, however many batches it fetches.
+    """
+
+    def __init__(self, hooks=None):
+        """
+        Args:
+            hooks (list): functions called with the dict of the profile when it is published
+        """
+        self.hooks = list(hooks or [])
+        self.stages = {}
+        self.counters = {}
+        self.info = {}
+        self.created_on = datetime.datetime.utcnow()
+        self._watched = None
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time the enclosed block as the given stage
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def watch(self, swarmpad):
+        """
+        Count the database calls and the fetched documents of the SwarmPad collections in the enclosed block.
+        Watching a SwarmPad which is already watched by this profile does nothing.
+        """
+        if self._watched is swarmpad:
+            yield
+            return
+        collections = {name: getattr(swarmpad, name) for name in PROFILED_COLLECTIONS}
+        for name, collection in collections.items():
+            setattr(swarmpad, name, ProfiledCollection(collection, self))
+        self._watched = swarmpad
+        try:
+            yield
+        finally:
+            for name, collection in collections.items():
+                setattr(swarmpad, name, collection)
+            self._watched = None
+
+    def publish(self):
+        """
+        Call the hooks of the profile and the profile hooks with the dict of the profile
+        """
+        profile_dict = self.to_dict()
+        for hook in self.hooks + _profile_hooks:
+            hook(profile_dict)
+
+    def to_dict(self):
+        return {'version': PROFILE_VERSION, 'created_on': self.created_on.isoformat(), 'info': dict(self.info),
+                'stages': dict(self.stages), 'total_time': sum(self.stages.values()),
+                'counters': dict(self.counters)}
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+class NullProfile:
+    """
+    Profile which records nothing, used when cluster_sf is not profiled
+    """
+
+    def __init__(self):
+        self.info = {}
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def count(self, name, value=1):
+        pass
+
+    @contextmanager
+    def watch(self, swarmpad):
+        yield
+
+    def publish(self):
+        pass
+
+
+class ProfiledCollection:
+    """
+    Proxy of a MongoDB collection which counts the method calls and the documents they return in a profile
+    """
+
+    def __init__(self, collection, profile):
+        self._collection = collection
+        self._profile = profile
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+
+        def profiled(*args, **kwargs):
+            self._profile.count('db_calls')
+            result = attr(*args, **kwargs)
+            if isinstance(result, dict):
+                count_document(self._profile, result)
+            elif hasattr(result, '__next__'):
+                result = ProfiledCursor(result, self._profile)
+            return result
+
+        return profiled
+
+
+class ProfiledCursor:
+    """
+    Proxy of a cursor which counts the documents it returns in a profile
+    """
+
+    def __init__(self, cursor, profile):
+        self._cursor = cursor
+        self._profile = profile
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        document = next(self._cursor)
+        count_document(self._profile, document)
+        return document
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if not callable(attr):
+            return attr
+
+        def chained(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            # keep counting the cursor returned by chained calls such as sort and limit
+            return self if result is self._cursor else result
+
+        return chained
+
+
+def count_document(profile, document):
+    profile.count('docs_fetched')
+    profile.count('bytes_fetched', len(bson.BSON.encode(document)))
@@ -1,6 +1,85 @@
+import hashlib
+import json
+from collections import deque
+
+# nodes whose slack is at most this fraction of the makespan are critical, to allow for rounding of the times
+CRITICAL_SLACK_TOLERANCE = 1e-9
+# ways of ranking the nodes of a DAG for DAG.get_priorities
+PRIORITY_MODES = ('upward_rank', 'slack')
+
+
+def fingerprint_plan(plan):
+    """
+    Args:
+        plan (dict): clustering plan in the format returned by DAG.get_clustering_plan
+
+    Returns:
+        fingerprint (str): SHA-256 hex digest of the canonical JSON form of the plan
+    """
+    plan = json.dumps(plan, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(plan.encode('utf-8')).hexdigest()
+
+
+def get_cluster_key_base(fw_ids):
+    """
+    Args:
+        fw_ids (iterable): ids of the fireworks of a DAG
+
+    Returns:
+        int: the keys of the parallel clusters of the DAG are below this base. It is 0, or the smallest fw_id if it is
+            negative, as the fw_ids of the fireworks of a swarmflow which is not saved yet are
+    """
+    return min(min(fw_ids, default=0), 0)
+
+
+def get_cluster_steps(cluster):
+    """
+    Args:
+        cluster (dict): cluster of a clustering plan in the format of DAG.get_clustering_plan
+
+    Returns:
+        list(list): firework ids of the steps of the cluster in the order they run, the fireworks of a step run
+            parallely
+    """
+    parallel_ids = dict((key, fw_ids) for key, fw_ids in cluster['parallel_ids'])
+    return [list(parallel_ids.get(step, [step])) for step in cluster['sequential_ids'] or [cluster['fw_id']]]
+
+
+def get_plan_costs(plan, costs):
+    """
+    Aggregate the costs of the fireworks of each cluster of a clustering plan. The steps of a cluster run one after the
+    other and the fireworks of a parallel step at the same time, so a cluster runs for the sum of the execution times
+    of its steps, a parallel step for the longest execution time of its fireworks, and the cluster needs the cores of
+    its widest step.
+
+    Args:
+        plan (dict): clustering plan in the format returned by DAG.get_clustering_plan
+        costs (dict): costs of the fireworks in the format of {'fw_id': {'exec_time': x, 'cores': y}}
+
+    Returns:
+        costs (dict): costs of the clusters in the same format, keyed by the fw_id of the cluster. Clusters with a
+            firework without costs are left out
+    """
+    cluster_costs = {}
+    for cluster in plan['clusters']:
+        exec_time = 0
+        cores = 0
+        for step in get_cluster_steps(cluster):
+            step_costs = [costs.get(str(fw_id)) for fw_id in step]
+            if not all(step_costs):
+                break
+            exec_time += max(fw_info['exec_time'] for fw_info in step_costs)
+            cores = max(cores, sum(fw_info['cores'] for fw_info in step_costs))
+        else:
+            cluster_costs[str(cluster['fw_id'])] = {'exec_time': exec_time, 'cores': cores}
+    return cluster_costs
+
 
 class Node:
 
+    __slots__ = ('_fw_id', '_level', '_fw_info', '_is_assigned', '_parents', '_children', '_cluster_info',
+                 '_sequential_ids', '_parallel_ids', '_cluster_space', '_longest_parent')
+
     def __init__(self, fw_id, level, fw_info, assigned=False, parents=None, children=None):
 
         """
@@ -18,12 +97,22 @@ class Node:
         self._level = level
         self._fw_info = fw_info
         self._is_assigned = assigned
-        self._parents = parents
-        self._children = children
+        # parents and children are kept as insertion ordered {fw_id: Node} dictionaries
+        self._parents = self._to_adjacency(parents)
+        self._children = self._to_adjacency(children)
         self._cluster_info = {fw_id: fw_info}
         self._sequential_ids = []
         self._parallel_ids = {}
         self._cluster_space = []
+        self._longest_parent = None
+
+    @staticmethod
+    def _to_adjacency(nodes):
+        if nodes is None:
+            return None
+        if not isinstance(nodes, (list, tuple)):
+            nodes = [nodes]
+        return {node.get_fw_id(): node for node in nodes}
 
     def set_cluster_space(self, space):
         self._cluster_space = space
@@ -49,6 +138,9 @@ class Node:
     def get_level(self):
         return self._level
 
+    def set_level(self, level):
+        self._level = level
+
     def get_exec_time(self):
         if self._fw_info:
             return self._fw_info['exec_time']
@@ -64,11 +156,41 @@ class Node:
     def get_is_assigned(self):
         return self._is_assigned
 
+    def set_is_assigned(self, assigned):
+        self._is_assigned = assigned
+
     def get_parents(self):
-        return self._parents
+        if self._parents is None:
+            return None
+        return list(self._parents.values())
 
     def get_children(self):
-        return self._children
+        if self._children is None:
+            return None
+        return list(self._children.values())
+
+    def get_longest_parent(self):
+        """
+        Returns the parent which has the longest execution time. If several parents have the longest execution time,
+        the first one is returned. The result is cached until the parents of the node change.
+
+        Returns:
+            Node
+        """
+        if self._longest_parent is None:
+            parents = self.get_parents()
+            longest_parent = parents[0]
+            for parent in parents:
+                if longest_parent.get_exec_time() < parent.get_exec_time():
+                    longest_parent = parent
+            self._longest_parent = longest_parent
+        return self._longest_parent
+
+    def get_parent_ids(self):
+        return list(self._parents or [])
+
+    def get_child_ids(self):
+        return list(self._children or [])
 
     def get_cluster_info(self):
         return self._cluster_info
@@ -86,76 +208,152 @@ class Node:
 
     def add_parent(self, parent):
 
-        if not isinstance(self._parents, list):
-            self._parents = []
+        if self._parents is None:
+            self._parents = {}
 
-        self._parents.append(parent)
+        self._parents[parent.get_fw_id()] = parent
+        self._longest_parent = None
 
     def add_child(self, child):
 
-        if not isinstance(self._children, list):
-            self._children = []
+        if self._children is None:
+            self._children = {}
 
-        self._children.append(child)
+        self._children[child.get_fw_id()] = child
+
+    def has_parent(self, parent_id):
+        return self._parents is not None and parent_id in self._parents
+
+    def has_child(self, child_id):
+        return self._children is not None and child_id in self._children
 
     def remove_parent(self, parent_id):
 
-        for parent in self._parents:
-            if parent.get_fw_id() == parent_id:
-                self._parents.remove(parent)
-                break
+        if self._parents:
+            self._parents.pop(parent_id, None)
+        self._longest_parent = None
 
     def remove_child(self, child_id):
 
-        for child in self._children:
-            if child.get_fw_id() == child_id:
-                self._children.remove(child)
-                break
+        if self._children:
+            self._children.pop(child_id, None)
 
     def set_fw_info(self, exec_time, cores):
         self._fw_info = {'exec_time': exec_time, 'cores': cores}
+        # the execution time of this node decides the longest parent of its children
+        for child in self.get_children() or []:
+            child._longest_parent = None
 
 
 class DAG:
 
-    def __init__(self, sf):
+    def __init__(self, sf, cluster_key_seed=0):
 
         """
         Args:
             sf(SwarmFlow): SwarmFlow object
+            cluster_key_seed (int): offset of the keys given to the parallel clusters of this DAG
+        """
+
+        metadata = sf.metadata  # dictionary in the format of {fw_id: [exec_time, cores]}
+        costs = metadata['costs'] if 'costs' in metadata else {}
+        self._build(getattr(sf, 'sf_id', None), sf.name, [fw.fw_id for fw in sf.fws], sf.links, costs, cluster_key_seed)
+
+    @classmethod
+    def from_links(cls, links, costs=None, dag_id=None, dag_name=None, fw_ids=None, cluster_key_seed=0):
+        """
+        Create a DAG without a SwarmFlow object
+
+        Args:
+            links (dict): parent-child relationships in the format of {parent_id:[child_ids]}
+            costs (dict): costs of the fireworks in the format of {'fw_id': {'exec_time': x, 'cores': y}}
+            dag_id (int): id of the DAG
+            dag_name (str): name of the DAG
+            fw_ids (list): ids of all the nodes. Defaults to the ids found in the links
+            cluster_key_seed (int): offset of the keys given to the parallel clusters of this DAG
+
+        Returns:
+            DAG
+        """
+        if fw_ids is None:
+            fw_ids = dict.fromkeys(links)
+            for children in links.values():
+                fw_ids.update(dict.fromkeys(children))
+            fw_ids = list(fw_ids)
+        dag = cls.__new__(cls)
+        dag._build(dag_id, dag_name, fw_ids, links, costs or {}, cluster_key_seed)
+        return dag
+
+    @classmethod
+    def from_plan(cls, plan, costs, dag_id=None, dag_name=None):
         """
+        Create the DAG of the workflow clustered by a clustering plan, with one node per cluster
 
-        self._dag_id = sf.sf_id
-        self._dag_name = sf.name or "Unnamed-SF"
+        Args:
+            plan (dict): clustering plan in the format returned by DAG.get_clustering_plan
+            costs (dict): costs of the fireworks of the unclustered workflow in the format of
+                {'fw_id': {'exec_time': x, 'cores': y}}
+            dag_id (int): id of the DAG
+            dag_name (str): name of the DAG
+
+        Returns:
+            DAG: nodes are keyed by the fw_id of the clusters and have their aggregated costs, see get_plan_costs. As in
+                a clustered DAG, the cluster info of a node holds the costs of the fireworks of its cluster
+        """
+        dag = cls.from_links(dict((parent_id, child_ids) for parent_id, child_ids in plan['links']),
+                             get_plan_costs(plan, costs), dag_id=dag_id, dag_name=dag_name,
+                             fw_ids=[cluster['fw_id'] for cluster in plan['clusters']])
+        nodes = dag.get_nodes()
+        for cluster in plan['clusters']:
+            c_info = {fw_id: costs.get(str(fw_id)) for step in get_cluster_steps(cluster) for fw_id in step}
+            if all(c_info.values()):
+                nodes[cluster['fw_id']].set_cluster_info(c_info)
+        return dag
+
+    def _build(self, dag_id, dag_name, fw_ids, links, costs, cluster_key_seed=0):
+
+        self._dag_id = dag_id
+        self._dag_name = dag_name or "Unnamed-SF"
         self._nodes = {}  # dictionary in format of {fw_id: Node}
         parents_dict = {}
 
-        fireworks = sf.fws
-        self._links = sf.links  # dictionary in the format of {parent_id:[child_ids]}
-        metadata = sf.metadata  # dictionary in the format of {fw_id: [exec_time, cores]}
-        self._costs = metadata['costs'] if 'costs' in metadata else {}
+        # dictionary in the format of {parent_id:[child_ids]}
+        self._links = {parent_id: list(children) for parent_id, children in links.items()}
+        # reverse index of the links in the format of {child_id:[parent_ids]}
+        self._parent_links = {}
+        # index of the nodes by level in the format of {level: {fw_id: Node}}
+        self._level_index = {}
+        # insertion order of the nodes in the format of {fw_id: sequence number}
+        self._sequence = {}
+        self._next_sequence = 0
+        # parallel clusters get keys below the negative fw ids of unsaved swarmflows, so they never collide with fw ids
+        self._next_cluster_key = get_cluster_key_base(fw_ids) - 1 - cluster_key_seed
+        self._costs = costs
+        # earliest and latest start times of the nodes, computed on demand and reset when the DAG changes
+        self._schedule = None
+
+        # computing the level of every node in a single pass over the links
+        levels = self.compute_levels()
 
         # creating Nodes and adding to the _nodes dictionary
-        self._height = 0
-        for fw in fireworks:
-            fw_id = fw.fw_id
-            level = self.find_node_level(fw_id)
+        for fw_id in fw_ids:
+            level = levels.get(fw_id, 1)
             fw_info = self._costs[str(fw_id)] if str(fw_id) in self._costs else {}
             node = Node(fw_id=fw_id, level=level, fw_info=fw_info)
             if fw_id in self._nodes or fw_id in parents_dict:
                 raise ValueError('FW ids must be unique!')
-            self._nodes[fw_id] = node
-            if level > self._height:
-                self._height = level
+            self._insert_node(fw_id, node)
 
         # setting parents and children
         for parent_id in self._links:
             parent_node = self._nodes[parent_id]
+            self._parent_links.setdefault(parent_id, [])
             children = self._links[parent_id]
             for child_id in children:
                 child_node = self._nodes[child_id]
                 parent_node.add_child(child_node)
                 child_node.add_parent(parent_node)
+                self._parent_links.setdefault(child_id, []).append(parent_id)
 
     def get_dag_id(self):
         return self._dag_id
@@ -164,7 +362,7 @@ class DAG:
         return self._dag_name
 
     def get_height(self):
-        return self._height
+        return max(self._level_index, default=0)
 
     def get_nodes(self):
         return self._nodes
@@ -172,9 +370,68 @@ class DAG:
     def get_costs(self):
         return self._costs
 
+    def get_new_cluster_key(self):
+        """
+        Checkout the next key to refer a set of parallel running nodes. Keys are negative, below every fw_id of the
+        DAG (see get_cluster_key_base), unique in this DAG and allocated in a deterministic order, so clustering the
+        same DAG twice gives the same keys.
+
+        Returns:
+            key (int)
+        """
+        key = self._next_cluster_key
+        self._next_cluster_key -= 1
+        return key
+
+    def get_clustering_plan(self):
+        """
+        Returns the clusters of the DAG and the parent-child relationships between them in a canonical,
+        JSON serializable form.
+
+        Returns:
+            plan (dict): {'clusters': [{'fw_id': x, 'sequential_ids': [fw_ids], 'parallel_ids': [[key, [fw_ids]]]}],
+                          'links': [[parent_id, [child_ids]]]}, sorted by fw_id
+        """
+        clusters = []
+        for fw_id in sorted(self._nodes):
+            node = self._nodes[fw_id]
+            parallel_ids = node.get_fw_ids_to_cluster_parallely()
+            clusters.append({'fw_id': fw_id,
+                             'sequential_ids': list(node.get_fw_ids_to_cluster_sequentially()),
+                             'parallel_ids': [[key, list(parallel_ids[key])] for key in sorted(parallel_ids)]})
+        links = [[parent_id, sorted(self._links[parent_id])] for parent_id in sorted(self._links)
+                 if self._links[parent_id]]
+        return {'clusters': clusters, 'links': links}
+
+    def get_plan_fingerprint(self):
+        """
+        Returns:
+            fingerprint (str): SHA-256 hex digest of the clustering plan. Identical plans give identical fingerprints.
+        """
+        return fingerprint_plan(self.get_clustering_plan())
+
+    def iter_level(self, level):
+        """
+        Iterate over the nodes at the given level without scanning the other nodes of the DAG
+
+        Args:
+            level (int): level of the nodes
+
+        Returns:
+            iterator(Node): nodes at the level, in the order they were added to the DAG
+        """
+        bucket = self._level_index.get(level)
+        if not bucket:
+            return iter(())
+        sequence = self._sequence
+        return iter(sorted(bucket.values(), key=lambda node: sequence[node.get_fw_id()]))
+
     def get_parent_child_relationships(self):
         return self._links
 
+    def get_child_parent_relationships(self):
+        return self._parent_links
+
     def find_all_paths(self, start, end, path=[]):
         """
         Args:
@@ -216,6 +473,190 @@ class DAG:
 
         return paths
 
+    def compute_levels(self):
+        """
+        Compute the level of every node in O(V+E) with a longest-path pass in topological order (Kahn's algorithm).
+        The level of a node is the number of nodes in the longest path from a root node to it, root nodes being
+        at level 1.
+
+        Returns:
+            levels (dict): dictionary in format of {fw_id: level}
+        """
+        graph = self._links
+        in_degree = {}
+        for parent_id in graph:
+            in_degree.setdefault(parent_id, 0)
+            for child_id in graph[parent_id]:
+                in_degree[child_id] = in_degree.get(child_id, 0) + 1
+
+        levels = {}
+        queue = deque()
+        for fw_id in in_degree:
+            if in_degree[fw_id] == 0:
+                levels[fw_id] = 1
+                queue.append(fw_id)
+
+        visited = 0
+        while queue:
+            parent_id = queue.popleft()
+            visited += 1
+            child_level = levels[parent_id] + 1
+            for child_id in graph.get(parent_id, []):
+                if levels.get(child_id, 0) < child_level:
+                    levels[child_id] = child_level
+                in_degree[child_id] -= 1
+                if in_degree[child_id] == 0:
+                    queue.append(child_id)
+
+        if visited != len(in_degree):
+            raise ValueError('SwarmFlow links contain a cycle!')
+
+        return levels
+
+    def compute_schedule(self):
+        """
+        Compute the earliest and latest start time of every node in O(V+E) from the execution times of the nodes,
+        assuming every node starts as soon as its parents finish. Nodes are visited level by level, which is a
+        topological order. Nodes without costs take no time.
+
+        Returns:
+            schedule (dict): {'earliest_start': {fw_id: time}, 'latest_start': {fw_id: time}, 'makespan': time}
+        """
+        earliest_start = {}
+        order = []
+        makespan = 0
+        for level in sorted(self._level_index):
+            for node in self._level_index[level].values():
+                start = 0
+                for parent in node.get_parents() or []:
+                    start = max(start, earliest_start[parent.get_fw_id()] + (parent.get_exec_time() or 0))
+                earliest_start[node.get_fw_id()] = start
+                makespan = max(makespan, start + (node.get_exec_time() or 0))
+                order.append(node)
+
+        latest_start = {}
+        for node in reversed(order):
+            finish = makespan
+            for child in node.get_children() or []:
+                finish = min(finish, latest_start[child.get_fw_id()])
+            latest_start[node.get_fw_id()] = finish - (node.get_exec_time() or 0)
+        return {'earliest_start': earliest_start, 'latest_start': latest_start, 'makespan': makespan}
+
+    def get_schedule(self):
+        """
+        Returns:
+            schedule (dict): in the format returned by compute_schedule. It is cached until the DAG changes
+        """
+        if self._schedule is None:
+            self._schedule = self.compute_schedule()
+        return self._schedule
+
+    def invalidate_schedule(self):
+        """
+        Reset the cached schedule. The DAG does this itself when it changes, this method should be called after
+        changing the costs of its nodes directly.
+        """
+        self._schedule = None
+
+    def get_earliest_start(self, fw_id):
+        return self.get_schedule()['earliest_start'][fw_id]
+
+    def get_latest_start(self, fw_id):
+        return self.get_schedule()['latest_start'][fw_id]
+
+    def get_slack(self, fw_id):
+        """
+        Args:
+            fw_id (int): firework id of the node
+
+        Returns:
+            time the node can be delayed without delaying the DAG
+        """
+        schedule = self.get_schedule()
+        return schedule['latest_start'][fw_id] - schedule['earliest_start'][fw_id]
+
+    def get_slacks(self):
+        """
+        Returns:
+            slacks (dict): slack of every node in the format of {fw_id: time}
+        """
+        schedule = self.get_schedule()
+        latest_start = schedule['latest_start']
+        return {fw_id: latest_start[fw_id] - start for fw_id, start in schedule['earliest_start'].items()}
+
+    def get_critical_path_length(self):
+        """
+        Returns:
+            execution time of the longest path of the DAG, the makespan with unlimited resources
+        """
+        return self.get_schedule()['makespan']
+
+    def is_critical(self, fw_id):
+        """
+        Args:
+            fw_id (int): firework id of the node
+
+        Returns:
+            bool: whether the node has no slack. Slacks within CRITICAL_SLACK_TOLERANCE of the makespan count as none
+        """
+        return self.get_slack(fw_id) <= CRITICAL_SLACK_TOLERANCE * self.get_critical_path_length()
+
+    def get_upward_ranks(self):
+        """
+        Returns:
+            ranks (dict): upward rank of every node in the format of {fw_id: rank}, the execution time of the longest
+                path from the node to a leaf node, including the node
+        """
+        schedule = self.get_schedule()
+        makespan = schedule['makespan']
+        return {fw_id: makespan - start for fw_id, start in schedule['latest_start'].items()}
+
+    def get_priorities(self, priority='upward_rank'):
+        """
+        Rank the nodes so that nodes which delay the DAG the most when they are delayed get higher priorities
+
+        Args:
+            priority (str): 'upward_rank' ranks the nodes by the length of the longest path to a leaf node, 'slack'
+                ranks them by the length of the critical path less their slack, so critical nodes rank highest
+
+        Returns:
+            priorities (dict): priority of every node in the format of {fw_id: priority}
+        """
+        if priority == 'upward_rank':
+            return self.get_upward_ranks()
+        elif priority == 'slack':
+            length = self.get_critical_path_length()
+            return {fw_id: length - slack for fw_id, slack in self.get_slacks().items()}
+        raise ValueError('Unknown priority {}, use one of {}'.format(priority, ', '.join(PRIORITY_MODES)))
+
+    def get_critical_path(self):
+        """
+        Returns:
+            list: firework ids of the nodes of a critical path, from a root node to a leaf node. If several paths are
+                critical, the first one in the order of the nodes is returned
+        """
+        schedule = self.get_schedule()
+        earliest_start = schedule['earliest_start']
+        tolerance = CRITICAL_SLACK_TOLERANCE * schedule['makespan']
+        path = []
+        finish = 0
+        candidates = self._level_index.get(1, {}).values()
+        while candidates:
+            node = None
+            for candidate in candidates:
+                fw_id = candidate.get_fw_id()
+                # the next node of the path has no slack and starts as soon as the previous node finishes
+                if self.get_slack(fw_id) <= tolerance and (
+                        not path or earliest_start[fw_id] - finish <= tolerance):
+                    node = candidate
+                    break
+            if node is None:
+                break
+            path.append(node.get_fw_id())
+            finish = earliest_start[node.get_fw_id()] + (node.get_exec_time() or 0)
+            candidates = node.get_children() or []
+        return path
+
     def find_node_level(self, node_id):
         """
         Args:
@@ -224,9 +665,7 @@ class DAG:
         Returns:
             level (int)
         """
-        paths = self.all_paths_from_roots(node_id)
-
-        return max([len(x) for x in paths])
+        return self.compute_levels()[node_id]
 
     def add_node(self, fw_id, node):
         """
@@ -236,7 +675,7 @@ class DAG:
         """
         if fw_id in self._nodes:
             raise ValueError('FW ids must be unique!')
-        self._nodes[fw_id] = node
+        self._insert_node(fw_id, node)
 
     def delete_node(self, fw_id):
         """
@@ -245,14 +684,178 @@ class DAG:
         """
         if fw_id not in self._nodes:
             raise KeyError('FW id not exists')
-        del self._nodes[fw_id]
+        self._remove_node(fw_id)
+
+    def merge_nodes(self, fw_ids, new_node):
+        """
+        Replace a set of nodes with a single node and update the parent-child relationships, the links and the
+        levels of the affected nodes in place. Parents and children of the merged nodes which are not merged
+        themselves become the parents and children of the new node, edges between merged nodes are dropped.
+        The new node may be one of the merged nodes, in which case it absorbs the others.
+        Nodes can not be merged if one of them reaches another through a node which is not merged, see
+        can_merge_nodes.
+
+        Args:
+            fw_ids (list): firework ids of the nodes to be merged
+            new_node (Node): node object which replaces the merged nodes
+        """
+        new_id = new_node.get_fw_id()
+        merged_ids = set(fw_ids)
+        if new_id not in merged_ids and new_id in self._nodes:
+            raise ValueError('FW ids must be unique!')
+        for fw_id in fw_ids:
+            if fw_id not in self._nodes:
+                raise KeyError('FW id not exists')
+        if not self.can_merge_nodes(merged_ids):
+            raise ValueError('Merging FWs {} creates a cycle'.format(sorted(merged_ids)))
+
+        self._links.setdefault(new_id, [])
+        self._parent_links.setdefault(new_id, [])
+        for fw_id in fw_ids:
+            node = self._nodes[fw_id]
+            if node is new_node:
+                continue
+            for parent in list(node.get_parents() or []):
+                parent_id = parent.get_fw_id()
+                parent.remove_child(fw_id)
+                self._remove_link(parent_id, fw_id)
+                if parent_id in merged_ids:
+                    continue
+                if not new_node.has_parent(parent_id):
+                    new_node.add_parent(parent)
+                if not parent.has_child(new_id):
+                    parent.add_child(new_node)
+                    self._add_link(parent_id, new_id)
+            for child in list(node.get_children() or []):
+                child_id = child.get_fw_id()
+                child.remove_parent(fw_id)
+                self._remove_link(fw_id, child_id)
+                if child_id in merged_ids:
+                    continue
+                if not new_node.has_child(child_id):
+                    new_node.add_child(child)
+                if not child.has_parent(new_id):
+                    child.add_parent(new_node)
+                    self._add_link(new_id, child_id)
+            self._remove_node(fw_id)
+            if fw_id != new_id:
+                self._links.pop(fw_id, None)
+                self._parent_links.pop(fw_id, None)
+
+        if new_id not in self._nodes:
+            self._insert_node(new_id, new_node)
+        self._update_levels(new_node)
+
+    def can_merge_nodes(self, fw_ids):
+        """
+        Nodes can not be merged if a path leaves one of the nodes and reaches another through nodes which are not
+        merged, as the merged node would depend on itself. A node only reaches nodes at higher levels, so the search
+        stops at the level of the deepest merged node, and merging nodes of the same level is not searched at all.
+
+        Args:
+            fw_ids (list): firework ids of the nodes to be merged
+
+        Returns:
+            bool: whether merge_nodes can merge the nodes
+        """
+        merged_ids = set(fw_ids)
+        max_level = max(self._nodes[fw_id].get_level() for fw_id in merged_ids)
+        stack = [self._nodes[fw_id] for fw_id in merged_ids if self._nodes[fw_id].get_level() < max_level]
+        visited = set(merged_ids)
+        while stack:
+            node = stack.pop()
+            for child in node.get_children() or []:
+                child_id = child.get_fw_id()
+                if child_id in merged_ids and node.get_fw_id() not in merged_ids:
+                    return False
+                if child_id not in visited and child.get_level() < max_level:
+                    visited.add(child_id)
+                    stack.append(child)
+        return True
+
+    def replace_node(self, fw_id, new_node):
+        """
+        Replace a node with a new node, keeping its parent-child relationships
+
+        Args:
+            fw_id (int): firework id of the node to be replaced
+            new_node (Node): node object which replaces the existing node
+        """
+        self.merge_nodes([fw_id], new_node)
+
+    def _insert_node(self, fw_id, node):
+        self._schedule = None
+        self._nodes[fw_id] = node
+        self._sequence[fw_id] = self._next_sequence
+        self._next_sequence += 1
+        self._level_index.setdefault(node.get_level(), {})[fw_id] = node
+
+    def _remove_node(self, fw_id):
+        self._schedule = None
+        node = self._nodes.pop(fw_id)
+        del self._sequence[fw_id]
+        self._unindex_level(fw_id, node.get_level())
+
+    def _unindex_level(self, fw_id, level):
+        bucket = self._level_index[level]
+        del bucket[fw_id]
+        if not bucket:
+            del self._level_index[level]
+
+    def _set_level(self, node, level):
+        """
+        Set the level of a node of the DAG and move it to the bucket of the new level.
+        Levels of the nodes in the DAG should only be changed through this method.
+
+        Args:
+            node (Node)
+            level (int)
+        """
+        fw_id = node.get_fw_id()
+        self._unindex_level(fw_id, node.get_level())
+        node.set_level(level)
+        self._level_index.setdefault(level, {})[fw_id] = node
+
+    def _add_link(self, parent_id, child_id):
+        self._schedule = None
+        self._links.setdefault(parent_id, []).append(child_id)
+        self._parent_links.setdefault(child_id, []).append(parent_id)
+
+    def _remove_link(self, parent_id, child_id):
+        self._schedule = None
+        children = self._links.get(parent_id)
+        if children and child_id in children:
+            children.remove(child_id)
+        parents = self._parent_links.get(child_id)
+        if parents and parent_id in parents:
+            parents.remove(parent_id)
+
+    def _update_levels(self, start_node):
+        """
+        Recompute the level of the given node from its parents and propagate the changes to its descendants.
+        Only the nodes whose level changes are visited further.
+
+        Args:
+            start_node (Node): node whose parent-child relationships have changed
+        """
+        queue = deque([start_node])
+        while queue:
+            node = queue.popleft()
+            parents = node.get_parents()
+            level = max([parent.get_level() for parent in parents]) + 1 if parents else 1
+            if level == node.get_level() and node is not start_node:
+                continue
+            self._set_level(node, level)
+            if node.get_children():
+                queue.extend(node.get_children())
 
     def update_links(self):
         """
             Reset the links attribute and update with new parent-children relationships.
-            This method should be called after overriding the DAG object.
+            This method should be called after overriding the DAG object without merge_nodes/replace_node.
         """
         links = {}
+        parent_links = {}
         for fw_id in self._nodes:
             node = self._nodes[fw_id]
             children = node.get_children()
@@ -260,18 +863,21 @@ class DAG:
                 links[node.get_fw_id()] = []
                 for child in children:
                     links[node.get_fw_id()].append(child.get_fw_id())
+                    parent_links.setdefault(child.get_fw_id(), []).append(node.get_fw_id())
         self._links = links
+        self._parent_links = parent_links
+        self._schedule = None
 
     def update_height(self):
         """
-        Update the height attribute with updated links
-        This method should be called after overriding the DAG object if the height is changed
+        Update the levels of the nodes and the height with updated links
+        This method should be called after overriding the DAG object without merge_nodes/replace_node
+        if the height is changed
         """
         self.update_links()
-        height = 0
+        levels = self.compute_levels()
+        self._level_index = {}
         for fw_id in self._nodes:
-            level = self.find_node_level(fw_id)
-            if level > height:
-                height = level
-
-        self._height = height
+            node = self._nodes[fw_id]
+            node.set_level(levels.get(fw_id, 1))
+            self._level_index.setdefault(node.get_level(), {})[fw_id] = node
@@ -1,9 +1,15 @@
 import datetime
+import time
+from itertools import islice
+
+from pymongo import ASCENDING, UpdateOne
 
 from fireworks import LaunchPad, Firework
+from fireworks.core.launchpad import get_action_from_gridfs
 from fireworks.fw_config import GRIDFS_FALLBACK_COLLECTION
 
 from swarmform.core.swarmwork import SwarmFlow
+from swarmform.sf_config import FW_FETCH_BATCH_SIZE, SF_INSERT_BATCH_SIZE
 
 
 class SwarmPad(LaunchPad):
@@ -109,6 +115,93 @@ class SwarmPad(LaunchPad):
 		self.m_logger.info('Added a workflow. id_map: {}'.format(old_new))
 		return old_new
 
+	def add_sfs(self, sfs, batch_size=SF_INSERT_BATCH_SIZE):
+		"""
+		Bulk insert SwarmFlows (or Fireworks) to the SwarmPad. The Firework ids will be reassigned.
+		The Firework ids and the SwarmFlow ids of all the SwarmFlows are reserved with a single $inc,
+		the Fireworks are written with unordered insert_many in batches and the SwarmFlow documents
+		are inserted in bulk. The throughput of each batch is logged.
+		Args:
+			sfs ([SwarmFlow/Firework])
+			batch_size (int): number of documents written per insert_many
+		Returns:
+			[dict]: mapping between old and new Firework ids of each SwarmFlow, in the order of sfs
+		"""
+		sfs = [SwarmFlow.from_Firework(fw=sf, sf_id=getattr(sf, 'sf_id', None)) if isinstance(sf, Firework) else sf
+			   for sf in sfs]
+		new_sfs = [sf for sf in sfs if not hasattr(sf, 'sf_id')]
+		num_fws = sum(len(sf.id_fw) for sf in sfs)
+		first_fw_id, first_sf_id = self._reserve_ids(num_fws, len(new_sfs))
+		for sf_id, sf in enumerate(new_sfs, start=first_sf_id):
+			sf.sf_id = sf_id
+
+		old_news = []
+
+		def reassigned_fw_docs():
+			next_fw_id = first_fw_id
+			for sf in sfs:
+				# sets the root FWs as READY
+				for fw_id in sf.root_fw_ids:
+					sf.id_fw[fw_id].state = 'READY'
+					sf.fw_states[fw_id] = 'READY'
+				# the new FW_ids match the order of the old ones, as in add_sf
+				fws = sorted(sf.id_fw.values(), key=lambda x: x.fw_id)
+				old_new = {}
+				for new_id, fw in enumerate(fws, start=next_fw_id):
+					old_new[fw.fw_id] = new_id
+					fw.fw_id = new_id
+				next_fw_id += len(fws)
+				sf._reassign_ids(old_new)
+				old_news.append(old_new)
+				for fw in fws:
+					yield fw.to_db_dict()
+
+		self._insert_in_batches(self.fireworks, reassigned_fw_docs(), batch_size, 'Fireworks')
+		self._insert_in_batches(self.workflows, (sf.to_db_dict() for sf in sfs), batch_size, 'SwarmFlows')
+		self.m_logger.info('Added {} SwarmFlows with {} Fireworks'.format(len(sfs), num_fws))
+		return old_news
+
+	def _reserve_ids(self, num_fws, num_sfs):
+		"""
+		internal method to reserve contiguous blocks of Firework and SwarmFlow ids with a single $inc.
+		Args:
+			num_fws (int): number of Firework ids to reserve
+			num_sfs (int): number of SwarmFlow ids to reserve
+		Returns:
+			(int, int): first reserved Firework id and first reserved SwarmFlow id
+		"""
+		try:
+			next_ids = self.fw_id_assigner.find_one_and_update({}, {
+				'$inc': {'next_fw_id': num_fws, 'next_sf_id': num_sfs}})
+			return next_ids['next_fw_id'], next_ids['next_sf_id']
+		except Exception:
+			raise ValueError(
+				"Could not reserve Firework and SwarmFlow ids! If you have not yet initialized the database,"
+				" please do so by performing a database reset (e.g., swarmpad reset)")
+
+	def _insert_in_batches(self, collection, documents, batch_size, doc_type):
+		"""
+		internal method to write documents with unordered insert_many in batches and log the throughput of each batch.
+		Args:
+			collection (Collection)
+			documents (iterable): documents to insert. Consumed lazily, one batch at a time
+			batch_size (int): number of documents per insert_many
+			doc_type (str): name of the documents in the log messages
+		"""
+		documents = iter(documents)
+		batch_index = 0
+		while True:
+			start = time.perf_counter()
+			batch = list(islice(documents, batch_size))
+			if not batch:
+				break
+			collection.insert_many(batch, ordered=False)
+			elapsed = time.perf_counter() - start
+			batch_index += 1
+			self.m_logger.info('Inserted batch {} of {} {} in {:.3f} s ({:.0f} {}/s)'.format(
+				batch_index, len(batch), doc_type, elapsed, len(batch) / elapsed if elapsed else float('inf'),
+				doc_type))
+
 	def get_new_sf_id(self, quantity=1):
 		"""
 		Checkout the next SwarmFlow id
@@ -142,6 +235,20 @@ class SwarmPad(LaunchPad):
 			'RESTARTED fw_id, launch_id to ({}, {}, {})'.format(next_fw_id,
 																next_launch_id, next_sf_id))
 
+	def _update_wf(self, wf, updated_ids):
+		"""
+		internal method to update the SwarmFlow with the updated Firework ids. FireWorks replaces the document with
+		the one of a Workflow, which has no sf_id, so the sf_id is set back on it.
+		Note: must be called within an enclosing WFLock
+		Args:
+			wf (Workflow)
+			updated_ids ([int]): list of Firework ids
+		"""
+		sf_dict = self.workflows.find_one({'nodes': next(iter(wf.id_fw))}, {'sf_id': 1})
+		super()._update_wf(wf, updated_ids)
+		if sf_dict and 'sf_id' in sf_dict:
+			self.workflows.update_one({'_id': sf_dict['_id']}, {'$set': {'sf_id': sf_dict['sf_id']}})
+
 	def get_sf_by_id(self, sf_id):
 		"""
 		Given a SwarmFlow id, give back the SwarmFlow.
@@ -156,11 +263,112 @@ class SwarmPad(LaunchPad):
 			raise ValueError(
 				"Could not find a Workflow with sf_id: {}".format(sf_id))
 
-		fws = map(self.get_fw_by_id, links_dict["nodes"])
+		fws = self.get_fws_by_ids(links_dict["nodes"])
 		return SwarmFlow(fws, links_dict['links'], links_dict['name'],
 						 links_dict['metadata'], links_dict['created_on'],
 						 links_dict['updated_on'], None, links_dict['sf_id'])
 
+	def get_sf_ids(self, query=None):
+		"""
+		Give back the ids of the SwarmFlows matching a query, in ascending order.
+		Args:
+			query (dict): MongoDB query on the SwarmFlow documents. Defaults to all the SwarmFlows
+		Returns:
+			[int]
+		"""
+		query = dict(query or {})
+		query.setdefault('sf_id', {'$exists': True})
+		return sorted(sf_dict['sf_id'] for sf_dict in self.workflows.find(query, {'sf_id': 1, '_id': 0}))
+
+	def archive_sfs(self, sf_ids, batch_size=FW_FETCH_BATCH_SIZE):
+		"""
+		Archive SwarmFlows in bulk. The Fireworks of SwarmFlows which never ran are archived with an update_many
+		per batch and the SwarmFlow documents with a single bulk write. SwarmFlows with launched Fireworks are
+		archived with archive_wf, which also handles their launches.
+		Args:
+			sf_ids ([int])
+			batch_size (int): number of Fireworks queried and updated per query
+		"""
+		sf_dicts = list(self.workflows.find({'sf_id': {'$in': list(sf_ids)}, 'state': {'$ne': 'ARCHIVED'}},
+											{'sf_id': 1, 'nodes': 1, '_id': 0}))
+		fw_ids = [fw_id for sf_dict in sf_dicts for fw_id in sf_dict['nodes']]
+		launched_fw_ids = set()
+		for start in range(0, len(fw_ids), batch_size):
+			batch = fw_ids[start:start + batch_size]
+			launched_fw_ids.update(fw_dict['fw_id'] for fw_dict in self.fireworks.find(
+				{'fw_id': {'$in': batch}, 'launches.0': {'$exists': True}}, {'fw_id': 1, '_id': 0}))
+
+		now = datetime.datetime.utcnow()
+		archived_fw_ids = []
+		requests = []
+		for sf_dict in sf_dicts:
+			if launched_fw_ids.intersection(sf_dict['nodes']):
+				self.archive_wf(sf_dict['nodes'][0])
+				continue
+			archived_fw_ids.extend(sf_dict['nodes'])
+			update = {'state': 'ARCHIVED', 'updated_on': now}
+			update.update(('fw_states.{}'.format(fw_id), 'ARCHIVED') for fw_id in sf_dict['nodes'])
+			requests.append(UpdateOne({'sf_id': sf_dict['sf_id']}, {'$set': update}))
+		for start in range(0, len(archived_fw_ids), batch_size):
+			self.fireworks.update_many({'fw_id': {'$in': archived_fw_ids[start:start + batch_size]}},
+									   {'$set': {'state': 'ARCHIVED', 'updated_on': now}})
+		if requests:
+			self.workflows.bulk_write(requests, ordered=False)
+		self.m_logger.info('Archived {} SwarmFlows'.format(len(sf_dicts)))
+
+	def get_fw_dicts_by_ids(self, fw_ids, batch_size=FW_FETCH_BATCH_SIZE, projection=None):
+		"""
+		Given a list of Firework ids, give back the Firework dicts. Fireworks are fetched with a single $in
+		query per batch and their launches with another one, instead of a query per Firework.
+		Args:
+			fw_ids ([int])
+			batch_size (int): number of Fireworks fetched per query
+			projection (dict): MongoDB projection applied to the Firework documents. Defaults to excluding _id
+		Returns:
+			[dict]: Firework dicts in the order of fw_ids
+		"""
+		projection = projection if projection is not None else {'_id': 0}
+		fw_ids = list(fw_ids)
+		fw_dicts = {}
+		for start in range(0, len(fw_ids), batch_size):
+			batch = fw_ids[start:start + batch_size]
+			batch_dicts = list(self.fireworks.find({'fw_id': {'$in': batch}}, projection))
+			if len(batch_dicts) != len(set(batch)):
+				missing = set(batch) - set(fw_dict['fw_id'] for fw_dict in batch_dicts)
+				raise ValueError('No Firework exists with ids: {}'.format(sorted(missing)))
+
+			# recreate launches from the launch collection
+			launch_ids = []
+			for fw_dict in batch_dicts:
+				launch_ids.extend(fw_dict.get('launches', []))
+				launch_ids.extend(fw_dict.get('archived_launches', []))
+			launches = {}
+			if launch_ids:
+				for launch in self.launches.find({'launch_id': {'$in': launch_ids}}, sort=[('launch_id', ASCENDING)]):
+					launch['action'] = get_action_from_gridfs(launch.get('action'), self.gridfs_fallback)
+					launches[launch['launch_id']] = launch
+
+			for fw_dict in batch_dicts:
+				for key in ('launches', 'archived_launches'):
+					if key in fw_dict:
+						fw_dict[key] = [launches[launch_id] for launch_id in sorted(fw_dict[key])
+										if launch_id in launches]
+				fw_dicts[fw_dict['fw_id']] = fw_dict
+		return [fw_dicts[fw_id] for fw_id in fw_ids]
+
+	def get_fws_by_ids(self, fw_ids, batch_size=FW_FETCH_BATCH_SIZE, projection=None):
+		"""
+		Given a list of Firework ids, give back the Firework objects using batched queries.
+		Args:
+			fw_ids ([int])
+			batch_size (int): number of Fireworks fetched per query
+			projection (dict): MongoDB projection applied to the Firework documents. Defaults to excluding _id
+		Returns:
+			[Firework]: Fireworks in the order of fw_ids
+		"""
+		return [Firework.from_dict(fw_dict) for fw_dict in
+				self.get_fw_dicts_by_ids(fw_ids, batch_size=batch_size, projection=projection)]
+
 	def get_sf_by_name(self, sf_name):
 		"""
 		Given a SwarmFlow name, give back the SwarmFlow.
@@ -177,7 +385,7 @@ class SwarmPad(LaunchPad):
 			raise ValueError(
 				"Could not find a SwarmFlow with sf_name: {}".format(sf_name))
 
-		fws = map(self.get_fw_by_id, links_dict["nodes"])
+		fws = self.get_fws_by_ids(links_dict["nodes"])
 		return SwarmFlow(fws, links_dict['links'], links_dict['name'],
 						 links_dict['metadata'], links_dict['created_on'],
 						 links_dict['updated_on'], None, links_dict['sf_id'])
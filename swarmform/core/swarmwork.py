@@ -1,5 +1,9 @@
+from functools import partial
+
 from fireworks import Workflow, Firework
 
+from swarmform.util.file_loader import load_cached, load_serialized
+
 
 class SwarmFlow(Workflow):
 
@@ -41,6 +45,11 @@ class SwarmFlow(Workflow):
         self.fw_costs = new_fw_costs
         self.metadata['costs'] = self.fw_costs
 
+        # update the clustered fw ids of the provenance of a clustered SwarmFlow
+        if 'provenance' in self.metadata:
+            self.metadata['provenance'] = {fwid: old_new.get(clustered_id, clustered_id)
+                                           for fwid, clustered_id in self.metadata['provenance'].items()}
+
     def to_db_dict(self):
         m_dict = super().to_db_dict()
         m_dict['sf_id'] = self.sf_id
@@ -67,6 +76,25 @@ class SwarmFlow(Workflow):
         else:
             return SwarmFlow.from_Firework(Firework.from_dict(m_dict))
 
+    @classmethod
+    def from_file(cls, filename, f_format=None, cache=False):
+        """
+        Load a SwarmFlow from a JSON or YAML file. YAML is parsed with libyaml when it is available.
+
+        Args:
+            filename (str): path of the file
+            f_format (str): serialization format. Default checks the filename extension
+            cache (bool): reuse the parsed file from a sidecar cache next to it (see file_loader.load_cached)
+
+        Returns:
+            SwarmFlow
+        """
+        if cache:
+            m_dict = load_cached(filename, partial(load_serialized, f_format=f_format), 'swarmflow')
+        else:
+            m_dict = load_serialized(filename, f_format)
+        return cls.from_dict(m_dict)
+
     @classmethod
     def from_Firework(cls, fw, name=None, metadata=None, sf_id=None):
         """
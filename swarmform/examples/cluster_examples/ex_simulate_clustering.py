@@ -0,0 +1,22 @@
+from swarmform import SyntheticWorkflowGenerator
+from swarmform.core.clustering_algo import get_strategy_names
+from swarmform.util.makespan_simulator import simulate_clustering
+
+
+def main():
+	# Epigenomics-like workflow of 2000 short jobs
+	generator = SyntheticWorkflowGenerator(exec_time=('lognormal', 3, 1), seed=42)
+	sf = generator.generate('epigenomics', 2000).to_swarmflow()
+	# predict the gain of clustering on 4 workers with 8 cores each and 30 seconds of overhead per job
+	result = simulate_clustering(sf, num_workers=4, cores_per_worker=8, job_overhead=30)
+	for name in ('original', 'clustered'):
+		print(name, result[name])
+	print('speedup', result['speedup'])
+	# compare the clustering strategies
+	for strategy in get_strategy_names():
+		result = simulate_clustering(sf, num_workers=4, cores_per_worker=8, job_overhead=30, strategy=strategy)
+		print(strategy, result['clustered']['num_jobs'], 'jobs, speedup', result['speedup'])
+
+
+if __name__ == "__main__":
+	main()
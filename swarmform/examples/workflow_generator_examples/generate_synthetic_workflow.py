@@ -0,0 +1,17 @@
+from swarmform import SwarmPad, SyntheticWorkflowGenerator
+
+
+def main():
+	# set up the LaunchPad and reset it
+	swarmpad = SwarmPad()
+	swarmpad.reset('', require_password=False)
+	# Montage-like workflow of 1000 jobs with log-normally distributed execution times
+	generator = SyntheticWorkflowGenerator(exec_time=('lognormal', 2, 1), cores=('choice', [1, 2, 4]), seed=42)
+	workflow = generator.generate('montage', 1000)
+	swarmpad.add_sf(workflow.to_swarmflow())
+	# Large workflows can be written to a file directly, e.g. to add them with sform add
+	generator.generate('random', 100000, width=500, fan_in=4).write_swarmflow('random_100000.json')
+
+
+if __name__ == "__main__":
+	main()
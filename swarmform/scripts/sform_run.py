@@ -1,16 +1,23 @@
 import datetime
+import multiprocessing
 import os
 import sys
 import signal
 import traceback
 import six
 from argparse import ArgumentParser
+from functools import partial
 
 from fireworks.scripts.lpad_run import init_yaml, get_output_func
 
 from swarmform import SwarmPad
 from swarmform.core.swarmwork import SwarmFlow
-from swarmform.core.cluster import cluster_sf
+from swarmform.core.cluster import cluster_sf, get_unclustered_query
+from swarmform.core.clustering_algo.strategies import DEFAULT_STRATEGY, get_strategy_names
+from swarmform.core.clustering_algo.wpa_clustering import PACKING_MODES
+from swarmform.core.plan_cache import DiskPlanCache, SwarmPadPlanCache
+from swarmform.core.swarm_dag import PRIORITY_MODES
+from swarmform.core.profiling import ClusterProfile
 from swarmform.sf_config import LAUNCHPAD_LOC, CONFIG_FILE_DIR
 
 DEFAULT_LPAD_YAML = "my_swarmpad.yaml"
@@ -56,20 +63,94 @@ def reset(args):
     sp.reset(args.password)
 
 
+def format_error(e):
+    # keep one line per file in the error report
+    return '{}: {}'.format(type(e).__name__, ' '.join(str(e).split()))
+
+
+def load_sf_file(path, check=False, cache=False):
+    """
+    Parse (and optionally check) a SwarmFlow file. Runs in the worker processes of add_sf.
+
+    Args:
+        path (str): path to a Firework or SwarmFlow file
+        check (bool): check the SwarmFlow with DAGFlow
+        cache (bool): reuse the parsed file from a sidecar cache next to it
+
+    Returns:
+        (str, SwarmFlow, str): path, SwarmFlow (None on failure) and error message (None on success)
+    """
+    try:
+        fwf = SwarmFlow.from_file(path, cache=cache)
+        if check:
+            from fireworks.utilities.dagflow import DAGFlow
+            DAGFlow.from_fireworks(fwf)
+        return path, fwf, None
+    except Exception as e:
+        return path, None, format_error(e)
+
+
+def add_sf_batch(sp, files, sfs, errors):
+    """
+    Bulk insert a batch of parsed SwarmFlows. If the insert fails, every file of the batch is reported as failed.
+
+    Returns:
+        int: number of SwarmFlows added
+    """
+    if not sfs:
+        return 0
+    try:
+        sp.add_sfs(sfs)
+        return len(sfs)
+    except Exception as e:
+        for f in files:
+            errors[f] = format_error(e)
+        return 0
+
+
 def add_sf(args):
     sp = get_sp(args)
     if args.dir:
         files = []
         for f in args.sf_file:
-            files.extend([os.path.join(f, i) for i in os.listdir(f)])
+            # skip hidden files, e.g. the sidecar caches of --cache
+            files.extend([os.path.join(f, i) for i in os.listdir(f) if not i.startswith('.')])
     else:
         files = args.sf_file
-    for f in files:
-        fwf = SwarmFlow.from_file(f)
-        if args.check:
-            from fireworks.utilities.dagflow import DAGFlow
-            DAGFlow.from_fireworks(fwf)
-        sp.add_sf(fwf)
+
+    # parse the files in a process pool and stream the SwarmFlows into batched inserts, in the order of the files
+    load = partial(load_sf_file, check=args.check, cache=args.cache)
+    if args.workers > 1:
+        pool = multiprocessing.Pool(args.workers)
+        results = pool.imap(load, files, chunksize=max(1, min(64, len(files) // (args.workers * 4))))
+    else:
+        pool = None
+        results = map(load, files)
+
+    errors = {}
+    num_added = 0
+    batch_files, batch_sfs = [], []
+    try:
+        for num_done, (f, fwf, error) in enumerate(results, start=1):
+            if error is not None:
+                errors[f] = error
+                sp.m_logger.error('Could not load {}: {}'.format(f, error))
+            else:
+                batch_files.append(f)
+                batch_sfs.append(fwf)
+            if len(batch_sfs) >= args.batch_size or num_done == len(files):
+                num_added += add_sf_batch(sp, batch_files, batch_sfs, errors)
+                batch_files, batch_sfs = [], []
+                sp.m_logger.info('Processed {}/{} files: {} SwarmFlows added, {} failed'.format(
+                    num_done, len(files), num_added, len(errors)))
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    if errors:
+        sp.m_logger.error('Could not add {} of {} files:\n{}'.format(
+            len(errors), len(files), '\n'.join('  {}: {}'.format(f, errors[f]) for f in files if f in errors)))
 
 
 def get_sf(args):
@@ -97,15 +178,167 @@ def get_sf_by_name(args):
     return swarmflow
 
 
+def get_plan_cache(sp, plan_cache_dir, plan_cache_db, plan_cache_size):
+    if plan_cache_db:
+        return SwarmPadPlanCache(sp, max_entries=plan_cache_size)
+    elif plan_cache_dir:
+        return DiskPlanCache(plan_cache_dir, max_entries=plan_cache_size)
+    return None
+
+
 # Cluster the jobs in a workflow
 def cluster_workflow(args):
     sp = get_sp(args)
+    if args.all:
+        cluster_workflows(args, sp)
+        return
+    if args.sf_id is None:
+        raise ValueError('Give the id of the SwarmFlow to cluster with -sf, or cluster all the unclustered '
+                         'SwarmFlows with --all')
     unclustered_sf = sp.get_sf_by_id(args.sf_id)
     unclustered_sf_fw_id = unclustered_sf.fws[0].fw_id
-    clustered_workflow = cluster_sf(sp, args.sf_id)
+    plan_cache = get_plan_cache(sp, args.plan_cache, args.plan_cache_db, args.plan_cache_size)
+    profile = ClusterProfile() if args.profile else None
+    clustered_workflow = cluster_sf(sp, args.sf_id, plan_cache=plan_cache, profile=profile,
+                                    **get_cluster_options(args))
     sp.add_sf(clustered_workflow)
     sp.archive_wf(unclustered_sf_fw_id)
     sp.m_logger.info('Workflow with id {} clustered succesfully'.format(args.sf_id))
+    if profile is not None:
+        profile.info['clustered_sf_id'] = clustered_workflow.sf_id
+        write_profile(profile, args.profile)
+
+
+def get_cluster_options(args):
+    """
+    Returns:
+        dict: keyword arguments of cluster_sf given on the command line
+    """
+    return {'strategy': args.strategy, 'packing': args.packing, 'max_cluster_size': args.max_cluster_size,
+            'priority': args.priority}
+
+
+# SwarmPad, plan cache and cluster_sf options of a worker process of cluster_workflows
+_cluster_worker = {}
+
+
+def init_cluster_worker(launchpad_file, logdir, loglvl, plan_cache_dir, plan_cache_db, plan_cache_size,
+                        cluster_options, sp=None):
+    """
+    Connect a worker of cluster_workflows to the SwarmPad. Workers do not share the connection of the parent process.
+    """
+    _cluster_worker['cluster_options'] = cluster_options
+    try:
+        if sp is None:
+            sp = SwarmPad.from_file(launchpad_file) if launchpad_file else SwarmPad(logdir=logdir, strm_lvl=loglvl)
+        _cluster_worker['sp'] = sp
+        _cluster_worker['plan_cache'] = get_plan_cache(sp, plan_cache_dir, plan_cache_db, plan_cache_size)
+    except Exception as e:
+        # the pool restarts workers whose initializer fails forever, so report the error for each SwarmFlow instead
+        _cluster_worker['error'] = 'Could not connect to the SwarmPad: {}'.format(format_error(e))
+
+
+def cluster_sf_job(sf_id):
+    """
+    Cluster a SwarmFlow in a worker of cluster_workflows
+
+    Returns:
+        (SwarmFlow, dict): clustered SwarmFlow (None on failure) and report of the SwarmFlow with its number of
+            Fireworks before and after clustering and the clustering time, or the error
+    """
+    profile = ClusterProfile()
+    report = {'sf_id': sf_id}
+    if 'error' in _cluster_worker:
+        report.update({'status': 'failed', 'error': _cluster_worker['error']})
+        return None, report
+    try:
+        clustered_sf = cluster_sf(_cluster_worker['sp'], sf_id, plan_cache=_cluster_worker['plan_cache'],
+                                  profile=profile, **_cluster_worker['cluster_options'])
+        report.update({'num_fws': profile.counters['nodes'], 'num_clustered_fws': profile.counters['clustered_fws'],
+                       'time': round(sum(profile.stages.values()), 6)})
+        return clustered_sf, report
+    except Exception as e:
+        report.update({'status': 'failed', 'error': format_error(e)})
+        return None, report
+
+
+def commit_clustered_batch(sp, sf_ids, clustered_sfs, reports):
+    """
+    Bulk insert a batch of clustered SwarmFlows and archive the SwarmFlows they were clustered from. If the insert
+    fails, every SwarmFlow of the batch is reported as failed and none of them is archived.
+    """
+    if not clustered_sfs:
+        return
+    try:
+        sp.add_sfs(clustered_sfs)
+    except Exception as e:
+        for sf_id in sf_ids:
+            reports[sf_id].update({'status': 'failed', 'error': format_error(e)})
+        return
+    for sf_id, clustered_sf in zip(sf_ids, clustered_sfs):
+        reports[sf_id].update({'status': 'clustered', 'clustered_sf_id': clustered_sf.sf_id})
+    try:
+        sp.archive_sfs(sf_ids)
+    except Exception as e:
+        for sf_id in sf_ids:
+            reports[sf_id]['error'] = 'Clustered but not archived: {}'.format(format_error(e))
+
+
+def cluster_workflows(args, sp):
+    """
+    Cluster the unclustered SwarmFlows selected by args.name and args.id_range. SwarmFlows are clustered in a
+    process pool of args.workers, and the clustered SwarmFlows are added and the original ones archived in batches of
+    args.batch_size. Prints a report of each SwarmFlow.
+    """
+    id_range = tuple(args.id_range) if args.id_range else None
+    sf_ids = sp.get_sf_ids(get_unclustered_query(args.name, id_range))
+    sp.m_logger.info('Clustering {} SwarmFlows'.format(len(sf_ids)))
+    worker_args = (args.launchpad_file, args.logdir, args.loglvl, args.plan_cache, args.plan_cache_db,
+                   args.plan_cache_size, get_cluster_options(args))
+    if args.workers > 1 and len(sf_ids) > 1:
+        pool = multiprocessing.Pool(args.workers, initializer=init_cluster_worker, initargs=worker_args)
+        results = pool.imap(cluster_sf_job, sf_ids)
+    else:
+        pool = None
+        init_cluster_worker(*worker_args, sp=sp)
+        results = map(cluster_sf_job, sf_ids)
+
+    reports = {}
+    batch_sf_ids, batch_sfs = [], []
+    try:
+        for num_done, (clustered_sf, report) in enumerate(results, start=1):
+            sf_id = report['sf_id']
+            reports[sf_id] = report
+            if clustered_sf is None:
+                sp.m_logger.error('Could not cluster SwarmFlow {}: {}'.format(sf_id, report['error']))
+            else:
+                batch_sf_ids.append(sf_id)
+                batch_sfs.append(clustered_sf)
+            if len(batch_sfs) >= args.batch_size or num_done == len(sf_ids):
+                commit_clustered_batch(sp, batch_sf_ids, batch_sfs, reports)
+                batch_sf_ids, batch_sfs = [], []
+                sp.m_logger.info('Processed {}/{} SwarmFlows'.format(num_done, len(sf_ids)))
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    report = [reports[sf_id] for sf_id in sf_ids]
+    num_failed = sum(1 for r in report if r['status'] == 'failed')
+    sp.m_logger.info('Clustered {} of {} SwarmFlows, {} failed'.format(len(report) - num_failed, len(report),
+                                                                       num_failed))
+    print(args.output(report))
+
+
+def write_profile(profile, path):
+    """
+    Write the profile as JSON to the given file, or to stdout if path is '-'
+    """
+    if path == '-':
+        print(profile.to_json(indent=2))
+    else:
+        with open(path, 'w') as f:
+            f.write(profile.to_json(indent=2))
 
 
 def sform():
@@ -154,6 +387,12 @@ def sform():
                               action="store_true",
                               help="Directory mode. Finds all files in the "
                                    "paths given by wf_file.")
+    addsf_parser.add_argument('-w', '--workers', help='Number of processes parsing the files in parallel',
+                              default=1, type=int)
+    addsf_parser.add_argument('--cache', help='Cache the parsed files next to them to speed up repeated loads',
+                              action='store_true')
+    addsf_parser.add_argument('--batch_size', help='Number of SwarmFlows inserted to the SwarmPad at once',
+                              default=100, type=int)
     addsf_parser.set_defaults(func=add_sf, check=False)
 
     getsf_parser = subparsers.add_parser('get_sf', help='Get SwarmFlow from SwarmPad')
@@ -165,6 +404,36 @@ def sform():
                                               help='Cluster the fireworks in the SwarmFlow and save the new '
                                                    'SwarmFlow to the database')
     cluster_wf_parser.add_argument('-sf', '--sf_id', help='Id of the SwarmFlow to cluster', default=None, type=int)
+    cluster_wf_parser.add_argument('--plan_cache', help='Directory to cache clustering plans. SwarmFlows with the same '
+                                                        'structure and costs reuse the cached plan', default=None)
+    cluster_wf_parser.add_argument('--plan_cache_db', help='Cache clustering plans in the SwarmPad database',
+                                   action='store_true')
+    cluster_wf_parser.add_argument('--plan_cache_size', help='Maximum number of cached clustering plans',
+                                   default=1000, type=int)
+    cluster_wf_parser.add_argument('--all', help='Cluster all the unclustered SwarmFlows, optionally selected by '
+                                                 '--name and --id_range', action='store_true')
+    cluster_wf_parser.add_argument('--name', help='With --all, cluster the SwarmFlows whose name matches this regular '
+                                                  'expression', default=None)
+    cluster_wf_parser.add_argument('--id_range', help='With --all, cluster the SwarmFlows with ids in this inclusive '
+                                                      'range', nargs=2, type=int, metavar=('FIRST', 'LAST'))
+    cluster_wf_parser.add_argument('-w', '--workers', help='With --all, number of processes clustering SwarmFlows',
+                                   default=1, type=int)
+    cluster_wf_parser.add_argument('--batch_size', help='With --all, number of clustered SwarmFlows added per '
+                                                        'bulk insert', default=100, type=int)
+    cluster_wf_parser.add_argument('--strategy', help='Clustering strategy', choices=get_strategy_names(),
+                                   default=DEFAULT_STRATEGY)
+    cluster_wf_parser.add_argument('--packing', help='With the wpa strategy, how the parents of a task are clustered: '
+                                                     'in pairs as in the original WPA, or packed with first fit or '
+                                                     'best fit', choices=PACKING_MODES, default='pairs')
+    cluster_wf_parser.add_argument('--max_cluster_size', help='Maximum number of Fireworks in a cluster. The wpa '
+                                                              'strategy uses it with first_fit or best_fit packing',
+                                   default=None, type=int)
+    cluster_wf_parser.add_argument('--priority', help='Set the _priority of the clustered Fireworks by their upward '
+                                                      'rank or slack on the critical path, so that critical Fireworks '
+                                                      'run first', choices=PRIORITY_MODES, default=None)
+    cluster_wf_parser.add_argument('--profile', nargs='?', const='-', default=None,
+                                   help='Profile the stages of clustering and write the profile as JSON to this '
+                                        'file, or to stdout if no file is given')
     cluster_wf_parser.set_defaults(func=cluster_workflow)
 
     args = parser.parse_args()
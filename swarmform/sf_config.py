@@ -1,3 +1,5 @@
 
 LAUNCHPAD_LOC = None  # where to find the my_launchpad.yaml file
 CONFIG_FILE_DIR = '.'  # directory containing config files (if not individually set)
+FW_FETCH_BATCH_SIZE = 1000  # number of Fireworks fetched per query when loading a SwarmFlow
+SF_INSERT_BATCH_SIZE = 1000  # number of documents written per insert_many when bulk adding SwarmFlows
@@ -0,0 +1,130 @@
+"""
+Fast loading of workflow files. YAML is parsed with libyaml when PyYAML is built with it, and the parsed content of a
+file can be cached in a sidecar file next to it, so that repeated loads skip the parsing.
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+import yaml
+
+from fireworks.utilities.fw_serializers import reconstitute_dates
+
+# libyaml based loader, with a fallback to the pure Python one
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+CACHE_VERSION = 1
+
+
+def load_yaml(stream):
+    """
+    Args:
+        stream (str/file): YAML document
+
+    Returns:
+        Python object of the document
+    """
+    return yaml.load(stream, Loader=YAML_LOADER)
+
+
+def load_serialized(filename, f_format=None):
+    """
+    Load the dict serialized in a JSON or YAML file, with the dates reconstituted as in FWSerializable.from_file
+
+    Args:
+        filename (str): path of the file
+        f_format (str): 'json' or 'yaml'. Default checks the filename extension
+
+    Returns:
+        dict
+    """
+    if f_format is None:
+        f_format = filename.split('.')[-1]
+    with open(filename, 'r', encoding='utf-8') as f:
+        if f_format == 'json':
+            dct = json.load(f)
+        elif f_format in ('yaml', 'yml'):
+            dct = load_yaml(f)
+        else:
+            raise ValueError('Unsupported format {}'.format(f_format))
+    if not isinstance(dct, dict):
+        raise ValueError('Serialized object must be a dict but is {}'.format(type(dct)))
+    return reconstitute_dates(dct)
+
+
+def get_cache_path(filename, kind):
+    directory, name = os.path.split(filename)
+    return os.path.join(directory, '.{}.{}.cache'.format(name, kind))
+
+
+def get_file_hash(filename):
+    sha = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def load_cached(filename, load, kind):
+    """
+    Load a file with load(filename), reusing the result cached in a sidecar file next to it.
+
+    The sidecar keeps the result together with the modification time, the size and the SHA-256 hash of the file. It
+    is used if the modification time and the size of the file are unchanged, or else if its hash is unchanged (e.g.
+    the file was touched or checked out again). Otherwise the file is loaded and the sidecar replaced. Sidecars are
+    pickles, so only cache files in directories you trust.
+
+    Args:
+        filename (str): path of the file
+        load (callable): function which loads the file
+        kind (str): name of the loaded content, so that different loaders of the same file use different sidecars
+
+    Returns:
+        result of load(filename)
+    """
+    cache_path = get_cache_path(filename, kind)
+    stat = os.stat(filename)
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = pickle.load(f)
+    except Exception:
+        # missing, unreadable or corrupt sidecar
+        cached = None
+
+    file_hash = None
+    if isinstance(cached, dict) and cached.get('version') == CACHE_VERSION:
+        if cached['mtime'] == stat.st_mtime_ns and cached['size'] == stat.st_size:
+            return cached['data']
+        file_hash = get_file_hash(filename)
+        if cached['sha256'] == file_hash:
+            cached.update({'mtime': stat.st_mtime_ns, 'size': stat.st_size})
+            save_cache(cache_path, cached)
+            return cached['data']
+
+    if file_hash is None:
+        file_hash = get_file_hash(filename)
+    data = load(filename)
+    save_cache(cache_path, {'version': CACHE_VERSION, 'mtime': stat.st_mtime_ns, 'size': stat.st_size,
+                            'sha256': file_hash, 'data': data})
+    return data
+
+
+def save_cache(cache_path, cached):
+    # write to a hidden temporary file first so that concurrent readers never see a partial sidecar
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path) or '.', prefix='.', suffix='.tmp')
+    except OSError:
+        # the cache is optional, e.g. the directory may be read-only
+        return
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+    finally:
+        # left behind if the sidecar could not be written
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
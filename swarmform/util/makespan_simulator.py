@@ -0,0 +1,204 @@
+"""
+Discrete-event simulation of the execution of a workflow DAG on a cluster of worker nodes, to predict the gain of
+clustering a SwarmFlow before submitting it.
+"""
+import heapq
+from swarmform.core.clustering_algo.strategies import DEFAULT_STRATEGY, cluster_dag
+from swarmform.core.swarm_dag import DAG
+
+
+class MakespanSimulator:
+    """
+    Simulates a DAG on num_workers worker nodes with cores_per_worker cores each.
+
+    A job runs on the cores of a single worker and holds them for its execution time plus the per-job overhead
+    (scheduling, queueing and launching the job), which is the overhead clustering saves. Jobs are started in the order
+    they become ready (first in, first out), or highest priority first if priorities are given as the LaunchPad does
+    with spec['_priority'], on the worker with the fewest free cores that fit the job. A job which does not fit on any
+    worker waits, and so do the jobs queued after it.
+
+    The simulation keeps the ready and the running jobs in heaps, so it takes O((V + E) log V) time for a DAG of V jobs and
+    E links.
+    """
+
+    def __init__(self, num_workers, cores_per_worker, job_overhead=0.0):
+        """
+        Args:
+            num_workers (int): number of worker nodes
+            cores_per_worker (int): number of cores of each worker node
+            job_overhead (float): overhead in seconds added to the execution time of every job
+        """
+        if num_workers < 1 or cores_per_worker < 1:
+            raise ValueError('The cluster needs at least one worker with at least one core')
+        self.num_workers = num_workers
+        self.cores_per_worker = cores_per_worker
+        self.job_overhead = job_overhead
+
+    @staticmethod
+    def get_jobs(dag):
+        """
+        Args:
+            dag (DAG/CompactDAG): DAG with the costs of every node
+
+        Returns:
+            (list, list, list, list): fw_ids, execution times, cores and child positions of the jobs, indexed by the
+                position of the jobs
+        """
+        nodes = dag.get_nodes()
+        fw_ids = list(nodes)
+        position = {fw_id: index for index, fw_id in enumerate(fw_ids)}
+        exec_times = []
+        cores = []
+        for fw_id in fw_ids:
+            node = nodes[fw_id]
+            if node.get_exec_time() is None:
+                raise ValueError('Firework {} has no costs'.format(fw_id))
+            exec_times.append(node.get_exec_time())
+            cores.append(node.get_num_cores())
+        children = [[] for _ in fw_ids]
+        for parent_id, child_ids in dag.get_parent_child_relationships().items():
+            if parent_id in position:
+                children[position[parent_id]] = [position[child_id] for child_id in child_ids]
+        return fw_ids, exec_times, cores, children
+
+    @staticmethod
+    def get_busy_core_time(dag):
+        """
+        Args:
+            dag (DAG/CompactDAG): DAG with the costs of every node
+
+        Returns:
+            float: core seconds the fireworks of the DAG spend executing. A cluster holds the cores of its widest step
+                for all of its steps, only the cores its fireworks use are counted
+        """
+        return sum(fw_info['exec_time'] * fw_info['cores'] for node in dag.get_nodes().values()
+                   for fw_info in node.get_cluster_info().values())
+
+    def simulate(self, dag, priorities=None):
+        """
+        Args:
+            dag (DAG/CompactDAG): DAG with the costs of every node
+            priorities (dict): priorities of the jobs in the format of {fw_id: priority}, e.g. from DAG.get_priorities.
+                Jobs without a priority have priority 0
+
+        Returns:
+            dict: makespan in seconds, core utilization (fraction of the core time of the cluster the fireworks spend
+                executing, see get_busy_core_time), core allocation (fraction of the core time of the cluster held by
+                the jobs, without the overheads), mean and maximum queue wait of the jobs (time between a job becoming
+                ready and starting) and the number of jobs
+        """
+        fw_ids, exec_times, cores, children = self.get_jobs(dag)
+        for fw_id, num_cores in zip(fw_ids, cores):
+            if num_cores > self.cores_per_worker:
+                raise ValueError('Firework {} needs {} cores, but the workers have {}'.format(
+                    fw_id, num_cores, self.cores_per_worker))
+
+        num_jobs = len(fw_ids)
+        in_degree = [0] * num_jobs
+        for child_indices in children:
+            for child in child_indices:
+                in_degree[child] += 1
+
+        # workers grouped by their number of free cores, {worker: None} dicts are used as ordered sets
+        free_cores = [self.cores_per_worker] * self.num_workers
+        workers_by_free_cores = [{} for _ in range(self.cores_per_worker + 1)]
+        workers_by_free_cores[self.cores_per_worker] = dict.fromkeys(range(self.num_workers))
+
+        # ready jobs as (negated priority, ready order, job), so that the heap pops the first of the highest priority
+        priority = [-priorities.get(fw_id, 0) for fw_id in fw_ids] if priorities else [0] * num_jobs
+        roots = [index for index in range(num_jobs) if in_degree[index] == 0]
+        ready = [(priority[index], order, index) for order, index in enumerate(roots)]
+        heapq.heapify(ready)
+        num_ready = len(ready)
+        ready_time = [0.0] * num_jobs
+        # running jobs as (finish time, sequence number, job, worker)
+        running = []
+        sequence = 0
+        now = 0.0
+        total_wait = 0.0
+        max_wait = 0.0
+        num_finished = 0
+
+        while True:
+            # start the jobs at the head of the queue while they fit on a worker
+            while ready:
+                job = ready[0][2]
+                worker = None
+                for num_free in range(cores[job], self.cores_per_worker + 1):
+                    if workers_by_free_cores[num_free]:
+                        worker = workers_by_free_cores[num_free].popitem()[0]
+                        break
+                if worker is None:
+                    break
+                heapq.heappop(ready)
+                free_cores[worker] -= cores[job]
+                workers_by_free_cores[free_cores[worker]][worker] = None
+                wait = now - ready_time[job]
+                total_wait += wait
+                max_wait = max(max_wait, wait)
+                heapq.heappush(running, (now + exec_times[job] + self.job_overhead, sequence, job, worker))
+                sequence += 1
+            if not running:
+                break
+
+            # finish all the jobs which end at the next event time before starting new ones
+            now = running[0][0]
+            while running and running[0][0] == now:
+                _, _, job, worker = heapq.heappop(running)
+                del workers_by_free_cores[free_cores[worker]][worker]
+                free_cores[worker] += cores[job]
+                workers_by_free_cores[free_cores[worker]][worker] = None
+                num_finished += 1
+                for child in children[job]:
+                    in_degree[child] -= 1
+                    if in_degree[child] == 0:
+                        ready_time[child] = now
+                        heapq.heappush(ready, (priority[child], num_ready, child))
+                        num_ready += 1
+
+        if num_finished != num_jobs:
+            raise ValueError('SwarmFlow links contain a cycle!')
+
+        allocated_core_time = sum(exec_time * num_cores for exec_time, num_cores in zip(exec_times, cores))
+        capacity = now * self.num_workers * self.cores_per_worker
+        return {'makespan': now, 'utilization': self.get_busy_core_time(dag) / capacity if capacity else 0.0,
+                'allocation': allocated_core_time / capacity if capacity else 0.0,
+                'mean_queue_wait': total_wait / num_jobs if num_jobs else 0.0, 'max_queue_wait': max_wait,
+                'num_jobs': num_jobs}
+
+    def compare(self, dag, clustered_dag, priorities=None):
+        """
+        Args:
+            dag (DAG/CompactDAG): DAG of the original workflow
+            clustered_dag (DAG): DAG of the clustered workflow, e.g. the result of wpa_clustering
+            priorities (dict): priorities of the clustered jobs in the format of {fw_id: priority}
+
+        Returns:
+            dict: simulation results of the 'original' and the 'clustered' DAG, and the 'speedup' of the makespan
+        """
+        original = self.simulate(dag)
+        clustered = self.simulate(clustered_dag, priorities)
+        return {'original': original, 'clustered': clustered,
+                'speedup': original['makespan'] / clustered['makespan'] if clustered['makespan'] else 1.0}
+
+
+def simulate_clustering(sf, num_workers, cores_per_worker, job_overhead=0.0, strategy=DEFAULT_STRATEGY, priority=None,
+                        **options):
+    """
+    Simulate a SwarmFlow before and after clustering it with a clustering strategy
+
+    Args:
+        sf (SwarmFlow): SwarmFlow with the costs of its fireworks in metadata['costs']
+        num_workers (int): number of worker nodes
+        cores_per_worker (int): number of cores of each worker node
+        job_overhead (float): overhead in seconds added to the execution time of every job
+        strategy (str): name of the registered clustering strategy
+        priority (str): one of PRIORITY_MODES to start the ready clustered jobs by the priorities cluster_sf gives them
+        options: options of the clustering strategy
+
+    Returns:
+        dict: in the format returned by MakespanSimulator.compare
+    """
+    clustered_dag = cluster_dag(DAG(sf), strategy, **options)
+    priorities = clustered_dag.get_priorities(priority) if priority is not None else None
+    return MakespanSimulator(num_workers, cores_per_worker, job_overhead).compare(DAG(sf), clustered_dag, priorities)
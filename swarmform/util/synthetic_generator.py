@@ -0,0 +1,345 @@
+import datetime
+import json
+import math
+import random
+
+from fireworks import Firework, ScriptTask
+from swarmform.core.swarmwork import SwarmFlow
+from swarmform.util.workflow_generator import WorkflowGenerator
+
+SHAPES = ('layered', 'fork_join', 'montage', 'epigenomics', 'random')
+
+
+def get_sampler(distribution):
+    """
+    Args:
+        distribution (tuple): name of the distribution followed by its parameters, one of
+            ('constant', value), ('uniform', low, high), ('normal', mean, std), ('lognormal', mu, sigma),
+            ('exponential', mean) or ('choice', [values])
+
+    Returns:
+        function which draws a value from the distribution with the given random.Random
+    """
+    name, params = distribution[0], distribution[1:]
+    if name == 'constant':
+        return lambda rng: params[0]
+    elif name == 'uniform':
+        return lambda rng: rng.uniform(params[0], params[1])
+    elif name == 'normal':
+        return lambda rng: max(0.0, rng.gauss(params[0], params[1]))
+    elif name == 'lognormal':
+        return lambda rng: rng.lognormvariate(params[0], params[1])
+    elif name == 'exponential':
+        return lambda rng: rng.expovariate(1.0 / params[0])
+    elif name == 'choice':
+        return lambda rng: rng.choice(params[0])
+    else:
+        raise ValueError('Unknown distribution {}'.format(name))
+
+
+class SyntheticWorkflow:
+    """
+    Synthetic workflow DAG created by SyntheticWorkflowGenerator. Jobs are numbered from 1 in a topological order and
+    kept in plain lists, so that very large workflows can be written to files without creating any Firework.
+    """
+
+    def __init__(self, name, children, exec_times, cores):
+        """
+        Args:
+            name (str): name of the workflow
+            children (list): children[i] is the list of children ids of job i + 1
+            exec_times (list): execution time of each job
+            cores (list): cores required by each job
+        """
+        self.name = name
+        self.children = children
+        self.exec_times = exec_times
+        self.cores = cores
+
+    @property
+    def num_jobs(self):
+        return len(self.children)
+
+    def get_links(self):
+        """
+        Returns:
+            links (dict): parent-child relationships in the format of {parent_id:[child_ids]}
+        """
+        return {job_id: list(children) for job_id, children in enumerate(self.children, start=1)}
+
+    def get_costs(self):
+        """
+        Returns:
+            costs (dict): costs of the jobs in the format of {'fw_id': {'exec_time': x, 'cores': y}}
+        """
+        return {str(job_id): {'exec_time': exec_time, 'cores': cores}
+                for job_id, (exec_time, cores) in enumerate(zip(self.exec_times, self.cores), start=1)}
+
+    def to_jobs(self):
+        """
+        Returns:
+            jobs (dict): jobs in the input format of WorkflowGenerator {job_id: [exec_time, cores, [child_ids]]}
+        """
+        return {job_id: [exec_time, cores, list(children)] for job_id, (exec_time, cores, children) in
+                enumerate(zip(self.exec_times, self.cores, self.children), start=1)}
+
+    def to_swarmflow(self, created_on=None):
+        """
+        Create the SwarmFlow of the workflow. Each Firework runs the inline command of its job (see
+        WorkflowGenerator.gen_command), so no script is written. The fw_id of each Firework is its job id.
+
+        Args:
+            created_on (datetime): creation time of the SwarmFlow and its Fireworks. Current time is used if not given
+
+        Returns:
+            SwarmFlow
+        """
+        created_on = created_on or datetime.datetime.utcnow()
+        fws = [Firework(ScriptTask.from_str(WorkflowGenerator.gen_command(job_id, exec_time)), fw_id=job_id,
+                        created_on=created_on, updated_on=created_on)
+               for job_id, exec_time in enumerate(self.exec_times, start=1)]
+        return SwarmFlow(fireworks=fws, links_dict=self.get_links(), name=self.name,
+                         metadata={'costs': self.get_costs()}, created_on=created_on, updated_on=created_on)
+
+    def write_jobs(self, filename):
+        """
+        Write the workflow to a YAML file in the input format of WorkflowGenerator, e.g. for
+        WorkflowGenerator.generate_workflow. The file is written line by line.
+
+        Args:
+            filename (str): path of the YAML file
+        """
+        with open(filename, 'w') as f:
+            f.write('swarmflow_name: {}\nfireworks:\n'.format(json.dumps(self.name)))
+            for job_id, (exec_time, cores, children) in enumerate(zip(self.exec_times, self.cores, self.children),
+                                                                   start=1):
+                f.write('    {}: [{}, {}, {}]\n'.format(job_id, exec_time, cores, json.dumps(children)))
+
+    def write_swarmflow(self, filename, created_on=None):
+        """
+        Write the SwarmFlow of the workflow (see to_swarmflow) to a JSON file, e.g. for SwarmFlow.from_file or
+        sform add. The file is written Firework by Firework, without creating the SwarmFlow.
+
+        Args:
+            filename (str): path of the JSON file
+            created_on (datetime): creation time of the SwarmFlow and its Fireworks. Current time is used if not given
+        """
+        created_on = (created_on or datetime.datetime.utcnow()).isoformat()
+        with open(filename, 'w') as f:
+            f.write('{"fws": [')
+            for job_id, exec_time in enumerate(self.exec_times, start=1):
+                fw_dict = {'spec': {'_tasks': [{'script': [WorkflowGenerator.gen_command(job_id, exec_time)],
+                                                'use_shell': True, '_fw_name': 'ScriptTask'}]},
+                           'fw_id': job_id, 'created_on': created_on, 'updated_on': created_on, 'name': 'Unnamed FW'}
+                f.write((', ' if job_id > 1 else '') + json.dumps(fw_dict))
+            f.write('], "links": {')
+            f.write(', '.join('"{}": {}'.format(job_id, json.dumps(children))
+                              for job_id, children in enumerate(self.children, start=1)))
+            f.write('}, "name": ' + json.dumps(self.name) + ', "metadata": {"costs": {')
+            f.write(', '.join('"{}": {{"exec_time": {}, "cores": {}}}'.format(job_id, exec_time, cores)
+                              for job_id, (exec_time, cores) in enumerate(zip(self.exec_times, self.cores), start=1)))
+            f.write('}}, "created_on": "' + created_on + '", "updated_on": "' + created_on + '"}')
+
+
+class SyntheticWorkflowGenerator:
+    """
+    Generate parameterized workflow DAGs for scalability benchmarks: layered, fork-join, Montage-like,
+    Epigenomics-like and random DAGs. Execution times and cores are drawn from the given distributions (see
+    get_sampler). Each workflow is generated with a new random.Random seeded with the seed of the generator, so the
+    same shape and parameters always give the same workflow.
+    """
+
+    def __init__(self, exec_time=('uniform', 1, 100), cores=('constant', 1), seed=0):
+        """
+        Args:
+            exec_time (tuple): distribution of the execution times. Values are rounded to 3 decimals
+            cores (tuple): distribution of the cores. Values are rounded to integers of at least 1
+            seed (int): seed of the random numbers
+        """
+        self.exec_time_sampler = get_sampler(exec_time)
+        self.cores_sampler = get_sampler(cores)
+        self.seed = seed
+
+    def generate(self, shape, num_jobs, **kwargs):
+        """
+        Args:
+            shape (str): one of SHAPES
+            num_jobs (int): number of jobs
+            kwargs: parameters of the shape
+
+        Returns:
+            SyntheticWorkflow
+        """
+        if shape not in SHAPES:
+            raise ValueError('Unknown shape {}. Use one of {}'.format(shape, ', '.join(SHAPES)))
+        return getattr(self, shape)(num_jobs, **kwargs)
+
+    def _create_workflow(self, name, children, rng):
+        exec_times = [round(self.exec_time_sampler(rng), 3) for _ in children]
+        cores = [max(1, int(round(self.cores_sampler(rng)))) for _ in children]
+        return SyntheticWorkflow(name, children, exec_times, cores)
+
+    def layered(self, num_jobs, width=100, fan_in=2):
+        """
+        Layers of width jobs, where each job has fan_in parents drawn from the previous layer
+
+        Args:
+            num_jobs (int): number of jobs
+            width (int): number of jobs in a layer. The last layer may be smaller
+            fan_in (int): number of parents of the jobs after the first layer
+
+        Returns:
+            SyntheticWorkflow
+        """
+        rng = random.Random(self.seed)
+        children = [[] for _ in range(num_jobs)]
+        for job in range(width, num_jobs):
+            previous_layer = job - job % width - width
+            for parent in rng.sample(range(previous_layer, previous_layer + width), min(fan_in, width)):
+                children[parent].append(job + 1)
+        return self._create_workflow('layered_{}'.format(num_jobs), children, rng)
+
+    def fork_join(self, num_jobs, width=100):
+        """
+        Chain of fork-join stages: a job forks width parallel jobs which are joined by the next job. The join of a
+        stage is the fork of the next stage.
+
+        Args:
+            num_jobs (int): number of jobs
+            width (int): number of parallel jobs in a stage. The last stage may be smaller
+
+        Returns:
+            SyntheticWorkflow
+        """
+        rng = random.Random(self.seed)
+        children = [[] for _ in range(num_jobs)]
+        fork = 1
+        while fork < num_jobs:
+            # keep a job for the join of the stage, unless only one job is left
+            join = min(fork + width + 1, num_jobs)
+            parallel_jobs = range(fork + 1, join) if join - fork > 1 else range(join, join + 1)
+            for job in parallel_jobs:
+                children[fork - 1].append(job)
+                if job != join:
+                    children[job - 1].append(join)
+            fork = join
+        return self._create_workflow('fork_join_{}'.format(num_jobs), children, rng)
+
+    def montage(self, num_jobs):
+        """
+        Montage-like workflow: n mProjectPP jobs, mDiffFit jobs for pairs of overlapping projections, mConcatFit,
+        mBgModel, n mBackground jobs, mImgtbl, mAdd, mShrink and mJPEG
+
+        Args:
+            num_jobs (int): number of jobs, at least 30
+
+        Returns:
+            SyntheticWorkflow
+        """
+        if num_jobs < 30:
+            raise ValueError('Montage-like workflows need at least 30 jobs')
+        rng = random.Random(self.seed)
+        num_images = (num_jobs - 6) // 4
+        num_diffs = num_jobs - 6 - 2 * num_images
+        children = [[] for _ in range(num_jobs)]
+
+        # mDiffFit of the projections i and i + offset, for offset = 1, 2, ...
+        diff = num_images + 1
+        offset = 1
+        while diff <= num_images + num_diffs:
+            for image in range(1, num_images - offset + 1):
+                if diff > num_images + num_diffs:
+                    break
+                children[image - 1].append(diff)
+                children[image + offset - 1].append(diff)
+                diff += 1
+            offset += 1
+
+        concat_fit = num_images + num_diffs + 1
+        bg_model = concat_fit + 1
+        for diff in range(num_images + 1, concat_fit):
+            children[diff - 1].append(concat_fit)
+        children[concat_fit - 1].append(bg_model)
+
+        img_tbl = bg_model + num_images + 1
+        for image in range(1, num_images + 1):
+            background = bg_model + image
+            children[bg_model - 1].append(background)
+            children[image - 1].append(background)
+            children[background - 1].append(img_tbl)
+        # mImgtbl -> mAdd -> mShrink -> mJPEG
+        for job in range(img_tbl, num_jobs):
+            children[job - 1].append(job + 1)
+        return self._create_workflow('montage_{}'.format(num_jobs), children, rng)
+
+    def epigenomics(self, num_jobs, lanes=4):
+        """
+        Epigenomics-like workflow: each lane splits its input (fastQSplit) into pipelines of filterContams,
+        sol2sanger, fastq2bfq and map jobs, which are merged per lane (mapMerge). The lanes are merged again and
+        followed by maqIndex and pileup. The workflow has the largest number of jobs of this shape which is at most
+        num_jobs.
+
+        Args:
+            num_jobs (int): maximum number of jobs
+            lanes (int): number of lanes
+
+        Returns:
+            SyntheticWorkflow
+        """
+        num_pipelines = (num_jobs - 3 - 2 * lanes) // 4
+        if num_pipelines < lanes:
+            raise ValueError('Epigenomics-like workflows with {} lanes need at least {} jobs'.format(
+                lanes, 3 + 6 * lanes))
+        rng = random.Random(self.seed)
+        children = [[] for _ in range(3 + 2 * lanes + 4 * num_pipelines)]
+        merge = len(children) - 2
+
+        job = 1
+        for lane in range(lanes):
+            split = job
+            lane_pipelines = num_pipelines // lanes + (1 if lane < num_pipelines % lanes else 0)
+            lane_merge = split + 4 * lane_pipelines + 1
+            for pipeline in range(lane_pipelines):
+                first = split + 1 + 4 * pipeline
+                children[split - 1].append(first)
+                for step in range(first, first + 3):
+                    children[step - 1].append(step + 1)
+                children[first + 2].append(lane_merge)
+            children[lane_merge - 1].append(merge)
+            job = lane_merge + 1
+        # mapMerge -> maqIndex -> pileup
+        children[merge - 1].append(merge + 1)
+        children[merge].append(merge + 2)
+        return self._create_workflow('epigenomics_{}'.format(len(children)), children, rng)
+
+    def random(self, num_jobs, width=100, fan_in=3, depth=None):
+        """
+        Random DAG with depth levels. Each job after the first level has between 1 and fan_in parents: one in the
+        previous level, which sets its level, and the others in any earlier level.
+
+        Args:
+            num_jobs (int): number of jobs
+            width (int): number of jobs in a level, used if depth is not given
+            fan_in (int): maximum number of parents of a job
+            depth (int): number of levels, at most num_jobs. The jobs are spread evenly over the levels
+
+        Returns:
+            SyntheticWorkflow
+        """
+        rng = random.Random(self.seed)
+        depth = depth or math.ceil(num_jobs / width)
+        if not 1 <= depth <= num_jobs:
+            raise ValueError('Random workflows of {} jobs can have 1 to {} levels, not {}'.format(
+                num_jobs, num_jobs, depth))
+        # first job of each level, with the levels sized as evenly as possible
+        level_starts = [level * num_jobs // depth for level in range(depth + 1)]
+        children = [[] for _ in range(num_jobs)]
+        for level in range(1, depth):
+            previous_start, start, end = level_starts[level - 1], level_starts[level], level_starts[level + 1]
+            for job in range(start, end):
+                parents = {rng.randrange(previous_start, start)}
+                for _ in range(rng.randint(1, fan_in) - 1):
+                    parents.add(rng.randrange(0, start))
+                for parent in sorted(parents):
+                    children[parent].append(job + 1)
+        return self._create_workflow('random_{}'.format(num_jobs), children, rng)
@@ -1,10 +1,10 @@
 import datetime
 import os
-import yaml
 import xml.etree.ElementTree as ET
 
 from fireworks import Firework, ScriptTask
 from swarmform.core.swarmwork import SwarmFlow
+from swarmform.util.file_loader import load_cached, load_yaml
 
 
 class WorkflowGenerator():
@@ -53,22 +53,69 @@ class WorkflowGenerator():
     # When the DAX is given, output a dict with children of each parent
     # { parent_id : [child_id] }
     def get_parent_child_relationships(cls, id_map, dax):
-        job_ids = id_map.keys()
-        dependency_dict = {}
-        for job in job_ids:
-            # Get the child tag in the dict and set it as the parent
-            parent = job
-            children = []
-            # Traverse the DAX to find children with parent tags equal to parent
-            # If found, set the child tag(one level up in the xml tree) as a child of the considered parent
-            for child in dax:
-                if child.tag.endswith('child'):
-                    for parent_id in child:
-                        if parent_id.attrib['ref'] == parent:
-                            children.append(child.attrib['ref'])
-            dependency_dict.update({parent: children})
+        dependency_dict = {job: [] for job in id_map}
+        # Traverse the DAX once and add the child tag of each child element to the children of its parents
+        for child in dax:
+            if child.tag.endswith('child'):
+                cls.add_child_to_parents(dependency_dict, child)
         return dependency_dict
 
+    @classmethod
+    # Add the child tag of a child element to the children of each of its parent tags which is a job of the DAX
+    def add_child_to_parents(cls, dependency_dict, child):
+        for parent_id in child:
+            children = dependency_dict.get(parent_id.attrib['ref'])
+            if children is not None:
+                children.append(child.attrib['ref'])
+
+    @classmethod
+    # Parse a DAX file in a single streaming pass, without building the whole XML tree
+    # Output is the same as parse_dax(read_input_dax(filename))
+    def parse_dax_file(cls, filename):
+        workflow_dict = {}
+        id_map = {}
+        # children of each job, also of the jobs which are referenced before they are defined
+        dependency_dict = {}
+        root = None
+        job_count = None
+        namespace = None
+        depth = 0
+
+        for event, elem in ET.iterparse(filename, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if root is None:
+                    root = elem
+                    job_count = elem.attrib['jobCount']
+                elif depth == 2 and namespace is None:
+                    namespace = elem.attrib['namespace']
+                continue
+
+            depth -= 1
+            # Only the children of the root are processed, once they are completely parsed
+            if depth != 1:
+                continue
+            if elem.tag.endswith('job'):
+                firework = [round((float(elem.attrib['runtime'])/float(10)), 3), 0]
+                fw_id = len(workflow_dict) + 1
+                workflow_dict.update({fw_id: firework})
+                id_map.update({elem.attrib['id']: fw_id})
+                dependency_dict.setdefault(elem.attrib['id'], [])
+            elif elem.tag.endswith('child'):
+                for parent_id in elem:
+                    dependency_dict.setdefault(parent_id.attrib['ref'], []).append(elem.attrib['ref'])
+            # Drop the processed elements, so that memory does not grow with the size of the file
+            root.clear()
+
+        swarmflow_name = namespace + "_" + job_count
+        dependency_dict = {job: dependency_dict[job] for job in id_map}
+        updated_dependency_dict = cls.replace_job_id_with_fw_id(id_map, dependency_dict)
+        for fw_id in workflow_dict:
+            fw = workflow_dict[fw_id]
+            fw.append(updated_dependency_dict[fw_id])
+
+        return workflow_dict, swarmflow_name
+
     @classmethod
     def replace_job_id_with_fw_id(cls, id_map,dependency_dict):
 
@@ -90,7 +137,7 @@ class WorkflowGenerator():
     def read_input_yaml(cls, filename):
         try:
             with open(filename, 'r') as f:
-                input_yaml = yaml.load(f, Loader=yaml.FullLoader)
+                input_yaml = load_yaml(f)
             jobs = input_yaml['fireworks']
             swarmflow_name = input_yaml['swarmflow_name']
             return jobs, swarmflow_name
@@ -129,8 +176,27 @@ class WorkflowGenerator():
         return firework
 
     @classmethod
-    # Create shell script file for each firework
-    def create_scripts(cls, dir_name, jobs):
+    # Generate a single line command for each job, doing the same as its script
+    # The command is a group, so that it can be combined parallely by ParallelTask
+    def gen_command(cls, job_id, job_exec_time):
+        command = '{{ echo "##########task {0} start time $(date +"%T.%3N")"; sleep {1}; ' \
+                  'echo "##########task {0} end time $(date +"%T.%3N")"; }}'
+        command = command.format(job_id, job_exec_time)
+        return command
+
+    @classmethod
+    # Create the task of each firework
+    # script_mode 'inline': embed the command of each job in its ScriptTask, without writing any file
+    # script_mode 'bundle': write the scripts of all the jobs to a single file, indexed by job id
+    # script_mode 'files': write a shell script file for each job
+    def create_scripts(cls, dir_name, jobs, script_mode='inline'):
+        if script_mode == 'inline':
+            return [Firework(ScriptTask.from_str(cls.gen_command(job_id, jobs[job_id][0]))) for job_id in jobs]
+        elif script_mode == 'bundle':
+            return cls.create_script_bundle(dir_name, jobs)
+        elif script_mode != 'files':
+            raise ValueError('Unknown script mode {}. Use inline, bundle or files'.format(script_mode))
+
         fws = []
 
         # eg: filename = task1.sh
@@ -148,6 +214,21 @@ class WorkflowGenerator():
 
         return fws
 
+    @classmethod
+    # Write the scripts of all the jobs to a single file and create a firework running its job from the file
+    # eg: sh tasks.sh 1
+    def create_script_bundle(cls, dir_name, jobs):
+        filename = dir_name + "/tasks.sh"
+        with open(filename, 'w+') as f:
+            f.write('case "$1" in\n')
+            for job_id in jobs:
+                f.write('{})\n{}\n;;\n'.format(job_id, cls.gen_script(job_id, jobs[job_id][0])))
+            f.write('esac\n')
+
+        command = "sh " + os.getcwd() + "/" + filename + " {}"
+        fws = [Firework(ScriptTask.from_str(command.format(job_id))) for job_id in jobs]
+        return fws
+
     @classmethod
     # Map the firework ids to its list positions
     def map_list_positions(cls, child_id):
@@ -210,17 +291,22 @@ class WorkflowGenerator():
         return None
 
     @classmethod
-    def generate_workflow(cls, input_file):
+    # Set cache to reuse the parsed input file from a sidecar cache next to it (see file_loader.load_cached)
+    # Set script_mode to choose how the jobs are written (see create_scripts)
+    def generate_workflow(cls, input_file, cache=False, script_mode='inline'):
 
         if input_file.endswith('yaml') or input_file.endswith('yml'):
-            jobs, swarmflow_name = cls.read_input_yaml(input_file)
+            read_input = cls.read_input_yaml
         elif input_file.endswith('xml'):
-            xml_tree = cls.read_input_dax(input_file)
-            jobs, swarmflow_name = cls.parse_dax(xml_tree)
+            read_input = cls.parse_dax_file
         else:
             raise IOError('Input file format not recognized. Only YAML and DAX formats are supported')
+        if cache:
+            jobs, swarmflow_name = load_cached(input_file, read_input, 'jobs')
+        else:
+            jobs, swarmflow_name = read_input(input_file)
         dir_name = cls.create_directory(swarmflow_name)
-        fireworks = cls.create_scripts(dir_name, jobs)
+        fireworks = cls.create_scripts(dir_name, jobs, script_mode)
         dependencies = cls.create_dependencies(jobs, fireworks)
         metadata = cls.create_metadata(jobs, fireworks)
         swarmflow = SwarmFlow(fireworks=fireworks, links_dict=dependencies, metadata=metadata, name=swarmflow_name)
@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+from swarmform.core.cluster import cluster_sf
+from swarmform.core.clustering_algo import cluster_dag
+from swarmform.core.clustering_algo.wpa_clustering import cluster_vertically, wpa_clustering
+from swarmform.core.swarm_dag import DAG, get_cluster_steps
+from swarmform.core.swarmwork import SwarmFlow
+from swarmform.util.workflow_generator import WorkflowGenerator
+
+DAX_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'swarmform', 'util', 'workflows', 'dax')
+# workflows with chains of tasks, which are clustered vertically before the WPA clustering
+CHAINED_DAXES = ['Inspiral_30.xml', 'Inspiral_100.xml', 'Epigenomics_100.xml']
+# fingerprints of the plans of the default clustering of the bundled DAXes. The clusters are the ones of the original
+# WPA clustering, except that the Epigenomics and Inspiral clusters also run the fireworks of their chains
+PLAN_FINGERPRINTS = {
+    'CyberShake_100': 'fede22863447080f27f3da439095860478f00eb872babfd901bc8130922dffee',
+    'CyberShake_1000': '3a3460c849b787a37e52b855635191ec0ab694abdd68eed03dc3206fb03cb0e9',
+    'CyberShake_30': 'fe5ae9aaa4c35e683be3cdc95e0f892cea9049a7797caaf773581d0ee7399ce2',
+    'CyberShake_50': 'b7e3334193076b6bb78c86f0187dd5e62bc0715794302daf0e649f89df6e278e',
+    'Epigenomics_100': '1f7ed4ed8e6c6c139fcd6220a05104a537d05930c78f575dd460cd21eb325ad9',
+    'Epigenomics_24': 'c7745496fac23e8d185ec54bf15747bd51f09fe151fb42f89ed2f5166fc33cdf',
+    'Epigenomics_46': '56b256bbca220b904cd49c0b571cee5fc0f2cc4605f2693e3ffa8e4cf3892749',
+    'Epigenomics_997': '4582a4e522284ecbe8aa4d89b10798573820dc32d77a6832dda109f55704ce10',
+    'HEFT_paper': '83ec390afa6d0ec4d9e6d8da4d96a6c0ff9e1c1dc23c0bf549cf7032194f88df',
+    'Inspiral_100': '745fc1f4dcd52114a4614c34545b322cda8d51b09eb96c9a1654c401a996d374',
+    'Inspiral_1000': '212f88eaecd2f7497f8fc0c5ff7d590005df8d662f4a4880932bd51ef9f02631',
+    'Inspiral_30': '326c36aa827190238e2a0211b447dd5a33057a57d70d07987665d39438d0a6f5',
+    'Inspiral_50': 'e8db4c3683dfeb1d2337c4f9b558e65ff19d212ebc2891f279878d12ceb6615d',
+    'Montage_100': '16190e9cedc746a5204e66c42179a98038eb1e0ee25bb83351ba33d9cd0cd1d1',
+    'Montage_1000': '63b93a46ed0f4ee81fa1f32e771028394112f0dda35f4d23abc77fcd08259498',
+    'Montage_25': '1f496f8763eeb8bb225c211ffa0c8275c9c772631f4234029e44ff88b79b98f9',
+    'Montage_50': '72bcde8dfb36469470112e6ceae52cbd1a3cc6ce6a73eb0a4ee76d2f79ab3255',
+    'Sipht_100': '1d636aee6a9010604b8c956c2089d682ba26d5a9f7e2f49925cb148781276968',
+    'Sipht_30': 'cbc7d68ca9c8035fb740fbb80dbe35f084df1420e1ee2830ac9728fa42dff4f0',
+    'Sipht_60': 'b50426b6d2612dbb68e2f47c4dc36ce8d06f0ea221726b567d8a0d73eb05259e',
+    'floodplain': 'b54026f6019821a5a9b4b195ba2bc79ade47df94afc7b27fbf73bdd08ea59424',
+}
+
+
+def generate_dax_swarmflow(dax, tmp_path, monkeypatch):
+    # the generator writes the scripts of the workflow to the working directory
+    monkeypatch.chdir(tmp_path)
+    jobs, name = WorkflowGenerator.parse_dax_file(os.path.join(DAX_DIR, dax))
+    fireworks = WorkflowGenerator.create_scripts(WorkflowGenerator.create_directory(name), jobs)
+    costs = WorkflowGenerator.create_metadata(jobs, fireworks)['costs']
+    # the costs are keyed by strings, as they are in a swarmflow read from the SwarmPad
+    return SwarmFlow(fireworks=fireworks, links_dict=WorkflowGenerator.create_dependencies(jobs, fireworks),
+                     metadata={'costs': {str(fw_id): fw_info for fw_id, fw_info in costs.items()}}, name=name)
+
+
+@pytest.mark.parametrize('dax', CHAINED_DAXES)
+@pytest.mark.parametrize('packing', ['pairs', 'best_fit'])
+def test_plan_runs_every_firework_once(dax, packing, tmp_path, monkeypatch):
+    sf = generate_dax_swarmflow(dax, tmp_path, monkeypatch)
+    plan = cluster_dag(DAG(sf), packing=packing).get_clustering_plan()
+    fw_ids = [fw_id for cluster in plan['clusters'] for step in get_cluster_steps(cluster) for fw_id in step]
+    assert sorted(fw_ids) == sorted(fw.fw_id for fw in sf.fws)
+
+
+@pytest.mark.parametrize('dax', CHAINED_DAXES)
+def test_provenance_covers_every_firework(dax, tmp_path, monkeypatch):
+    utils = pytest.importorskip('benchmarks.utils')
+    pytest.importorskip('mongomock')
+    sf = generate_dax_swarmflow(dax, tmp_path, monkeypatch)
+    swarmpad = utils.get_swarmpad()
+    swarmpad.add_sf(sf)
+    original_ids = [str(fw.fw_id) for fw in sf.fws]
+    clustered_sf = cluster_sf(swarmpad, sf.sf_id)
+    provenance = clustered_sf.metadata['provenance']
+    assert sorted(provenance) == sorted(original_ids)
+    assert set(provenance.values()) == set(fw.fw_id for fw in clustered_sf.fws)
+    assert sorted(clustered_sf.metadata['costs']) == sorted(str(fw.fw_id) for fw in clustered_sf.fws)
+
+
+@pytest.mark.parametrize('dax', sorted(PLAN_FINGERPRINTS))
+def test_plans_of_bundled_daxes(dax):
+    jobs, _ = WorkflowGenerator.parse_dax_file(os.path.join(DAX_DIR, dax + '.xml'))
+    links = {job_id: job[2] for job_id, job in jobs.items()}
+    costs = {str(job_id): {'exec_time': job[0], 'cores': job[1]} for job_id, job in jobs.items()}
+    dag = wpa_clustering(cluster_vertically(DAG.from_links(links, costs)))
+    assert dag.get_plan_fingerprint() == PLAN_FINGERPRINTS[dax]
@@ -0,0 +1,45 @@
+import importlib
+import sys
+
+import pytest
+
+from swarmform.core.swarm_dag import DAG
+
+pytest.importorskip('numpy')
+from swarmform.core.compact_dag import CompactDAG  # noqa: E402
+
+LINKS = {1: [2, 3], 2: [4], 3: [4], 4: []}
+
+
+def get_costs(exec_times):
+    return {str(fw_id): {'exec_time': exec_time, 'cores': 1} for fw_id, exec_time in enumerate(exec_times, start=1)}
+
+
+def test_nodes_match_the_dag():
+    costs = get_costs([10, 20, 30, 40])
+    dag, compact_dag = DAG.from_links(LINKS, costs), CompactDAG.from_links(LINKS, costs)
+    assert compact_dag.get_height() == dag.get_height()
+    for fw_id, node in dag.get_nodes().items():
+        view = compact_dag.get_nodes()[fw_id]
+        assert view.get_level() == node.get_level()
+        assert sorted(parent.get_fw_id() for parent in view.get_parents()) == node.get_parent_ids()
+
+
+def test_integer_exec_times_keep_their_type():
+    compact_dag = CompactDAG.from_links(LINKS, get_costs([10, 20, 30, 40]))
+    exec_time = compact_dag.get_nodes()[1].get_exec_time()
+    assert exec_time == 10 and type(exec_time) is int
+
+
+def test_mixed_exec_times_are_floats():
+    # as documented on CompactDAG, one float execution time makes all of them floats
+    compact_dag = CompactDAG.from_links(LINKS, get_costs([10, 20.5, 30, 40]))
+    assert [type(node.get_exec_time()) for node in compact_dag.get_nodes().values()] == [float] * 4
+    assert compact_dag.get_nodes()[2].get_exec_time() == 20.5
+
+
+def test_missing_numpy_names_the_extra(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'numpy', None)
+    monkeypatch.delitem(sys.modules, 'swarmform.core.compact_dag')
+    with pytest.raises(ImportError, match=r'swarmform\[compact\]'):
+        importlib.import_module('swarmform.core.compact_dag')
@@ -0,0 +1,108 @@
+import os
+import pickle
+
+import pytest
+
+from swarmform.util import file_loader
+from swarmform.util.file_loader import get_cache_path, load_cached, save_cache
+
+
+class CountingLoader:
+    """
+    Loads the content of a file and counts the loads
+    """
+
+    def __init__(self):
+        self.num_loads = 0
+
+    def __call__(self, filename):
+        self.num_loads += 1
+        with open(filename) as f:
+            return f.read()
+
+
+@pytest.fixture
+def workflow_file(tmp_path):
+    path = tmp_path / 'workflow.yaml'
+    path.write_text('name: first\n')
+    return str(path)
+
+
+def test_cached_until_the_file_changes(workflow_file):
+    load = CountingLoader()
+    assert load_cached(workflow_file, load, 'text') == 'name: first\n'
+    assert load_cached(workflow_file, load, 'text') == 'name: first\n'
+    assert load.num_loads == 1
+    assert os.path.exists(get_cache_path(workflow_file, 'text'))
+
+    # same size, other modification time and content
+    stat = os.stat(workflow_file)
+    with open(workflow_file, 'w') as f:
+        f.write('name: other\n')
+    os.utime(workflow_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert load_cached(workflow_file, load, 'text') == 'name: other\n'
+    assert load.num_loads == 2
+
+
+def test_size_change_with_the_same_modification_time(workflow_file):
+    load = CountingLoader()
+    load_cached(workflow_file, load, 'text')
+    stat = os.stat(workflow_file)
+    with open(workflow_file, 'w') as f:
+        f.write('name: a longer name\n')
+    os.utime(workflow_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert load_cached(workflow_file, load, 'text') == 'name: a longer name\n'
+    assert load.num_loads == 2
+
+
+def test_touched_file_is_validated_by_its_hash(workflow_file):
+    load = CountingLoader()
+    load_cached(workflow_file, load, 'text')
+    stat = os.stat(workflow_file)
+    os.utime(workflow_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert load_cached(workflow_file, load, 'text') == 'name: first\n'
+    assert load.num_loads == 1
+    # the sidecar is updated with the new modification time
+    with open(get_cache_path(workflow_file, 'text'), 'rb') as f:
+        assert pickle.load(f)['mtime'] == stat.st_mtime_ns + 10 ** 9
+
+
+def test_kinds_use_separate_sidecars(workflow_file):
+    load = CountingLoader()
+    load_cached(workflow_file, load, 'text')
+    load_cached(workflow_file, load, 'jobs')
+    assert load.num_loads == 2
+
+
+def test_corrupt_sidecar_is_replaced(workflow_file):
+    with open(get_cache_path(workflow_file, 'text'), 'wb') as f:
+        f.write(b'not a pickle')
+    load = CountingLoader()
+    assert load_cached(workflow_file, load, 'text') == 'name: first\n'
+    assert load_cached(workflow_file, load, 'text') == 'name: first\n'
+    assert load.num_loads == 1
+
+
+class Unpicklable:
+
+    def __reduce__(self):
+        raise pickle.PicklingError('not picklable')
+
+
+def test_failed_save_leaves_no_temporary_file(tmp_path):
+    with pytest.raises(pickle.PicklingError):
+        save_cache(str(tmp_path / '.workflow.yaml.text.cache'), {'data': Unpicklable()})
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_temporary_file_is_hidden(tmp_path, monkeypatch):
+    names = []
+    replace = os.replace
+
+    def record_replace(src, dst):
+        names.append(os.path.basename(src))
+        replace(src, dst)
+
+    monkeypatch.setattr(file_loader.os, 'replace', record_replace)
+    save_cache(str(tmp_path / '.workflow.yaml.text.cache'), {'data': 'name: first\n'})
+    assert len(names) == 1 and names[0].startswith('.')
@@ -0,0 +1,38 @@
+import pytest
+
+from swarmform.core.clustering_algo import cluster_dag
+from swarmform.core.clustering_algo.wpa_clustering import cluster_vertically
+from swarmform.core.swarm_dag import DAG
+from swarmform.util.makespan_simulator import MakespanSimulator
+from swarmform.util.synthetic_generator import SyntheticWorkflowGenerator
+
+
+def test_upward_rank_priorities_start_the_critical_path_first():
+    # two single core workers: in order, 1 and 2 delay the chain 3 -> 4, which is started first by its upward rank
+    costs = {'1': {'exec_time': 1, 'cores': 1}, '2': {'exec_time': 1, 'cores': 1}, '3': {'exec_time': 2, 'cores': 1},
+             '4': {'exec_time': 3, 'cores': 1}}
+    dag = DAG.from_links({1: [], 2: [], 3: [4], 4: []}, costs)
+    simulator = MakespanSimulator(2, 1)
+    assert simulator.simulate(dag)['makespan'] == 6
+    assert simulator.simulate(dag, dag.get_priorities('upward_rank'))['makespan'] == 5
+
+
+@pytest.mark.parametrize('shape', ['layered', 'fork_join', 'montage', 'epigenomics', 'random'])
+def test_upward_rank_priorities_do_not_increase_the_makespan(shape):
+    sf = SyntheticWorkflowGenerator(seed=0).generate(shape, 1000).to_swarmflow()
+    dag = cluster_dag(DAG(sf))
+    simulator = MakespanSimulator(4, 4, job_overhead=5)
+    makespan = simulator.simulate(dag)['makespan']
+    assert simulator.simulate(dag, dag.get_priorities('upward_rank'))['makespan'] <= makespan
+
+
+def test_utilization_counts_the_cores_the_fireworks_use():
+    # the chain runs as one job holding 4 cores for 4 seconds, but its first firework uses a single core
+    costs = {'1': {'exec_time': 2, 'cores': 1}, '2': {'exec_time': 2, 'cores': 4}}
+    dag = cluster_vertically(DAG.from_links({1: [2], 2: []}, costs))
+    simulator = MakespanSimulator(1, 4)
+    for clustered_dag in (dag, DAG.from_plan(dag.get_clustering_plan(), costs)):
+        result = simulator.simulate(clustered_dag)
+        assert (result['num_jobs'], result['makespan']) == (1, 4)
+        assert result['allocation'] == 1.0
+        assert result['utilization'] == 10 / 16
@@ -0,0 +1,111 @@
+import datetime
+import os
+
+import pytest
+
+from swarmform.core.clustering_algo import cluster_dag
+from swarmform.core.plan_cache import DiskPlanCache, PlanCache, SwarmPadPlanCache
+from swarmform.core.swarm_dag import DAG
+from swarmform.util.synthetic_generator import SyntheticWorkflowGenerator
+
+PACKING = {'packing': 'best_fit'}
+
+
+def generate_workflow(seed=0):
+    # fork-join workflows with cores of several widths get parallel clusters with best_fit packing
+    return SyntheticWorkflowGenerator(cores=('choice', [1, 2, 4]), seed=seed).generate('fork_join', 60, width=10)
+
+
+def get_plan(links, costs, **options):
+    return cluster_dag(DAG.from_links(links, costs), **options).get_clustering_plan()
+
+
+def shift_ids(workflow, offset):
+    """
+    Returns:
+        (dict, dict): links and costs of the workflow with offset added to the fw_ids
+    """
+    links = {fw_id + offset: [child_id + offset for child_id in children]
+             for fw_id, children in workflow.get_links().items()}
+    costs = {str(int(fw_id) + offset): fw_info for fw_id, fw_info in workflow.get_costs().items()}
+    return links, costs
+
+
+@pytest.fixture(params=['disk', 'swarmpad'])
+def cache(request, tmp_path):
+    if request.param == 'disk':
+        return DiskPlanCache(str(tmp_path), max_entries=2)
+    utils = pytest.importorskip('benchmarks.utils')
+    pytest.importorskip('mongomock')
+    return SwarmPadPlanCache(utils.get_swarmpad(), max_entries=2)
+
+
+def set_last_use(cache, links, costs, age):
+    """
+    Set the last use of the plan of a workflow to age seconds ago
+    """
+    key = PlanCache.get_key(links, costs, options=PACKING)
+    if isinstance(cache, DiskPlanCache):
+        last_use = datetime.datetime.now().timestamp() - age
+        os.utime(cache._get_path(key), (last_use, last_use))
+    else:
+        cache.plans.update_one({'_id': key},
+                               {'$set': {'last_used': datetime.datetime.utcnow() - datetime.timedelta(seconds=age)}})
+
+
+def test_round_trip_translates_the_fw_ids(cache):
+    workflow = generate_workflow()
+    links, costs = shift_ids(workflow, 100)
+    cache.save(links, costs, get_plan(links, costs, **PACKING), options=PACKING)
+    # the same workflow inserted again gets other fw_ids
+    links, costs = shift_ids(workflow, 500)
+    assert cache.lookup(links, costs, options=PACKING) == get_plan(links, costs, **PACKING)
+
+
+def test_miss_on_other_costs_or_options(cache):
+    links, costs = shift_ids(generate_workflow(), 0)
+    cache.save(links, costs, get_plan(links, costs, **PACKING), options=PACKING)
+    assert cache.lookup(links, costs) is None
+    assert cache.lookup(*shift_ids(generate_workflow(seed=1), 0), options=PACKING) is None
+
+
+def test_least_recently_used_plan_is_evicted(cache):
+    workflows = [shift_ids(generate_workflow(seed), 0) for seed in range(3)]
+    for age, (links, costs) in zip([20, 10], workflows):
+        cache.save(links, costs, get_plan(links, costs, **PACKING), options=PACKING)
+        set_last_use(cache, links, costs, age)
+    # the lookup makes the first plan the most recently used one
+    assert cache.lookup(*workflows[0], options=PACKING) is not None
+    links, costs = workflows[2]
+    cache.save(links, costs, get_plan(links, costs, **PACKING), options=PACKING)
+    assert cache.lookup(*workflows[0], options=PACKING) is not None
+    assert cache.lookup(*workflows[1], options=PACKING) is None
+    assert cache.lookup(*workflows[2], options=PACKING) is not None
+
+
+def test_order_of_the_links_is_part_of_the_key(tmp_path):
+    # the parents of 5 which are not the longest are paired in the reverse order of the links
+    costs = {str(fw_id): {'exec_time': 5, 'cores': 1} for fw_id in range(1, 6)}
+    costs['1']['exec_time'] = 10
+    links = {1: [5], 2: [5], 3: [5], 4: [5], 5: []}
+    reversed_links = {4: [5], 3: [5], 2: [5], 1: [5], 5: []}
+    assert get_plan(links, costs) != get_plan(reversed_links, costs)
+
+    cache = DiskPlanCache(str(tmp_path))
+    cache.save(links, costs, get_plan(links, costs))
+    assert cache.lookup(reversed_links, costs) is None
+    assert PlanCache.get_key(links, costs) != PlanCache.get_key(links, costs, fw_ids=[5, 4, 3, 2, 1])
+
+
+def test_cluster_keys_of_unsaved_swarmflow(tmp_path):
+    # a plan cached for saved fireworks is reused for the negative fw_ids of an unsaved swarmflow, and its cluster
+    # keys stay below them
+    workflow = generate_workflow()
+    cache = DiskPlanCache(str(tmp_path))
+    links, costs = shift_ids(workflow, 100)
+    cache.save(links, costs, get_plan(links, costs, **PACKING), options=PACKING)
+    links, costs = shift_ids(workflow, -1000)
+    plan = cache.lookup(links, costs, options=PACKING)
+    assert plan == get_plan(links, costs, **PACKING)
+    keys = [key for cluster in plan['clusters'] for key, _ in cluster['parallel_ids']]
+    assert keys and max(keys) < min(links)
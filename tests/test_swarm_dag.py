@@ -0,0 +1,75 @@
+import pytest
+from fireworks import Firework, ScriptTask
+
+from swarmform.core.clustering_algo import cluster_dag
+from swarmform.core.swarm_dag import DAG, Node, get_cluster_steps
+from swarmform.core.swarmwork import SwarmFlow
+from swarmform.util.synthetic_generator import SyntheticWorkflowGenerator
+
+
+def create_node(fw_id, level):
+    return Node(fw_id=fw_id, level=level, fw_info={'exec_time': 1, 'cores': 1}, parents=[], children=[])
+
+
+def test_merge_nodes_rejects_cycle():
+    # 1 -> 2 -> 3, merging 1 and 3 makes the merged node a parent and a child of 2
+    dag = DAG.from_links({1: [2], 2: [3], 3: []})
+    with pytest.raises(ValueError):
+        dag.merge_nodes([1, 3], create_node(1, 1))
+    # the DAG is left untouched
+    assert sorted(dag.get_nodes()) == [1, 2, 3]
+    assert dag.get_parent_child_relationships() == {1: [2], 2: [3], 3: []}
+
+
+def test_merge_nodes_of_a_chain():
+    dag = DAG.from_links({1: [2], 2: [3], 3: []})
+    dag.merge_nodes([1, 2], create_node(1, 1))
+    assert dag.get_parent_child_relationships() == {1: [3], 3: []}
+    assert dag.get_nodes()[3].get_level() == 2
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_wpa_clustering_of_random_workflows(seed):
+    sf = SyntheticWorkflowGenerator(seed=seed).generate('random', 300).to_swarmflow()
+    clustered = cluster_dag(DAG(sf))
+    fw_ids = set()
+    for node in clustered.get_nodes().values():
+        fw_ids.update(node.get_cluster_info() or [node.get_fw_id()])
+    assert fw_ids == set(fw.fw_id for fw in sf.fws)
+
+
+def test_critical_path():
+    costs = {'1': {'exec_time': 1, 'cores': 1}, '2': {'exec_time': 5, 'cores': 1}, '3': {'exec_time': 2, 'cores': 1},
+             '4': {'exec_time': 1, 'cores': 1}}
+    dag = DAG.from_links({1: [2, 3], 2: [4], 3: [4], 4: []}, costs)
+    assert dag.get_critical_path() == [1, 2, 4]
+    assert dag.get_critical_path_length() == 7
+    assert dag.get_slack(3) == 3
+
+
+def test_can_merge_nodes():
+    # 1 -> 2 -> 4 and 3 -> 4: 1 reaches 4 through 2, 1 and 3 are independent although at different levels
+    dag = DAG.from_links({1: [2], 2: [4], 3: [4], 4: []})
+    assert not dag.can_merge_nodes([1, 4])
+    assert dag.can_merge_nodes([2, 3])
+    assert dag.can_merge_nodes([1, 2])
+    assert dag.can_merge_nodes([1, 3])
+
+
+def test_cluster_keys_of_unsaved_swarmflow():
+    # the fireworks of a swarmflow which is not saved have negative fw_ids, as the parallel cluster keys
+    parents = [Firework(ScriptTask.from_str('echo parent')) for _ in range(4)]
+    child = Firework(ScriptTask.from_str('echo child'))
+    # the longest parent bounds the runtime of the clusters, the other parents run parallely on the cores of the widest
+    costs = {str(fw.fw_id): {'exec_time': 5, 'cores': 1} for fw in parents + [child]}
+    costs[str(parents[0].fw_id)] = {'exec_time': 10, 'cores': 1}
+    costs[str(parents[1].fw_id)] = {'exec_time': 5, 'cores': 4}
+    sf = SwarmFlow(parents + [child], links_dict={fw: [child] for fw in parents}, metadata={'costs': costs})
+    fw_ids = set(fw.fw_id for fw in sf.fws)
+    assert max(fw_ids) < 0
+
+    plan = cluster_dag(DAG(sf), packing='best_fit').get_clustering_plan()
+    keys = [key for cluster in plan['clusters'] for key, _ in cluster['parallel_ids']]
+    assert keys and all(key < min(fw_ids) for key in keys)
+    assert sorted(fw_id for cluster in plan['clusters'] for step in get_cluster_steps(cluster)
+                  for fw_id in step) == sorted(fw_ids)
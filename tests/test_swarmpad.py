@@ -0,0 +1,145 @@
+import datetime
+
+import pytest
+from fireworks import Firework, ScriptTask
+
+from swarmform.util.synthetic_generator import SyntheticWorkflowGenerator
+
+utils = pytest.importorskip('benchmarks.utils')
+pytest.importorskip('mongomock')
+
+
+CREATED_ON = datetime.datetime(2020, 1, 1)
+
+
+def generate_swarmflow(seed=0, num_nodes=20):
+    return SyntheticWorkflowGenerator(seed=seed).generate('layered', num_nodes, width=4).to_swarmflow(CREATED_ON)
+
+
+def generate_swarmflows():
+    sfs = [generate_swarmflow(seed) for seed in range(3)]
+    # a SwarmFlow with its own id and a single Firework are added next to the SwarmFlows which get a new id
+    sfs[1].sf_id = 100
+    sfs.append(Firework(ScriptTask.from_str('echo firework'), fw_id=1, created_on=CREATED_ON, updated_on=CREATED_ON))
+    return sfs
+
+
+def get_documents(swarmpad):
+    """
+    Returns:
+        dict: documents of the Fireworks, the SwarmFlows and the next ids of the SwarmPad, without their Mongo ids.
+            The update times are left out, setting the root Fireworks as READY updates them
+    """
+    return {name: list(getattr(swarmpad, name).find({}, {'_id': 0, 'updated_on': 0}).sort('_id'))
+            for name in ('fireworks', 'workflows', 'fw_id_assigner')}
+
+
+@pytest.fixture
+def swarmpad():
+    return utils.get_swarmpad()
+
+
+def test_get_fws_by_ids(swarmpad):
+    for seed in range(3):
+        swarmpad.add_sf(generate_swarmflow(seed))
+    fw_ids = swarmpad.get_fw_ids()
+    # unsorted ids, split in several batches
+    fw_ids = fw_ids[1::2] + fw_ids[::2]
+    fws = swarmpad.get_fws_by_ids(fw_ids, batch_size=7)
+    assert [fw.to_dict() for fw in fws] == [swarmpad.get_fw_by_id(fw_id).to_dict() for fw_id in fw_ids]
+
+
+def test_get_fws_by_ids_with_launches(swarmpad, tmp_path):
+    from fireworks import FWorker
+    swarmpad.add_sf(generate_swarmflow())
+    swarmpad.checkout_fw(FWorker(), str(tmp_path))
+    fw_ids = swarmpad.get_fw_ids()
+    fws = swarmpad.get_fws_by_ids(fw_ids)
+    assert any(fw.launches for fw in fws)
+    assert [fw.to_dict() for fw in fws] == [swarmpad.get_fw_by_id(fw_id).to_dict() for fw_id in fw_ids]
+
+
+def test_get_fws_by_ids_missing_id(swarmpad):
+    swarmpad.add_sf(generate_swarmflow())
+    fw_ids = swarmpad.get_fw_ids()
+    with pytest.raises(ValueError):
+        swarmpad.get_fws_by_ids(fw_ids + [max(fw_ids) + 1])
+
+
+def test_add_sfs_matches_add_sf(swarmpad):
+    swarmpad.add_sf(generate_swarmflow(seed=10))
+    old_news = [swarmpad.add_sf(sf) for sf in generate_swarmflows()]
+    expected = get_documents(swarmpad)
+
+    swarmpad = utils.get_swarmpad()
+    swarmpad.add_sf(generate_swarmflow(seed=10))
+    assert swarmpad.add_sfs(generate_swarmflows(), batch_size=7) == old_news
+    assert get_documents(swarmpad) == expected
+    assert [sf['sf_id'] for sf in expected['workflows']] == [1, 2, 100, 3, 4]
+
+
+def test_add_sfs_reserves_ids(swarmpad):
+    swarmpad.add_sfs(generate_swarmflows())
+    fw_ids = swarmpad.get_fw_ids()
+    sf_ids = swarmpad.get_sf_ids()
+    sf = generate_swarmflow()
+    old_new = swarmpad.add_sf(sf)
+    # the SwarmFlows added next get the ids which follow the reserved ones
+    assert min(old_new.values()) == max(fw_ids) + 1
+    assert sf.sf_id == max(set(sf_ids) - {100}) + 1
+
+
+def get_states(swarmpad):
+    """
+    Returns:
+        dict: states of the Fireworks, SwarmFlows and launches of the SwarmPad
+    """
+    return {
+        'fireworks': {fw['fw_id']: fw['state'] for fw in swarmpad.fireworks.find()},
+        'workflows': {sf['sf_id']: (sf['state'], sf['fw_states']) for sf in swarmpad.workflows.find()},
+        'launches': {launch['launch_id']: launch['state'] for launch in swarmpad.launches.find()},
+    }
+
+
+def add_launched_swarmflows(swarmpad, launch_dir):
+    """
+    Add 3 SwarmFlows and launch a root Firework of the second one
+
+    Returns:
+        [int]: ids of the SwarmFlows
+    """
+    from fireworks import FWorker
+    sfs = [generate_swarmflow(seed) for seed in range(3)]
+    old_news = swarmpad.add_sfs(sfs)
+    swarmpad.checkout_fw(FWorker(), launch_dir, fw_id=old_news[1][1])
+    return [sf.sf_id for sf in sfs]
+
+
+def test_archive_sfs_matches_archive_wf(swarmpad, tmp_path):
+    sf_ids = add_launched_swarmflows(swarmpad, str(tmp_path))
+    for sf_id in sf_ids:
+        swarmpad.archive_wf(swarmpad.workflows.find_one({'sf_id': sf_id})['nodes'][0])
+    expected = get_states(swarmpad)
+
+    swarmpad = utils.get_swarmpad()
+    sf_ids = add_launched_swarmflows(swarmpad, str(tmp_path))
+    swarmpad.archive_sfs(sf_ids, batch_size=7)
+    states = get_states(swarmpad)
+    assert states == expected
+    assert set(states['fireworks'].values()) == {'ARCHIVED'}
+    # the launched SwarmFlow keeps its id through the refreshes of FireWorks
+    assert swarmpad.get_sf_ids({'state': 'ARCHIVED'}) == sorted(sf_ids)
+
+
+def test_archive_sfs_skips_archived_swarmflows(swarmpad):
+    sfs = [generate_swarmflow(seed) for seed in range(3)]
+    swarmpad.add_sfs(sfs)
+    sf_ids = [sf.sf_id for sf in sfs]
+    swarmpad.archive_sfs(sf_ids[:1])
+    archived = swarmpad.workflows.find_one({'sf_id': sf_ids[0]}, {'_id': 0})
+    assert swarmpad.get_sf_ids({'state': 'ARCHIVED'}) == sf_ids[:1]
+
+    # archiving again leaves the archived SwarmFlow as it is, unknown ids are ignored
+    swarmpad.archive_sfs(sf_ids + [1000])
+    assert swarmpad.workflows.find_one({'sf_id': sf_ids[0]}, {'_id': 0}) == archived
+    assert swarmpad.get_sf_ids({'state': 'ARCHIVED'}) == sorted(sf_ids)
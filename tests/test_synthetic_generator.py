@@ -0,0 +1,16 @@
+import pytest
+
+from swarmform.core.swarm_dag import DAG
+from swarmform.util.synthetic_generator import SyntheticWorkflowGenerator
+
+
+@pytest.mark.parametrize('depth', [1, 2, 10])
+def test_random_workflow_depth(depth):
+    workflow = SyntheticWorkflowGenerator(seed=0).random(10, depth=depth)
+    assert DAG.from_links(workflow.get_links(), workflow.get_costs()).get_height() == depth
+
+
+@pytest.mark.parametrize('depth', [11, 100])
+def test_random_workflow_deeper_than_its_jobs(depth):
+    with pytest.raises(ValueError):
+        SyntheticWorkflowGenerator(seed=0).random(10, depth=depth)
@@ -0,0 +1,71 @@
+import os
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from swarmform.util.workflow_generator import WorkflowGenerator
+
+DAX_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'swarmform', 'util', 'workflows', 'dax')
+# test.xml is not well-formed
+DAXES = sorted(dax for dax in os.listdir(DAX_DIR) if dax.endswith('.xml') and dax != 'test.xml')
+
+DAX_WITH_CHILDREN_BEFORE_PARENTS = """<?xml version="1.0" encoding="UTF-8"?>
+<adag xmlns="http://pegasus.isi.edu/schema/DAX" version="2.1" name="test" jobCount="3" childCount="2">
+  <job id="ID00000" namespace="Test" name="first" runtime="10.00"/>
+  <child ref="ID00002">
+    <parent ref="ID00000"/>
+    <parent ref="ID00001"/>
+  </child>
+  <job id="ID00001" namespace="Test" name="second" runtime="2.50"/>
+  <child ref="ID00001">
+    <parent ref="ID00000"/>
+    <parent ref="ID00099"/>
+  </child>
+  <job id="ID00002" namespace="Test" name="third" runtime="0.01"/>
+</adag>
+"""
+
+
+def get_parent_child_relationships(cls, id_map, dax):
+    # relationships as they were found before the single pass, by scanning the DAX for the children of each job
+    dependency_dict = {}
+    for parent in id_map.keys():
+        children = []
+        for child in dax:
+            if child.tag.endswith('child'):
+                for parent_id in child:
+                    if parent_id.attrib['ref'] == parent:
+                        children.append(child.attrib['ref'])
+        dependency_dict.update({parent: children})
+    return dependency_dict
+
+
+@pytest.fixture
+def parse_dax(monkeypatch):
+    """
+    Returns:
+        function: parser of a DAX file with the tree parser and the relationships scan it had before parse_dax_file
+    """
+    monkeypatch.setattr(WorkflowGenerator, 'get_parent_child_relationships',
+                        classmethod(get_parent_child_relationships))
+    return lambda filename: WorkflowGenerator.parse_dax(WorkflowGenerator.read_input_dax(filename))
+
+
+@pytest.mark.parametrize('dax', DAXES)
+def test_parse_dax_file(dax, parse_dax):
+    filename = os.path.join(DAX_DIR, dax)
+    assert WorkflowGenerator.parse_dax_file(filename) == parse_dax(filename)
+
+
+def test_parse_dax_file_children_before_parents(tmp_path, parse_dax):
+    filename = str(tmp_path / 'children_before_parents.xml')
+    with open(filename, 'w') as f:
+        f.write(DAX_WITH_CHILDREN_BEFORE_PARENTS)
+    expected = ({1: [1.0, 0, [3, 2]], 2: [0.25, 0, [3]], 3: [0.001, 0, []]}, 'Test_3')
+    assert parse_dax(filename) == expected
+    assert WorkflowGenerator.parse_dax_file(filename) == expected
+
+
+def test_parse_dax_file_malformed():
+    with pytest.raises(ET.ParseError):
+        WorkflowGenerator.parse_dax_file(os.path.join(DAX_DIR, 'test.xml'))